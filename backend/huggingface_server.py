@@ -2,9 +2,18 @@
 # ─────────────────────────────────────────────────────────────────────────────
 # [역할/구성]
 # - Phase 1: /scores 에서 감정 확률·정규화 엔트로피·NLI(entail/contradict) 제공
+#            (/scores/stream: 문장별 결과를 NDJSON/SSE 로 먼저 흘리고 마지막에 같은 스키마의 집계)
+#            (segment: 문장 분할, 모델 길이를 넘는 문장은 분할. 선택 HF_SEG_PACK_TOKENS: 인접 문장을 토큰 예산까지 묶음)
+#            (선택 cascade HF_CASCADE_MODEL: 임베딩 1단계가 확실한 문장은 바로 답하고 애매한 문장만 교차 인코더로 승급)
 # - Phase 2: (gptService가 적용) 보정을 위한 HF 기준 신호 제공 (키 고정)
-# - Phase 3: Platt/Isotonic 학습/저장/평가 (/calibration/train, /calibration/profile, /eval/latest)
-# - Phase 4: 경량 핫-리로드(/admin/reload)로 모델 아티팩트 교체
+# - Phase 3: Platt/Isotonic 학습/저장/평가 (/calibration/train, /calibration/train_all, /calibration/profile, /eval/latest|runs|trend)
+#            (/calibration/observe: 새 피드백을 충분통계로 O(1) 증분 반영, 전체 재학습은 주기적으로)
+# - Phase 4: 무중단 핫-리로드(/admin/reload): 새 모델 묶음을 백그라운드 빌드·워밍·점검 후 원자 교체
+#            (serve --workers N: 저장소의 리로드 세대로 모든 워커에 전파, 워커별 상태는 GET /admin/reload)
+# - 공통: 마이크로 배칭(HF_MB_*)으로 동시 요청을 묶어 추론, 통계는 /admin/stats · Prometheus 지표는 /metrics
+#         수락 제어(HF_MAX_INFLIGHT/HF_MAX_QUEUE → 429/503)·요청 기한(X-Request-Timeout-Ms, 배치 사이에서 중단)·입력 상한(413)
+# - 실행: python huggingface_server.py (개발) | serve --workers N (운영) | export | parity | score-batch | prefetch | migrate-store | train-all
+#         임포트 시에는 모델을 올리지 않는다: startup()/start_background() 로 로드·워밍업, /health=생존 · /ready=준비 완료
 #
 # [키/스키마 고정 — gptService.js 기대치]
 # /scores 응답:
@@ -19,28 +28,61 @@
 # }
 # ─────────────────────────────────────────────────────────────────────────────
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from typing import List, Dict, Tuple
 from datetime import datetime
-import math, os, json, threading
+import math, os, sys, json, threading, time, queue, hashlib, unicodedata, argparse, weakref, bisect, random, atexit, functools
 import re
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 
-# Torch 옵션
-try:
-    import torch
-    HAS_TORCH = True
-except Exception:
-    HAS_TORCH = False
+# 무거운 의존(torch/transformers/firestore)은 처음 필요할 때 임포트한다 — 모듈 임포트만으로는 모델도 올리지 않음
+torch = None
+HAS_TORCH = None  # None = 아직 확인 전(_init_torch 호출 시 결정)
+firestore = None
 
 EMOTION_TEMPLATE = os.getenv("HF_EMO_TEMPLATE", "이 문장은 {} 감정을 표현한다.")
-HF_BATCH = int(os.getenv("HF_BATCH", "8"))
+HF_BATCH = int(os.getenv("HF_BATCH", "8"))                        # HF_MAX_BATCH_TOKENS=0 일 때의 고정 배치 크기
+HF_MAX_BATCH_TOKENS = int(os.getenv("HF_MAX_BATCH_TOKENS", "4096"))  # 배치당 (패딩 포함) 토큰 예산
+HF_BATCH_MAX_ITEMS = int(os.getenv("HF_BATCH_MAX_ITEMS", "64"))     # 토큰 예산 모드에서 배치당 최대 쌍 수
 
-DEVICE = -1
+DEVICE = -1   # _init_torch 에서 확정
 FP16 = False
-if HAS_TORCH and torch.cuda.is_available():
-    DEVICE = int(os.getenv("HF_DEVICE", "0"))
-    FP16 = os.getenv("HF_FP16", "1") == "1"
+
+def _init_torch() -> bool:
+    """torch 지연 임포트 + DEVICE/FP16 결정(멱등)."""
+    global torch, HAS_TORCH, DEVICE, FP16
+    if HAS_TORCH is None:
+        try:
+            import torch as _torch
+            torch, HAS_TORCH = _torch, True
+        except Exception:
+            HAS_TORCH = False
+        if HAS_TORCH and torch.cuda.is_available():
+            DEVICE = int(os.getenv("HF_DEVICE", "0"))
+            FP16 = os.getenv("HF_FP16", "1") == "1"
+    return HAS_TORCH
+
+# 추론 백엔드: torch(fp32/fp16) | torch-int8(동적 양자화, CPU) | onnx | onnx-int8 (ONNX Runtime)
+HF_BACKEND = os.getenv("HF_BACKEND", "torch").lower()
+HF_ARTIFACT_DIR = os.getenv("HF_ARTIFACT_DIR", "./_hf_artifacts")  # export/양자화 산출물 캐시
+HF_MODEL_CACHE = os.getenv("HF_MODEL_CACHE") or None                # 가중치 로컬 캐시 디렉터리(없으면 HF 기본 캐시)
+HF_LOCAL_FILES_ONLY = os.getenv("HF_LOCAL_FILES_ONLY", "auto").lower()  # auto: 로컬 먼저, 없으면 허브 | 1: 로컬만 | 0: 허브 확인
+
+# 워밍업(준비 완료 보고 전): 길이 버킷별 합성 한국어 입력으로 두 스코어러를 미리 실행
+HF_WARMUP = os.getenv("HF_WARMUP", "1") == "1"
+HF_WARMUP_LENGTHS = [int(x) for x in os.getenv("HF_WARMUP_LENGTHS", "16,32,64,128,256").split(",") if x.strip()]
+HF_WARMUP_ROUNDS = int(os.getenv("HF_WARMUP_ROUNDS", "2"))     # 버킷당 반복(할당자 안정화)
+HF_COMPILE = os.getenv("HF_COMPILE", "none").lower()          # none | compile(torch.compile) | trace(TorchScript, CPU) — 실패 시 eager 폴백
+
+# 2단계 cascade: 소형 문장 임베딩으로 감정 분포를 먼저 보고, 애매할 때만 교차 인코더(zero-shot 11쌍)로 승급
+CASCADE_MODEL = os.getenv("HF_CASCADE_MODEL", "")                       # 비우면 off
+CASCADE_MAX_ENTROPY = float(os.getenv("HF_CASCADE_MAX_ENTROPY", "0.85")) # 1단계 분포 정규화 엔트로피가 이보다 크면 승급
+CASCADE_MIN_MARGIN = float(os.getenv("HF_CASCADE_MIN_MARGIN", "0.10"))   # 1단계 top1-top2 확률차가 이보다 작으면 승급
+CASCADE_TEMP = float(os.getenv("HF_CASCADE_TEMP", "0.05"))               # 코사인 → 분포 softmax 온도
+CASCADE_SHADOW = float(os.getenv("HF_CASCADE_SHADOW", "0.02"))           # 통과 문장 중 교차 인코더로 재확인할 비율(일치율 측정)
+CASCADE_MIN_FIT = int(os.getenv("HF_CASCADE_MIN_FIT", "200"))            # 승급 표본(문장)이 이만큼 쌓이기 전엔 전부 승급
 
 # ===== 새 환경변수(없으면 기본값으로 동작) =====
 EMO_TOPK = int(os.getenv("HF_EMO_TOPK", "2"))            # 감정 top-k(폴백용)
@@ -51,18 +93,74 @@ W_FOCUS  = float(os.getenv("HF_W_FOCUS",  "0.2"))        # 집중도(1-엔트로
 ENT_TOPK = int(os.getenv("HF_ENT_TOPK", "2"))            # entail 상위 문장 k
 ENT_SEG_AUTO = os.getenv("HF_ENT_SEG_AUTO", "1") == "1"  # 긴 문장 자동 세그먼트
 ENT_MINLEN = int(os.getenv("HF_ENT_MINLEN", "120"))      # 자동 세그 기준 길이
+# 인접 문장을 한 입력으로 묶는 토큰 예산(0=문장별, 기본). 켜면 세그먼트 /scores 값이 바뀌므로 보정 프로필 재학습(train-all) 후 사용
+SEG_PACK_TOKENS = int(os.getenv("HF_SEG_PACK_TOKENS", "0"))
+SEG_HYP_RESERVE = int(os.getenv("HF_SEG_HYP_RESERVE", "48"))   # 가설+특수 토큰 몫: 세그먼트 상한 = max_length - 이 값
+# 세그먼트 집계를 토큰 길이로 가중할지(기본: 묶음이 켜져 있을 때만). 0 이면 균등 평균 — HF_SEG_PACK_TOKENS=0 과 함께 이전 값 그대로
+SEG_WEIGHTED = os.getenv("HF_SEG_WEIGHTED", "1" if SEG_PACK_TOKENS > 0 else "0") == "1"
+
+# 마이크로 배칭(동시 요청을 모아 한 번의 forward 로 처리)
+MB_ENABLE = os.getenv("HF_MB_ENABLE", "1") == "1"
+MB_MAX_BATCH = int(os.getenv("HF_MB_MAX_BATCH", "128"))         # 한 라운드 최대 항목((문장,가설) 쌍) 수
+MB_MAX_WAIT_MS = float(os.getenv("HF_MB_MAX_WAIT_MS", "5"))     # 첫 요청 이후 최대 대기(ms)
+
+# /scores 결과 캐시(LRU + 선택 TTL + 메모리 상한)
+RC_ENABLE = os.getenv("HF_RESULT_CACHE", "1") == "1"
+RC_MAX_ITEMS = int(os.getenv("HF_RESULT_CACHE_SIZE", "4096"))
+RC_TTL_SEC = float(os.getenv("HF_RESULT_CACHE_TTL", "0"))        # 0 이면 만료 없음
+RC_MAX_MB = float(os.getenv("HF_RESULT_CACHE_MB", "64"))
+
+# 문장 단위 추론 캐시(문장 해시 + 모델 버전 → 감정 확률 / NLI 삼중값)
+SC_ENABLE = os.getenv("HF_SENT_CACHE", "1") == "1"
+SC_MAX_ITEMS = int(os.getenv("HF_SENT_CACHE_SIZE", "100000"))
+SC_MAX_MB = float(os.getenv("HF_SENT_CACHE_MB", "128"))
+
+# 보정 프로필 캐시(/calibration/profile): 이 프로세스의 쓰기는 즉시 반영, 다른 프로세스(워커·Node) 쓰기는 TTL 내 반영
+PC_MAX_ITEMS = int(os.getenv("HF_PROFILE_CACHE_SIZE", "10000"))
+PC_TTL_SEC = float(os.getenv("HF_PROFILE_CACHE_TTL", "60"))       # 0 이면 만료 없음
+PC_NEG_TTL_SEC = float(os.getenv("HF_PROFILE_CACHE_NEG_TTL", "5"))  # 없는 문서({}) 캐시 유지 시간(새 사용자의 첫 학습이 빨리 보이게)
+PC_CHECK_SEC = float(os.getenv("HF_PROFILE_CACHE_CHECK", "1"))     # 공유 프로필 세대(다른 워커의 학습) 확인 주기(0=안 함)
+PC_BULK_MAX = int(os.getenv("HF_PROFILE_BULK_MAX", "500"))        # uids= 일괄 조회 상한
+
+STREAM_SENTS = int(os.getenv("HF_STREAM_SENTS", "2"))            # /scores/stream 한 번에 추론할 문장 수
+
+# 쓰기 지연(write-behind): 보정 프로필·통계·평가 실행 저장을 응답 경로에서 떼어 배경에서 일괄 기록
+WB_ENABLE = os.getenv("HF_WRITE_BEHIND", "1") == "1"
+WB_MAX_PENDING = int(os.getenv("HF_WB_MAX_PENDING", "5000"))      # 대기 경로 수 상한(넘으면 호출자가 직접 플러시 = 역압)
+WB_FLUSH_MS = float(os.getenv("HF_WB_FLUSH_MS", "200"))            # 첫 쓰기 후 모아 보내기까지 최대 대기
+WB_BATCH = int(os.getenv("HF_WB_BATCH", "400"))                    # 1회 기록 문서 수(local: 한 트랜잭션, firestore: batch ≤500)
+
+# 수락 제어·요청 기한(추론 엔드포인트 /scores, /scores/stream, /scores/batch, /zero-shot, /nli)
+ADM_MAX_INFLIGHT = int(os.getenv("HF_MAX_INFLIGHT", "8"))        # 동시에 추론하는 요청 수(0=무제한)
+ADM_MAX_QUEUE = int(os.getenv("HF_MAX_QUEUE", "32"))             # 자리를 기다리는 요청 상한(넘으면 즉시 429)
+ADM_BULK_INFLIGHT = int(os.getenv("HF_BULK_MAX_INFLIGHT", "2"))  # /scores/batch 전용 풀(대화형 풀과 별도, 작업이 몇 시간 걸릴 수 있음)
+ADM_BULK_QUEUE = int(os.getenv("HF_BULK_MAX_QUEUE", "0"))        # 대량 작업 대기 상한(기본: 자리가 없으면 바로 429)
+DEFAULT_DEADLINE_MS = float(os.getenv("HF_DEFAULT_DEADLINE_MS", "30000"))  # 헤더/본문에 기한이 없을 때(0=없음, /scores/batch 제외)
+MAX_TEXT_CHARS = int(os.getenv("HF_MAX_TEXT_CHARS", "20000"))    # 입력 텍스트 글자 수 상한(넘으면 413, 0=무제한)
+MAX_SENTENCES = int(os.getenv("HF_MAX_SENTENCES", "300"))        # 문장(세그먼트 모드)·가설·라벨 개수 상한(넘으면 413, 0=무제한)
+
+# 대량 재채점(/scores/batch, score-batch CLI)
+BULK_WINDOW = int(os.getenv("HF_BULK_WINDOW", "256"))            # 한 번에 메모리에 올리는 문서 수
+BULK_BUCKET = int(os.getenv("HF_BULK_BUCKET", "32"))             # 길이 정렬 후 한 번에 추론할 문장 수
+
+# 계측(/metrics, Prometheus 텍스트 형식). 프로세스별 값 — gunicorn 멀티 워커면 워커마다 따로 집계된다
+METRICS_ENABLE = os.getenv("HF_METRICS", "1") == "1"
+
+# ===== 의존 패키지 로드 (NumPy 는 가벼워 즉시, 나머지는 지연) =====
+def _has_firestore() -> bool:
+    # 임포트 없이 설치 여부만 확인
+    import importlib.util
+    try:
+        return importlib.util.find_spec("google.cloud.firestore") is not None
+    except Exception:
+        return False
 
-# ===== 의존 패키지 로드 =====
-try:
-    from transformers import pipeline
-except Exception as e:
-    raise RuntimeError("transformers 패키지가 필요합니다. pip install transformers") from e
-
-try:
-    from google.cloud import firestore  # 선택 의존
-    HAS_FIRESTORE = True
-except Exception:
-    HAS_FIRESTORE = False
+def _load_firestore():
+    global firestore
+    if firestore is None:
+        from google.cloud import firestore as _fs  # 선택 의존
+        firestore = _fs
+    return firestore
 
 try:
     import numpy as np
@@ -74,35 +172,657 @@ app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=False)
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 전역 상태 (모델 이름과 파이프라인 객체 분리)
+# 계측: 경량 카운터/히스토그램(외부 의존 없음) + /metrics 텍스트 출력
+#  - 관측 1회 = 잠금 1회 + bisect, 라벨 조합은 고정(엔드포인트·단계·스코어러 이름)이라 카디널리티가 작다
+# ─────────────────────────────────────────────────────────────────────────────
+_LAT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+def _fmt_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values)) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_: str, labels=()):
+        self.name, self.help, self.labels = name, help_, tuple(labels)
+        self._v = {}
+        self._lock = threading.Lock()
+
+    def inc(self, v: float = 1.0, *lv):
+        if not METRICS_ENABLE: return
+        with self._lock:
+            self._v[lv] = self._v.get(lv, 0.0) + v
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}\n# TYPE {self.name} counter\n"
+        with self._lock:
+            items = list(self._v.items())
+        for lv, v in items:
+            yield f"{self.name}{_fmt_labels(self.labels, lv)} {v}\n"
+
+class Histogram:
+    def __init__(self, name: str, help_: str, labels=(), buckets=_LAT_BUCKETS):
+        self.name, self.help, self.labels = name, help_, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._v = {}  # 라벨값 → [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, x: float, *lv):
+        if not METRICS_ENABLE: return
+        i = bisect.bisect_left(self.buckets, x)
+        with self._lock:
+            row = self._v.get(lv)
+            if row is None:
+                row = self._v[lv] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            row[i] += 1
+            row[-2] += x; row[-1] += 1
+
+    @contextmanager
+    def time(self, *lv):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *lv)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}\n# TYPE {self.name} histogram\n"
+        with self._lock:
+            items = [(lv, list(row)) for lv, row in self._v.items()]
+        for lv, row in items:
+            acc = 0
+            for b, c in zip(self.buckets + ("+Inf",), row):
+                acc += c
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, lv, [('le', b)])} {acc}\n"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, lv)} {row[-2]}\n"
+            yield f"{self.name}_count{_fmt_labels(self.labels, lv)} {row[-1]}\n"
+
+class CallbackMetric:
+    """렌더 시점에 fn() → [(라벨값 튜플, 값)] 을 읽는 gauge/counter(기존 통계 재사용)."""
+    def __init__(self, name: str, help_: str, kind: str, labels, fn):
+        self.name, self.help, self.kind, self.labels, self.fn = name, help_, kind, tuple(labels), fn
+
+    def render(self):
+        try:
+            rows = list(self.fn())
+        except Exception:
+            return
+        yield f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        for lv, v in rows:
+            yield f"{self.name}{_fmt_labels(self.labels, lv)} {float(v)}\n"
+
+_metrics = []
+
+def _metric(m):
+    _metrics.append(m)
+    return m
+
+M_HTTP = _metric(Histogram("hf_http_request_seconds", "엔드포인트별 응답 시간(스트리밍은 헤더까지)", ("endpoint", "method", "status")))
+M_STAGE = _metric(Histogram("hf_stage_seconds", "/scores 처리 단계별 시간", ("stage",)))
+M_FORWARD = _metric(Histogram("hf_forward_seconds", "모델 forward 1회(배치) 시간", ("scorer",)))
+M_BATCH_PAIRS = _metric(Histogram("hf_forward_batch_pairs", "forward 배치당 (문장,가설) 쌍 수", ("scorer",), _SIZE_BUCKETS))
+M_MB_ITEMS = _metric(Histogram("hf_microbatch_items", "마이크로 배치 라운드당 항목 수", (), _SIZE_BUCKETS))
+M_MB_WAIT = _metric(Histogram("hf_microbatch_queue_wait_seconds", "마이크로 배치 큐 대기 시간", ()))
+M_SENTS = _metric(Histogram("hf_sentences_per_request", "요청당 세그먼트 수(문장 묶음·분할 후 모델 입력 단위)", ("endpoint",), _SIZE_BUCKETS))
+M_TOKENS = _metric(Counter("hf_tokens_total", "처리한 토큰 수(kind=real|padded)", ("scorer", "kind")))
+M_PAIRS = _metric(Counter("hf_pairs_total", "추론한 (문장,가설) 쌍 수", ("scorer",)))
+M_WB_FLUSH = _metric(Histogram("hf_write_behind_flush_seconds", "write-behind 배치 1회 기록 시간", ()))
+M_WB_BATCH = _metric(Histogram("hf_write_behind_batch_docs", "write-behind 배치당 문서 수", (), _SIZE_BUCKETS))
+M_CASCADE = _metric(Counter("hf_cascade_sentences_total", "cascade 1단계 판정(served=1단계 확정, escalated=승급, shadow=일치율 표본)", ("outcome",)))
+M_ADMISSION = _metric(Counter("hf_admission_total", "수락 제어 결과(admitted|rejected_full|rejected_deadline|expired_waiting)", ("pool", "outcome")))
+M_DEADLINE = _metric(Counter("hf_deadline_exceeded_total", "요청 기한 초과로 끊긴 요청(끊긴 단계별)", ("stage",)))
+
+def _rss_bytes() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return float(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        import resource
+        return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024.0  # 리눅스 외: 최대 RSS 근사
+
+def _gpu_mem():
+    if not (HAS_TORCH and DEVICE >= 0):
+        return []
+    return [(("allocated",), torch.cuda.memory_allocated(DEVICE)), (("reserved",), torch.cuda.memory_reserved(DEVICE))]
+
+_metric(CallbackMetric("hf_process_resident_memory_bytes", "프로세스 RSS", "gauge", (), lambda: [((), _rss_bytes())]))
+_metric(CallbackMetric("hf_gpu_memory_bytes", "GPU 메모리(torch 할당자)", "gauge", ("kind",), _gpu_mem))
+
+def render_metrics() -> str:
+    return "".join(line for m in _metrics for line in m.render())
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 요청 기한(deadline): 클라이언트가 이미 포기한 요청은 배치 사이에서 계산을 끊는다
+#  - 기한은 time.monotonic() 기준 절대 시각. 요청 스레드는 스레드 로컬로, 배처 작업은 _MBJob 으로 들고 다닌다
+# ─────────────────────────────────────────────────────────────────────────────
+class DeadlineExceeded(RuntimeError):
+    """요청 기한 초과(stage: 끊긴 단계)."""
+    def __init__(self, stage: str):
+        super().__init__(f"요청 기한 초과({stage})")
+        self.stage = stage
+
+_req_local = threading.local()
+
+def current_deadline():
+    """현재 스레드가 처리 중인 요청의 기한 또는 None(기한 없음·요청 밖)."""
+    return getattr(_req_local, "deadline", None)
+
+@contextmanager
+def deadline_scope(deadline):
+    prev = current_deadline()
+    _req_local.deadline = deadline
+    try:
+        yield
+    finally:
+        _req_local.deadline = prev
+
+def check_deadline(stage: str, deadline: float = None):
+    """기한(생략 시 현재 요청의 기한)이 지났으면 DeadlineExceeded."""
+    d = current_deadline() if deadline is None else deadline
+    if d is not None and time.monotonic() >= d:
+        raise DeadlineExceeded(stage)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 전역 상태 (모델 이름과 파이프라인 객체 분리, 같은 체크포인트는 1회만 로드)
 # ─────────────────────────────────────────────────────────────────────────────
 ZSL_MODEL_NAME = os.getenv("ZSL_MODEL", "joeddav/xlm-roberta-large-xnli")
 NLI_MODEL_NAME = os.getenv("NLI_MODEL", "joeddav/xlm-roberta-large-xnli")
 
-zero_shot = None  # zero-shot-classification pipeline
-nli_clf   = None  # text-classification (XNLI) pipeline
+_bundle = None  # 현재 ModelBundle — 교체는 참조 대입 1회(원자적), 요청은 current_bundle() 로 한 번만 읽는다
+
+_reload_lock = threading.Lock()   # 리로드는 한 번에 하나(추론 경로는 잠그지 않음)
+_gen_lock = threading.Lock()
+_model_gen = 0  # 묶음 빌드마다 증가(같은 이름의 아티팩트 교체도 구분)
+_retired = []   # 교체된 묶음 weakref — 진행 중 요청이 끝나면 해제된다
+
+class ModelBundle:
+    """한 세대의 모델 묶음(생성 후 변경 없음). 파이프라인·스코어러·이름·세대가 항상 같은 세대로 함께 보인다."""
+    __slots__ = ("gen", "zsl_name", "nli_name", "backend", "zero_shot", "nli_clf", "zsl", "nli", "emb", "loaded_at", "__weakref__")
+
+    def __init__(self, gen, zsl_name, nli_name, backend, zero_shot, nli_clf, zsl, nli, emb=None):
+        self.gen, self.zsl_name, self.nli_name, self.backend = gen, zsl_name, nli_name, backend
+        self.zero_shot = zero_shot  # 레거시 zero-shot-classification 파이프라인
+        self.nli_clf = nli_clf      # 레거시 text-classification (XNLI) 파이프라인
+        self.zsl = zsl              # 감정 zero-shot 용 PairScorer
+        self.nli = nli              # 핵심믿음 NLI 용 PairScorer (같은 체크포인트면 zsl 과 동일 객체)
+        self.emb = emb              # cascade 1단계 EmbedScorer(HF_CASCADE_MODEL 미설정이면 None)
+        self.loaded_at = time.time()
+
+    def scorers(self):
+        return [self.zsl] if self.nli is self.zsl else [self.zsl, self.nli]
+
+    def info(self) -> dict:
+        return {"gen": self.gen, "zsl_model": self.zsl_name, "nli_model": self.nli_name,
+                "backend": self.backend, "cascade_model": self.emb.name if self.emb else None, "loaded_at": self.loaded_at}
+
+class PairScorer:
+    """(premise, hypothesis) 쌍을 직접 배치 인코딩해 NLI 3-클래스 확률/로짓을 얻는다.
+    zero-shot(멀티라벨)과 NLI 가 같은 로짓에서 읽히므로 한 번의 forward 로 둘 다 계산할 수 있다."""
+    def __init__(self, name: str, model, tokenizer):
+        self.name = name
+        self.model = model
+        self.tokenizer = tokenizer
+        ids = {str(k).lower(): int(v) for k, v in (model.config.label2id or {}).items()}
+        def _find(prefix, default):
+            return next((i for l, i in ids.items() if l.startswith(prefix)), default)
+        # zero-shot 파이프라인과 같은 규칙(entail* / contradiction=0 기본)
+        self.entail_id = _find("entail", 2)
+        self.neutral_id = _find("neutral", 1)
+        self.contra_id = _find("contra", 0)
+
+        ml = int(getattr(tokenizer, "model_max_length", 512) or 512)
+        if ml > 100000:  # 상한 미설정 토크나이저
+            ml = int(getattr(model.config, "max_position_embeddings", 514)) - 2
+        self.max_length = ml
+        self.forward = model      # compile/trace 성공 시 교체되는 호출 대상(모델 객체 자체는 그대로)
+        self.compiled = None      # 적용된 방식("compile"|"trace") 또는 None
+        self._stat_lock = threading.Lock()
+        self.stats = {"forward_batches": 0, "pairs": 0, "tokens": 0, "padded_tokens": 0}
+
+    def _encode(self, pairs: List[Tuple[str, str]]):
+        ps, hs = [p for p, _ in pairs], [h for _, h in pairs]
+        try:
+            return self.tokenizer(ps, hs, truncation="only_first", max_length=self.max_length)
+        except Exception:
+            # 가설만으로 최대 길이를 넘는 등 only_first 불가 → 양쪽 절단
+            return self.tokenizer(ps, hs, truncation="longest_first", max_length=self.max_length)
+
+    def _plan_batches(self, lens: List[int]) -> List[List[int]]:
+        """토큰 길이로 정렬 후 (배치 크기 × 최장 길이) ≤ HF_MAX_BATCH_TOKENS 가 되도록 묶는다.
+        예산 0 이면 입력 순서대로 HF_BATCH 개씩(이전 동작)."""
+        n = len(lens)
+        if HF_MAX_BATCH_TOKENS <= 0:
+            step = max(1, HF_BATCH)
+            return [list(range(i, min(n, i + step))) for i in range(0, n, step)]
+        cap = max(1, HF_BATCH_MAX_ITEMS)
+        batches, cur = [], []
+        for i in sorted(range(n), key=lambda k: lens[k]):
+            # 오름차순이므로 새 항목 길이가 곧 배치 최장 길이
+            if cur and ((len(cur) + 1) * lens[i] > HF_MAX_BATCH_TOKENS or len(cur) >= cap):
+                batches.append(cur); cur = []
+            cur.append(i)
+        if cur:
+            batches.append(cur)
+        return batches
+
+    def _collate(self, enc, ids: List[int]):
+        width = max(len(enc["input_ids"][i]) for i in ids)
+        pad_id = self.tokenizer.pad_token_id or 0
+        left = getattr(self.tokenizer, "padding_side", "right") == "left"
+        out = {}
+        for k in enc.keys():
+            fill = pad_id if k == "input_ids" else 0
+            rows = []
+            for i in ids:
+                seq = list(enc[k][i]); pad = [fill] * (width - len(seq))
+                rows.append(pad + seq if left else seq + pad)
+            out[k] = torch.tensor(rows, dtype=torch.long, device=self.model.device)
+        return out, width
+
+    def logits(self, pairs: List[Tuple[str, str]], deadline: float = None) -> List[List[float]]:
+        """쌍별 [contradict, neutral, entail] 로짓(입력 순서 유지). deadline 이 지나면 다음 배치 전에 중단."""
+        if not pairs:
+            return []
+        with M_STAGE.time("tokenize"):
+            enc = self._encode(pairs)
+        lens = [len(x) for x in enc["input_ids"]]
+        out = [None] * len(pairs)
+        n_batches = padded = 0
+        for ids in self._plan_batches(lens):
+            if deadline is not None:
+                check_deadline("forward", deadline)
+            batch, width = self._collate(enc, ids)
+            t0 = time.perf_counter()
+            with torch.inference_mode():
+                lg = _logits_of(self.forward(**batch)).float().cpu().tolist()
+            M_FORWARD.observe(time.perf_counter() - t0, self.name)
+            M_BATCH_PAIRS.observe(len(ids), self.name)
+            for i, r in zip(ids, lg):
+                out[i] = [r[self.contra_id], r[self.neutral_id], r[self.entail_id]]
+            n_batches += 1
+            padded += width * len(ids)
+        with self._stat_lock:
+            self.stats["forward_batches"] += n_batches
+            self.stats["pairs"] += len(pairs)
+            self.stats["tokens"] += sum(lens)
+            self.stats["padded_tokens"] += padded
+        M_PAIRS.inc(len(pairs), self.name)
+        M_TOKENS.inc(sum(lens), self.name, "real")
+        M_TOKENS.inc(padded, self.name, "padded")
+        return out
 
-_reload_lock = threading.Lock()
+    def try_compile(self, mode: str, sample_pairs: List[Tuple[str, str]]) -> dict:
+        """torch.compile / TorchScript trace 적용 후 eager 와 로짓 비교(최대 절대오차 1e-3). 실패하면 eager 유지."""
+        if mode not in ("compile", "trace") or not isinstance(self.model, torch.nn.Module):
+            return {"mode": "none"}
+        t0 = time.monotonic()
+        try:
+            enc = self._encode(sample_pairs)
+            batch, _ = self._collate(enc, list(range(len(sample_pairs))))
+            with torch.inference_mode():
+                ref = _logits_of(self.model(**batch)).float()
+            if mode == "compile":
+                fwd = torch.compile(self.model, dynamic=True)
+            else:
+                if DEVICE >= 0:
+                    raise RuntimeError("trace 는 CPU 전용")
+                traced = torch.jit.trace(self.model, example_kwarg_inputs=dict(batch), strict=False, check_trace=False)
+                fwd = torch.jit.freeze(traced.eval()) if hasattr(torch.jit, "freeze") else traced
+            with torch.inference_mode():
+                got = _logits_of(fwd(**batch)).float()
+            diff = float((got - ref).abs().max())
+            if diff > 1e-3:
+                raise RuntimeError(f"eager 대비 오차 {diff:.2e}")
+            self.forward, self.compiled = fwd, mode
+            return {"mode": mode, "ok": True, "max_abs_diff": diff, "ms": (time.monotonic() - t0) * 1000.0}
+        except Exception as e:
+            self.forward, self.compiled = self.model, None
+            print(f"[HF][warmup] {self.name}: {mode} 실패 → eager 폴백:", e)
+            return {"mode": mode, "ok": False, "error": str(e), "ms": (time.monotonic() - t0) * 1000.0}
+
+def _logits_of(out):
+    # ModelOutput / trace 의 dict·tuple 출력 모두 지원
+    if hasattr(out, "logits"):
+        return out.logits
+    if isinstance(out, dict):
+        return out["logits"]
+    return out[0]
+
+class EmbedScorer:
+    """cascade 1단계: 평균 풀링·L2 정규화 문장 임베딩과 감정 라벨(라벨명+EMOTION_SYNONYMS) 임베딩의 코사인.
+    라벨 점수 = 그 라벨 표현들과의 최대 코사인. 라벨 임베딩은 생성 시 한 번만 계산한다.
+    교차 인코더와 같은 스케일의 확률은 승급 표본(1단계 코사인, 교차 인코더 확률)으로 학습한 Platt 맵으로 얻는다."""
+    FIT_MAX = 50000      # 맵 학습용 (코사인, 확률) 쌍 보관 상한
+    REFIT_EVERY = 100    # 승급 문장이 이만큼 늘 때마다 재학습
+
+    def __init__(self, name: str, model, tokenizer):
+        self.name, self.model, self.tokenizer = name, model, tokenizer
+        ml = int(getattr(tokenizer, "model_max_length", 512) or 512)
+        self.max_length = ml if ml <= 100000 else 512
+        phrases, self._label_idx = [], []
+        for lab in DEFAULT_EMOTION_LABELS:
+            syn = [lab] + [x for x in EMOTION_SYNONYMS.get(lab, []) if x != lab]
+            self._label_idx.append(list(range(len(phrases), len(phrases) + len(syn))))
+            phrases.extend(syn)
+        self._label_emb = self._embed(phrases)  # (표현 수, d)
+        self._lock = threading.Lock()
+        self._fit_x, self._fit_y = deque(maxlen=self.FIT_MAX), deque(maxlen=self.FIT_MAX)
+        self._fit_n = self._since_fit = 0
+        self.platt = None   # (a, b) — 학습 전에는 None(전부 승급)
+        self.stats = {"sentences": 0, "served": 0, "escalated": 0, "shadow": 0,
+                      "reasons": {"calibrating": 0, "entropy": 0, "margin": 0},
+                      "agree_escalated": 0, "agree_shadow": 0, "abs_err_shadow": 0.0}
+
+    def _embed(self, texts: List[str]):
+        out = []
+        for i in range(0, len(texts), 64):
+            enc = self.tokenizer(texts[i:i + 64], padding=True, truncation=True, max_length=self.max_length,
+                                 return_tensors="pt").to(self.model.device)
+            with torch.inference_mode():
+                h = self.model(**enc).last_hidden_state
+            m = enc["attention_mask"].unsqueeze(-1).to(h.dtype)
+            v = (h * m).sum(1) / m.sum(1).clamp(min=1.0)
+            out.append(torch.nn.functional.normalize(v.float(), dim=-1))
+        return torch.cat(out, 0)
+
+    def label_scores(self, texts: List[str]) -> List[List[float]]:
+        """문장별 [DEFAULT_EMOTION_LABELS 순서의 코사인]."""
+        if not texts:
+            return []
+        sims = self._embed(texts) @ self._label_emb.T
+        return torch.stack([sims[:, idx].max(1).values for idx in self._label_idx], 1).cpu().tolist()
+
+    @staticmethod
+    def distribution(cos: List[float]) -> List[float]:
+        return _softmax([c / max(1e-6, CASCADE_TEMP) for c in cos])
+
+    def decide(self, cos: List[float]):
+        """승급 사유(None 이면 1단계로 확정)."""
+        if self.platt is None:
+            return "calibrating"
+        q = self.distribution(cos)
+        if normalized_entropy_from_scores(q) > CASCADE_MAX_ENTROPY:
+            return "entropy"
+        top = sorted(q, reverse=True)
+        if len(top) > 1 and top[0] - top[1] < CASCADE_MIN_MARGIN:
+            return "margin"
+        return None
+
+    def to_probs(self, cos: List[float]) -> Dict[str, float]:
+        a, b = self.platt
+        return {l: apply_platt((c + 1.0) / 2.0, a, b) for l, c in zip(DEFAULT_EMOTION_LABELS, cos)}
+
+    def record(self, cos: List[float], ce_row: Dict[str, float], shadow: bool = False):
+        """교차 인코더 결과로 일치율 누적 + 맵 학습 표본 추가(필요 시 재학습)."""
+        ce = [float(ce_row[l]) for l in DEFAULT_EMOTION_LABELS]
+        agree = max(range(len(cos)), key=cos.__getitem__) == max(range(len(ce)), key=ce.__getitem__)
+        err = sum(abs(p - y) for p, y in zip(self.to_probs(cos).values(), ce)) / len(ce) if (shadow and self.platt) else 0.0
+        with self._lock:
+            self.stats["agree_shadow" if shadow else "agree_escalated"] += int(agree)
+            self.stats["abs_err_shadow"] += err
+            self._fit_x.extend((c + 1.0) / 2.0 for c in cos)
+            self._fit_y.extend(ce)
+            self._fit_n += 1; self._since_fit += 1
+            due = self._fit_n >= CASCADE_MIN_FIT and (self.platt is None or self._since_fit >= self.REFIT_EVERY)
+            if due:
+                xs, ys = list(self._fit_x), list(self._fit_y)
+                self._since_fit = 0
+        if due:
+            ab = train_platt(xs, ys)  # 소프트 라벨(교차 인코더 확률)로 σ(a·x+b) 적합
+            with self._lock:
+                self.platt = ab
+
+    def count(self, served: int, escalated: int, shadow: int, reasons: Dict[str, int]):
+        with self._lock:
+            st = self.stats
+            st["sentences"] += served + escalated + shadow
+            st["served"] += served; st["escalated"] += escalated; st["shadow"] += shadow
+            for k, v in reasons.items():
+                st["reasons"][k] += v
+
+    def report(self) -> dict:
+        with self._lock:
+            st = json.loads(json.dumps(self.stats))
+            platt, fit_n = self.platt, self._fit_n
+        n = max(1, st["sentences"])
+        return {"model": self.name, **st, "platt": list(platt) if platt else None, "fit_samples": fit_n,
+                "escalation_rate": (st["escalated"] + st["shadow"]) / n,
+                "agreement_escalated": st["agree_escalated"] / max(1, st["escalated"]),
+                "agreement_shadow": st["agree_shadow"] / max(1, st["shadow"]),
+                "mean_abs_err_shadow": st["abs_err_shadow"] / max(1, st["shadow"]),
+                "thresholds": {"max_entropy": CASCADE_MAX_ENTROPY, "min_margin": CASCADE_MIN_MARGIN,
+                               "temp": CASCADE_TEMP, "shadow": CASCADE_SHADOW}}
+
+def _softmax(xs: List[float]) -> List[float]:
+    m = max(xs)
+    es = [math.exp(x - m) for x in xs]
+    s = sum(es)
+    return [e / s for e in es]
+
+def _same_checkpoint(a: str, b: str) -> bool:
+    def norm(n):
+        n = str(n or "").strip()
+        return os.path.realpath(n) if os.path.isdir(n) else n.rstrip("/")
+    return norm(a) == norm(b)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 추론 백엔드 로드/익스포트/패리티
+#  - torch-int8: Linear 층 동적 int8 양자화(로드 시 수 초, 디스크 캐시 불필요)
+#  - onnx / onnx-int8: optimum 으로 ONNX 그래프를 export(+동적 양자화)해 HF_ARTIFACT_DIR 에 캐시
+#  - 허용 오차(확률 절대오차, /scores 의 감정 확률·NLI 삼중값 기준):
+#      torch 1e-4 · onnx 1e-3 · torch-int8/onnx-int8 5e-2  → parity_check 로 검증
+# ─────────────────────────────────────────────────────────────────────────────
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+PARITY_TOL = {"torch": 1e-4, "onnx": 1e-3, "torch-int8": 5e-2, "onnx-int8": 5e-2}
+PARITY_SAMPLES = [
+    "오늘은 정말 기쁘고 행복한 하루였다.",
+    "친구와 싸워서 화가 났다. 너무 슬프다!",
+    "발표를 망칠까 봐 밤새 걱정했다.",
+    "나는 아무것도 제대로 하는 게 없는 사람이다.",
+]
+PARITY_CORE_BELIEF = "나는 쓸모없는 사람이다."
+
+def _artifact_dir(name: str, backend: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "__", str(name).strip("/"))
+    return os.path.join(HF_ARTIFACT_DIR, safe, backend)
+
+def _onnx_file(backend: str) -> str:
+    return "model_quantized.onnx" if backend == "onnx-int8" else "model.onnx"
+
+def _require_optimum():
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification  # noqa: F401
+    except Exception as e:
+        raise RuntimeError("ONNX 백엔드에는 optimum[onnxruntime] 패키지가 필요합니다. pip install optimum[onnxruntime]") from e
+
+def _from_pretrained(cls, name: str, **kw):
+    """HF_MODEL_CACHE/HF_LOCAL_FILES_ONLY 를 적용한 from_pretrained. auto 는 로컬 캐시 우선(허브 확인 왕복 생략)."""
+    if HF_MODEL_CACHE:
+        kw.setdefault("cache_dir", HF_MODEL_CACHE)
+    if HF_LOCAL_FILES_ONLY in ("1", "true", "auto") and not os.path.isdir(name):
+        try:
+            return cls.from_pretrained(name, local_files_only=True, **kw)
+        except (OSError, ValueError):
+            if HF_LOCAL_FILES_ONLY != "auto":
+                raise
+    return cls.from_pretrained(name, **kw)
+
+def export_artifacts(name: str, backend: str = "onnx", force: bool = False) -> str:
+    """ONNX(fp32) export, onnx-int8 이면 이어서 동적 양자화. 산출물 디렉터리 경로 반환(있으면 재사용)."""
+    if backend not in ("onnx", "onnx-int8"):
+        raise ValueError(f"export 대상이 아닌 백엔드: {backend}")
+    _require_optimum()
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    fp32_dir = _artifact_dir(name, "onnx")
+    if force or not os.path.exists(os.path.join(fp32_dir, _onnx_file("onnx"))):
+        print(f"[HF][export] {name} → {fp32_dir}")
+        m = _from_pretrained(ORTModelForSequenceClassification, name, export=True)
+        m.save_pretrained(fp32_dir)
+        _from_pretrained(AutoTokenizer, name).save_pretrained(fp32_dir)
+    if backend == "onnx":
+        return fp32_dir
+
+    out = _artifact_dir(name, backend)
+    if force or not os.path.exists(os.path.join(out, _onnx_file(backend))):
+        print(f"[HF][export] int8 동적 양자화 → {out}")
+        qz = ORTQuantizer.from_pretrained(fp32_dir, file_name=_onnx_file("onnx"))
+        qz.quantize(save_dir=out, quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+        _from_pretrained(AutoTokenizer, fp32_dir).save_pretrained(out)
+    return out
+
+def _load_checkpoint(name: str, backend: str = None):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    _init_torch()
+    backend = (backend or HF_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 HF_BACKEND: {backend} (가능: {', '.join(BACKENDS)})")
+
+    if backend in ("onnx", "onnx-int8"):
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        path = export_artifacts(name, backend)
+        provider = "CUDAExecutionProvider" if DEVICE >= 0 else "CPUExecutionProvider"
+        model = _from_pretrained(ORTModelForSequenceClassification, path, file_name=_onnx_file(backend), provider=provider)
+        return model, _from_pretrained(AutoTokenizer, path)
 
-def load_pipelines(zsl_model_name: str, nli_model_name: str):
     kw = {}
+    if DEVICE >= 0 and FP16:
+        kw["torch_dtype"] = torch.float16
+    tok = _from_pretrained(AutoTokenizer, name)
+    model = _from_pretrained(AutoModelForSequenceClassification, name, **kw)
+    model.eval()
+    if backend == "torch-int8":
+        if DEVICE >= 0:
+            print("[HF][backend] torch-int8 은 CPU 전용 → GPU 에서는 fp32/fp16 으로 로드")
+        else:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
     if DEVICE >= 0:
-        kw["device"] = DEVICE
-        if FP16:
-            kw["torch_dtype"] = torch.float16
-    z = pipeline("zero-shot-classification", model=zsl_model_name, **kw)
-    n = pipeline("text-classification",      model=nli_model_name, **kw)
-    return z, n
+        model.to(f"cuda:{DEVICE}")
+    return model, tok
+
+def parity_check(ref: "PairScorer", cand: "PairScorer", sentences: List[str] = None,
+                 core_belief: str = PARITY_CORE_BELIEF, backend: str = None, tol: float = None) -> dict:
+    """같은 입력에 대해 /scores 가 쓰는 확률(감정 entail-vs-contra, NLI 삼중값)의 최대 절대오차 비교."""
+    sents = sentences or PARITY_SAMPLES
+    hyps = [EMOTION_TEMPLATE.format(l) for l in DEFAULT_EMOTION_LABELS]
+    emo_pairs = [(s, h) for s in sents for h in hyps]
+    nli_pairs = [(s, core_belief) for s in sents]
+    a, b = ref.logits(emo_pairs + nli_pairs), cand.logits(emo_pairs + nli_pairs)
+    k = len(emo_pairs)
+    emo_diff = max(abs(_entail_vs_contra(x) - _entail_vs_contra(y)) for x, y in zip(a[:k], b[:k]))
+    nli_diff = max(abs(u - v) for x, y in zip(a[k:], b[k:]) for u, v in zip(_softmax(x), _softmax(y)))
+    tol = PARITY_TOL.get(backend or HF_BACKEND, 1e-3) if tol is None else float(tol)
+    return {
+        "pairs": len(a), "tol": tol,
+        "max_abs_diff_emotion": float(emo_diff), "max_abs_diff_nli": float(nli_diff),
+        "ok": bool(max(emo_diff, nli_diff) <= tol),
+    }
+
+def load_embedder(name: str) -> EmbedScorer:
+    """cascade 1단계 임베딩 모델(AutoModel, torch 전용 — HF_BACKEND 와 무관하게 fp32/fp16)."""
+    from transformers import AutoTokenizer, AutoModel
+    _init_torch()
+    kw = {"torch_dtype": torch.float16} if (DEVICE >= 0 and FP16) else {}
+    tok = _from_pretrained(AutoTokenizer, name)
+    model = _from_pretrained(AutoModel, name, **kw)
+    model.eval()
+    if DEVICE >= 0:
+        model.to(f"cuda:{DEVICE}")
+    return EmbedScorer(name, model, tok)
+
+def load_pipelines(zsl_model_name: str, nli_model_name: str):
+    """체크포인트별로 모델/토크나이저를 한 번만 올리고 두 파이프라인이 공유한다."""
+    try:
+        from transformers import pipeline
+    except Exception as e:
+        raise RuntimeError("transformers 패키지가 필요합니다. pip install transformers") from e
+    zm, zt = _load_checkpoint(zsl_model_name)
+    if _same_checkpoint(zsl_model_name, nli_model_name):
+        nm, nt = zm, zt
+    else:
+        nm, nt = _load_checkpoint(nli_model_name)
+    z = n = None
+    try:
+        # 레거시 핸들(같은 모델 객체 공유). 추론 경로는 PairScorer 를 사용한다
+        kw = {"device": DEVICE} if (DEVICE >= 0 and HF_BACKEND.startswith("torch")) else {}
+        z = pipeline("zero-shot-classification", model=zm, tokenizer=zt, **kw)
+        n = pipeline("text-classification",      model=nm, tokenizer=nt, **kw)
+    except Exception as e:
+        print(f"[HF][backend] {HF_BACKEND} 모델로 transformers 파이프라인 생성 불가(무시):", e)
+    zs = PairScorer(zsl_model_name, zm, zt)
+    ns = zs if nm is zm else PairScorer(nli_model_name, nm, nt)
+    return z, n, zs, ns
+
+def build_bundle(zsl_name: str, nli_name: str) -> ModelBundle:
+    """새 세대 묶음 생성(현재 묶음과 무관 — 교체 전까지 요청에 보이지 않음)."""
+    global _model_gen
+    z, n, zs, ns = load_pipelines(zsl_name, nli_name)
+    emb = load_embedder(CASCADE_MODEL) if CASCADE_MODEL else None
+    with _gen_lock:
+        _model_gen += 1
+        gen = _model_gen
+    return ModelBundle(gen, zsl_name, nli_name, HF_BACKEND, z, n, zs, ns, emb)
+
+def swap_bundle(new: ModelBundle):
+    """현재 묶음을 new 로 원자 교체하고 이전 묶음을 반환. 이미 참조를 쥔 요청은 이전 묶음으로 끝난다."""
+    global _bundle, ZSL_MODEL_NAME, NLI_MODEL_NAME
+    old, _bundle = _bundle, new
+    ZSL_MODEL_NAME, NLI_MODEL_NAME = new.zsl_name, new.nli_name
+    if old is not None:
+        _retired[:] = [r for r in _retired if r() is not None] + [weakref.ref(old)]
+    return old
+
+class ModelsNotReady(RuntimeError):
+    """기동 중(모델 로드·워밍업 전) 추론 요청 → 503."""
+
+def current_bundle() -> ModelBundle:
+    b = _bundle
+    if b is None:
+        start_background()  # 외부 WSGI 서버로 임포트된 경우 첫 요청/프로브가 로드를 시작
+        raise ModelsNotReady("모델이 아직 로드되지 않았습니다")
+    return b
 
 def load_models(zsl_name: str = None, nli_name: str = None):
-    """전역 파이프라인(zero_shot/nli_clf)과 모델명(ZSL_MODEL_NAME/NLI_MODEL_NAME)을 안전하게 갱신."""
-    global zero_shot, nli_clf, ZSL_MODEL_NAME, NLI_MODEL_NAME
-    if zsl_name: ZSL_MODEL_NAME = zsl_name
-    if nli_name: NLI_MODEL_NAME = nli_name
-    zero_shot, nli_clf = load_pipelines(ZSL_MODEL_NAME, NLI_MODEL_NAME)
+    """동기 로드 후 교체(기동·CLI 용). 운영 중 교체는 reload_models(백그라운드 빌드·워밍·점검)."""
+    swap_bundle(build_bundle(zsl_name or ZSL_MODEL_NAME, nli_name or NLI_MODEL_NAME))
+
+# ---- 기동 단계: 임포트 시에는 아무것도 로드하지 않고 startup()/start_background() 에서 로드·워밍업
+_ready = threading.Event()
+_startup_lock = threading.Lock()
+_startup_state = {"state": "idle"}
+
+def startup(warm: bool = True) -> dict:
+    """모델 로드(+워밍업) 후 준비 완료 표시. 여러 번 불려도 한 번만 수행(멱등)."""
+    with _startup_lock:
+        if _ready.is_set() or _startup_state["state"] == "loading":
+            return dict(_startup_state)
+        _startup_state.update(state="loading", error=None)
+    t0 = time.monotonic()
+    try:
+        if _bundle is None:
+            load_models()
+        t1 = time.monotonic()
+        warm_stages = _warm_bundle(_bundle) if warm else {}
+        t2 = time.monotonic()
+        _startup_state.update(state="ready", warmup=warm_stages,
+                              timings_ms={"load": (t1 - t0) * 1000.0, "warm": (t2 - t1) * 1000.0})
+        _ready.set()
+        print(f"[HF][startup] ready gen={_bundle.gen} load={t1 - t0:.1f}s warm={t2 - t1:.1f}s")
+    except Exception as e:
+        _startup_state.update(state="failed", error=str(e))
+        print("[HF][startup] 모델 로드 실패:", e)
+    return dict(_startup_state)
 
-# 초기 모델 로드
-load_models()
+def start_background():
+    """서버를 먼저 띄우고(/health 응답) 모델은 백그라운드에서 로드. /ready 가 200 이 되면 트래픽 투입."""
+    if _ready.is_set() or _startup_state["state"] in ("loading", "failed"):
+        return
+    threading.Thread(target=startup, name="hf-startup", daemon=True).start()
 
 # 표준 감정 라벨(11)
 DEFAULT_EMOTION_LABELS = [
@@ -183,46 +903,488 @@ def _topk_mean(arr: List[float], k: int) -> float:
     k = max(1, min(k, len(arr)))
     return float(sum(sorted(arr, reverse=True)[:k]) / k)
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 캐시 유틸: 스레드 안전 LRU (+선택 TTL, 대략적 바이트 상한)
+# ─────────────────────────────────────────────────────────────────────────────
+class LRUCache:
+    def __init__(self, max_items: int = 1024, ttl_sec: float = 0.0, max_bytes: int = 0, sizeof=None):
+        self.max_items = max(1, int(max_items))
+        self.ttl = float(ttl_sec or 0.0)
+        self.max_bytes = int(max_bytes or 0)
+        self.sizeof = sizeof or (lambda v: len(json.dumps(v, ensure_ascii=False)))
+        self._d = OrderedDict()  # key -> (value, nbytes, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            ent = self._d.get(key)
+            if ent is None:
+                self.misses += 1
+                return None
+            if ent[2] and ent[2] < now:
+                self._drop(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._d.move_to_end(key)
+            self.hits += 1
+            return ent[0]
+
+    def put(self, key, value, ttl: float = None):
+        # ttl: 이 항목만의 만료(초) — 생략 시 캐시 기본값
+        nbytes = int(self.sizeof(value)) if self.max_bytes else 0
+        if self.max_bytes and nbytes > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else float(ttl)
+        exp = (time.monotonic() + ttl) if ttl > 0 else 0.0
+        with self._lock:
+            if key in self._d:
+                self._drop(key)
+            self._d[key] = (value, nbytes, exp)
+            self._bytes += nbytes
+            while len(self._d) > self.max_items or (self.max_bytes and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._d)))
+                self.evictions += 1
+
+    def peek(self, key):
+        # 통계·LRU 순서에 영향 없는 조회(만료 항목은 None)
+        with self._lock:
+            ent = self._d.get(key)
+        if ent is None or (ent[2] and ent[2] < time.monotonic()):
+            return None
+        return ent[0]
+
+    def discard(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        ent = self._d.pop(key, None)
+        if ent is not None:
+            self._bytes -= ent[1]
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._d), "bytes": self._bytes,
+                "max_items": self.max_items, "max_bytes": self.max_bytes, "ttl_sec": self.ttl,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions, "expired": self.expired,
+            }
+
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+sentence_cache = LRUCache(SC_MAX_ITEMS, 0, int(SC_MAX_MB * 1024 * 1024))
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 마이크로 배칭: 동시 요청을 수 ms 동안 모아 한 번의 패딩 배치로 추론
+#  - 키(파이프라인 종류+옵션)가 같은 작업만 합치고, 결과는 호출자별로 잘라서 반환
+#  - 대기 중인 호출자가 모두 모이면 max_wait 전이라도 즉시 실행(단일 요청 지연 無)
+#  - 작업은 제출한 요청의 기한을 들고 다닌다: 기한이 지난 작업은 실행 전에 빼고, 호출자는 기한까지만 기다린다
+# ─────────────────────────────────────────────────────────────────────────────
+class _MBJob:
+    __slots__ = ("key", "items", "result", "error", "done", "t_enq", "deadline")
+
+    def __init__(self, key, items, deadline=None):
+        self.key = key
+        self.items = items
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.t_enq = time.monotonic()
+        self.deadline = deadline
+
+class MicroBatcher:
+    """runner(key, items, deadline) -> 결과 리스트(items 와 같은 길이/순서)를 키별로 묶어 호출.
+    deadline 은 합친 작업 중 가장 늦은 기한(하나라도 기한이 없으면 None)."""
+    def __init__(self, runner, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.runner = runner
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._q = None
+        self._thread = None
+        self._pid = None
+        self._active = 0  # submit 후 결과 대기 중인 호출자 수
+        self._stats = {"batches": 0, "jobs": 0, "items": 0, "max_items": 0,
+                       "wait_ms_sum": 0.0, "wait_ms_max": 0.0, "run_ms_sum": 0.0, "errors": 0, "expired": 0}
+
+    def _ensure_worker(self):
+        # fork(멀티 워커) 이후에는 스레드가 없으므로 프로세스마다 새로 띄운다
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._q = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._loop, name="hf-microbatch", daemon=True)
+            self._thread.start()
+
+    def submit(self, key, items: list) -> list:
+        items = list(items)
+        if not items:
+            return []
+        deadline = current_deadline()
+        check_deadline("batcher", deadline)
+        if not MB_ENABLE:
+            return list(self.runner(key, items, deadline))
+        self._ensure_worker()
+        job = _MBJob(key, items, deadline)
+        with self._lock:
+            self._active += 1
+        try:
+            self._q.put(job)
+            # 기한까지만 기다린다: 늦은 작업은 실행 직전에 빠지거나 결과가 버려진다
+            if not job.done.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+                raise DeadlineExceeded("batcher")
+        finally:
+            with self._lock:
+                self._active -= 1
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _loop(self):
+        pending = []  # 키가 달라 이번 라운드에 합치지 못한 작업
+        while True:
+            first = pending.pop(0) if pending else self._q.get()
+            batch = [first]
+            n = len(first.items)
+            for j in [j for j in pending if j.key == first.key]:
+                if n >= self.max_batch: break
+                pending.remove(j); batch.append(j); n += len(j.items)
+            deadline = time.monotonic() + self.max_wait
+            while n < self.max_batch:
+                with self._lock:
+                    everyone_in = (len(batch) + len(pending)) >= self._active
+                if everyone_in and self._q.empty():
+                    break
+                remain = deadline - time.monotonic()
+                if remain <= 0: break
+                try:
+                    job = self._q.get(timeout=remain)
+                except queue.Empty:
+                    break
+                if job.key == first.key:
+                    batch.append(job); n += len(job.items)
+                else:
+                    pending.append(job)
+            self._run(first.key, batch)
+            first = batch = job = None  # 대기 중 이전 세대 스코어러를 붙잡지 않도록
+
+    def _run(self, key, batch):
+        t0 = time.monotonic()
+        expired = [j for j in batch if j.deadline is not None and j.deadline <= t0]
+        if expired:
+            for j in expired:
+                j.error = DeadlineExceeded("batcher")
+                j.done.set()
+            batch = [j for j in batch if j.error is None]
+            with self._lock:
+                self._stats["expired"] += len(expired)
+            if not batch:
+                return
+        items = [it for j in batch for it in j.items]
+        dls = [j.deadline for j in batch]
+        deadline = None if None in dls else max(dls)
+        failed = False
+        try:
+            outs = list(self.runner(key, items, deadline))
+            off = 0
+            for j in batch:
+                j.result = outs[off:off + len(j.items)]
+                off += len(j.items)
+        except Exception as e:
+            failed = True
+            for j in batch:
+                j.error = e
+        t1 = time.monotonic()
+        with self._lock:
+            st = self._stats
+            st["batches"] += 1
+            st["jobs"] += len(batch)
+            st["items"] += len(items)
+            st["max_items"] = max(st["max_items"], len(items))
+            st["run_ms_sum"] += (t1 - t0) * 1000.0
+            if failed: st["errors"] += 1
+            M_MB_ITEMS.observe(len(items))
+            for j in batch:
+                w = (t0 - j.t_enq) * 1000.0
+                M_MB_WAIT.observe(w / 1000.0)
+                st["wait_ms_sum"] += w
+                st["wait_ms_max"] = max(st["wait_ms_max"], w)
+        for j in batch:
+            j.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            st = dict(self._stats)
+            active = self._active
+        b = max(1, st["batches"]); jb = max(1, st["jobs"])
+        return {
+            "enabled": MB_ENABLE,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": st["batches"],
+            "jobs": st["jobs"],
+            "items": st["items"],
+            "errors": st["errors"],
+            "expired_jobs": st["expired"],
+            "in_flight": active,
+            "avg_items_per_batch": st["items"] / b,
+            "avg_jobs_per_batch": st["jobs"] / b,
+            "max_items_per_batch": st["max_items"],
+            "avg_queue_wait_ms": st["wait_ms_sum"] / jb,
+            "max_queue_wait_ms": st["wait_ms_max"],
+            "avg_run_ms": st["run_ms_sum"] / b,
+        }
+
+def _mb_runner(key, items, deadline=None):
+    kind = key[0]
+    if kind == "pairs":
+        return key[1].logits(items, deadline)
+    if kind == "embed":
+        return key[1].label_scores(items)
+    raise ValueError(f"unknown batch kind: {kind}")
+
+batcher = MicroBatcher(_mb_runner, MB_MAX_BATCH, MB_MAX_WAIT_MS)
+
+_ZSL_DEFAULT_TEMPLATE = "This example is {}."  # transformers zero-shot 파이프라인 기본값
+
+def _pair_logits(scorer: PairScorer, pairs: List[Tuple[str, str]]) -> List[List[float]]:
+    return batcher.submit(("pairs", scorer), [(str(p), str(h)) for p, h in pairs])
+
+def _nli_triple(lg: List[float]) -> Dict[str, float]:
+    c, n, e = _softmax(lg)
+    return {"entail": float(e), "neutral": float(n), "contradict": float(c)}
+
+def _entail_vs_contra(lg: List[float]) -> float:
+    # zero-shot multi_label: [contradiction, entailment] 만 softmax 한 entail 확률
+    return float(_softmax([lg[0], lg[2]])[1])
+
+def run_zero_shot(sequences: List[str], labels: List[str], template: str = None, multi_label: bool = True,
+                  bundle: ModelBundle = None) -> List[dict]:
+    """zero-shot 결과 리스트({labels, scores}, 점수 내림차순) — 파이프라인과 같은 규칙으로 로짓에서 계산."""
+    b = bundle or current_bundle()
+    tpl = template or _ZSL_DEFAULT_TEMPLATE
+    hyps = [tpl.format(l) for l in labels]
+    lgs = _pair_logits(b.zsl, [(s, h) for s in sequences for h in hyps])
+    out = []
+    for i in range(len(sequences)):
+        rows = lgs[i * len(hyps):(i + 1) * len(hyps)]
+        if multi_label:
+            scores = [_entail_vs_contra(r) for r in rows]
+        else:
+            scores = _softmax([r[2] for r in rows])
+        ranked = sorted(zip(labels, scores), key=lambda x: x[1], reverse=True)
+        out.append({"sequence": sequences[i], "labels": [l for l, _ in ranked], "scores": [float(v) for _, v in ranked]})
+    return out
+
+def run_nli(pairs: List[Tuple[str, str]], bundle: ModelBundle = None) -> List[Dict[str, float]]:
+    """(premise, hypothesis) 쌍별 NLI 결과({entail, neutral, contradict}) — 한 번에 배치 추론."""
+    return [_nli_triple(r) for r in _pair_logits((bundle or current_bundle()).nli, pairs)]
+
+def _sentence_keys(kind: str, sents: List[str], extras: List[str] = None, bundle: ModelBundle = None) -> List[str]:
+    # 세대(gen)가 키에 들어가므로 교체 후 이전 세대 항목은 조회되지 않고 LRU 로 밀려난다
+    b = bundle or current_bundle()
+    if kind == "emo":
+        ver = [b.zsl_name, b.gen, b.backend, FP16, EMOTION_TEMPLATE, DEFAULT_EMOTION_LABELS]
+        return [_digest([kind, ver, s]) for s in sents]
+    ver = [b.nli_name, b.gen, b.backend, FP16]
+    return [_digest([kind, ver, x, s]) if x else None for s, x in zip(sents, extras)]
+
+def _cascade_split(b: ModelBundle, sents: List[str], idx: List[int]):
+    """감정 캐시 미스 문장(idx)을 1단계로 거른다 → (승급 idx, 1단계 확정 {i: row}, 섀도 idx 집합, {i: 코사인}).
+    섀도: 통과 문장 중 CASCADE_SHADOW 비율을 교차 인코더로도 계산(일치율 측정, 응답은 교차 인코더 값)."""
+    cos = batcher.submit(("embed", b.emb), [sents[i] for i in idx])
+    up, served, shadow, reasons = [], {}, set(), {}
+    for i, c in zip(idx, cos):
+        why = b.emb.decide(c)
+        if why is not None:
+            up.append(i); reasons[why] = reasons.get(why, 0) + 1
+        elif CASCADE_SHADOW > 0 and random.random() < CASCADE_SHADOW:
+            up.append(i); shadow.add(i)
+        else:
+            served[i] = b.emb.to_probs(c)
+    b.emb.count(len(served), len(up) - len(shadow), len(shadow), reasons)
+    M_CASCADE.inc(len(served), "served"); M_CASCADE.inc(len(up) - len(shadow), "escalated"); M_CASCADE.inc(len(shadow), "shadow")
+    return up, served, shadow, dict(zip(idx, cos))
+
+def score_sentences(sents: List[str], core_belief="", use_cache: bool = True,
+                    bundle: ModelBundle = None) -> Tuple[List[Dict[str, float]], List[Dict[str, float]]]:
+    """문장별 감정 확률(DEFAULT_EMOTION_LABELS)과 핵심믿음 NLI 를 계산.
+    - core_belief 는 문자열(전 문장 공통) 또는 문장별 리스트(여러 문서를 한 배치로 묶을 때)
+    - 문장 캐시에 있는 값은 재사용하고, 없는 문장만 모델에 보낸다(편집/추가된 문장만 재계산)
+    - 두 모델이 같은 체크포인트면 문장당 11개 감정 가설 + 핵심믿음 가설을 한 번의 배치로 보낸다
+    - cascade(b.emb) 가 있으면 감정은 1단계 임베딩으로 먼저 보고 애매한 문장만 교차 인코더로 보낸다(1단계 결과는 캐시 안 함)
+    반환 nli_rows: 공통 핵심믿음이 비면 [], 문장별 리스트면 핵심믿음 없는 문장 자리는 None."""
+    b = bundle or current_bundle()
+    per_cb = not isinstance(core_belief, str)
+    cbs = list(core_belief) if per_cb else [core_belief] * len(sents)
+    hyps = [EMOTION_TEMPLATE.format(l) for l in DEFAULT_EMOTION_LABELS]
+    emo_rows = [None] * len(sents)
+    nli_rows = [None] * len(sents)
+    ekeys = nkeys = None
+    if SC_ENABLE and use_cache:
+        with M_STAGE.time("cache_lookup"):
+            ekeys = _sentence_keys("emo", sents, bundle=b)
+            nkeys = _sentence_keys("nli", sents, cbs, bundle=b)
+            emo_rows = [sentence_cache.get(k) for k in ekeys]
+            nli_rows = [sentence_cache.get(k) if k else None for k in nkeys]
+
+    emo_miss = [i for i, r in enumerate(emo_rows) if r is None]
+    casc = None
+    if b.emb is not None and emo_miss:
+        with M_STAGE.time("cascade"):
+            emo_miss, served, shadow, cos = _cascade_split(b, sents, emo_miss)
+        for i, row in served.items():
+            emo_rows[i] = row
+        casc = (shadow, cos)
+    nli_miss = [i for i, r in enumerate(nli_rows) if r is None and cbs[i]]
+    fused = bool(nli_miss) and b.zsl is b.nli
+
+    # 캐시 미스 문장만 (문장, 가설) 쌍으로 펼친다: spans = (문장 idx, 감정 시작 offset, NLI offset)
+    pairs, spans = [], []
+    emo_set, nli_set = set(emo_miss), (set(nli_miss) if fused else set())
+    for i, s in enumerate(sents):
+        es = ni = -1
+        if i in emo_set:
+            es = len(pairs); pairs.extend((s, h) for h in hyps)
+        if i in nli_set:
+            ni = len(pairs); pairs.append((s, cbs[i]))
+        if es >= 0 or ni >= 0:
+            spans.append((i, es, ni))
+    lgs = []
+    if pairs:
+        with M_STAGE.time("fused_forward" if fused else "zsl_forward"):  # 배처 대기 포함
+            lgs = _pair_logits(b.zsl, pairs)
+
+    for i, es, ni in spans:
+        if es >= 0:
+            emo_rows[i] = {l: _entail_vs_contra(r) for l, r in zip(DEFAULT_EMOTION_LABELS, lgs[es:es + len(hyps)])}
+            if ekeys: sentence_cache.put(ekeys[i], emo_rows[i])
+            if casc: b.emb.record(casc[1][i], emo_rows[i], shadow=i in casc[0])
+        if ni >= 0:
+            nli_rows[i] = _nli_triple(lgs[ni])
+            if nkeys: sentence_cache.put(nkeys[i], nli_rows[i])
+    if nli_miss and not fused:
+        with M_STAGE.time("nli_forward"):
+            nli_out = run_nli([(sents[i], cbs[i]) for i in nli_miss], bundle=b)
+        for i, r in zip(nli_miss, nli_out):
+            nli_rows[i] = r
+            if nkeys: sentence_cache.put(nkeys[i], r)
+    if not per_cb and not core_belief:
+        nli_rows = []
+    return emo_rows, nli_rows
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Firestore or LocalStore 추상화
 # ─────────────────────────────────────────────────────────────────────────────
 class Store:
+    """경로 키 문서 저장소. firestore 또는 local(SQLite WAL, 경로 PRIMARY KEY 로 접두 스캔)."""
+    # 부분 인덱스는 질의 WHERE 가 이 조건을 문자 그대로 포함해야 쓰인다
+    _EVAL_RANGE = "WHERE path >= 'eval_runs/' AND path < 'eval_runs0'"
+
     def __init__(self):
         # 환경변수로 강제 선택 가능: HF_STORE_MODE=local|firestore
         pref = (os.getenv("HF_STORE_MODE") or "").lower()
         if pref in ("local", "firestore"):
             self.mode = pref
         else:
-            self.mode = "firestore" if HAS_FIRESTORE else "local"
+            self.mode = "firestore" if _has_firestore() else "local"
 
         if self.mode == "firestore":
             try:
-                self.db = firestore.Client()  # ADC 없으면 여기서 예외
+                self.db = _load_firestore().Client()  # ADC 없으면 여기서 예외
             except Exception as e:
                 print("[HF][Store] Firestore ADC 미설정 → local 스토어로 폴백:", e)
                 self.mode = "local"
 
         if self.mode == "local":
+            # LOCAL_STORE: 구(舊) JSON 파일(있으면 최초 1회 이관) / LOCAL_STORE_DB: SQLite 파일
             self.base = os.getenv("LOCAL_STORE", "./_hf_local_store.json")
-            if not os.path.exists(self.base):
-                with open(self.base, "w", encoding="utf-8") as f:
-                    json.dump({}, f, ensure_ascii=False, indent=2)
-
-    def _read_local(self):
-        with open(self.base, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    def _write_local(self, data):
-        with open(self.base, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
+            self.db_path = os.getenv("LOCAL_STORE_DB") or (os.path.splitext(self.base)[0] + ".sqlite3")
+            self._tls = threading.local()
+            conn = self._conn()
+            conn.execute("CREATE TABLE IF NOT EXISTS docs (path TEXT PRIMARY KEY, doc TEXT NOT NULL, updated_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+            # 평가 실행 보조 인덱스: (scope, runId) — eval_runs/ 문서만 담는 부분 표현식 인덱스
+            conn.execute("CREATE INDEX IF NOT EXISTS docs_eval_scope_run ON docs("
+                         "json_extract(doc, '$.scope'), json_extract(doc, '$.runId')) " + self._EVAL_RANGE)
+            if os.path.exists(self.base):
+                migrate_json_store(self, self.base)
+
+    # ---- local(SQLite) 내부 유틸
+    def _conn(self):
+        # 스레드(및 fork 된 프로세스)별 연결. WAL 로 다중 읽기 + 단일 쓰기 동시성 확보
+        c = getattr(self._tls, "conn", None)
+        if c is not None and getattr(self._tls, "pid", None) == os.getpid():
+            return c
+        import sqlite3
+        c = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA busy_timeout=30000")
+        self._tls.conn, self._tls.pid = c, os.getpid()
+        return c
+
+    @contextmanager
+    def _tx(self):
+        # 쓰기 트랜잭션(원자적). 같은 파일의 다른 프로세스/스레드 쓰기와 직렬화된다
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            yield c
+            c.execute("COMMIT")
+        except BaseException:
+            # COMMIT 실패(SQLITE_BUSY 등)도 여기로 → 연결을 항상 autocommit 으로 되돌린다
+            if c.in_transaction:
+                c.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _prefix_end(prefix: str) -> str:
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else "\U0010ffff"
+
+    @staticmethod
+    def _merge_put(c, path: str, doc: dict, merge: bool):
+        if merge:
+            row = c.execute("SELECT doc FROM docs WHERE path=?", (path,)).fetchone()
+            cur = json.loads(row[0]) if row else None
+            if isinstance(cur, dict):
+                cur.update(doc); doc = cur
+        c.execute("INSERT OR REPLACE INTO docs(path, doc, updated_at) VALUES(?,?,?)",
+                  (path, json.dumps(doc, ensure_ascii=False), time.time()))
+
+    def scan_prefix(self, prefix: str, limit: int = None, reverse: bool = False):
+        """local: 경로 접두 범위 스캔 [(path, doc)] (경로 정렬)."""
+        sql = "SELECT path, doc FROM docs WHERE path >= ? AND path < ? ORDER BY path " + ("DESC" if reverse else "ASC")
+        args = [prefix, self._prefix_end(prefix)]
+        if limit:
+            sql += " LIMIT ?"; args.append(int(limit))
+        return [(p, json.loads(d)) for p, d in self._conn().execute(sql, args)]
+
+    # ---- 공개 API
     def get_doc(self, path: str) -> dict:
         if self.mode == "firestore":
             ref = self.db.document(path)
             snap = ref.get()
             return snap.to_dict() or {}
-        data = self._read_local()
-        return data.get(path, {})
+        row = self._conn().execute("SELECT doc FROM docs WHERE path=?", (path,)).fetchone()
+        return json.loads(row[0]) if row else {}
 
     def set_doc(self, path: str, doc: dict, merge=True):
         if self.mode == "firestore":
@@ -230,12 +1392,25 @@ class Store:
             if merge: ref.set(doc, merge=True)
             else: ref.set(doc)
             return
-        data = self._read_local()
-        if merge and path in data and isinstance(data[path], dict):
-            cur = data[path]; cur.update(doc); data[path] = cur
-        else:
-            data[path] = doc
-        self._write_local(data)
+        with self._tx() as c:
+            self._merge_put(c, path, doc, merge)
+
+    def get_counter(self, key: str) -> int:
+        """프로세스 간 공유 카운터(변경 세대). local: meta 테이블, firestore: _meta/{key} 문서."""
+        if self.mode == "firestore":
+            return int((self.db.document(f"_meta/{key}").get().to_dict() or {}).get("v", 0))
+        row = self._conn().execute("SELECT v FROM meta WHERE k=?", (key,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def bump_counter(self, key: str) -> int:
+        """카운터 +1 후 새 값."""
+        if self.mode == "firestore":
+            ref = self.db.document(f"_meta/{key}")
+            ref.set({"v": firestore.Increment(1)}, merge=True)
+            return int((ref.get().to_dict() or {}).get("v", 0))
+        with self._tx() as c:
+            c.execute("INSERT INTO meta(k, v) VALUES(?, '1') ON CONFLICT(k) DO UPDATE SET v = CAST(v AS INTEGER) + 1", (key,))
+            return int(c.execute("SELECT v FROM meta WHERE k=?", (key,)).fetchone()[0])
 
     def list_feedback(self, uid: str = None, date_from=None, date_to=None, limit=10000):
         """피드백 표본 나열(학습용)."""
@@ -253,21 +1428,18 @@ class Store:
             return out
 
         # local 모드
-        data = self._read_local()
         out = []
         if uid and uid != "*":
             prefix = f"users/{uid}/feedback/"
-            for k, v in data.items():
-                if k.startswith(prefix):
-                    one = dict(v)
-                    one["_id"] = k.split(prefix, 1)[1]
-                    one["_uid"] = uid
-                    out.append(one)
+            for k, v in self.scan_prefix(prefix):
+                one = dict(v)
+                one["_id"] = k.split(prefix, 1)[1]
+                one["_uid"] = uid
+                out.append(one)
             return out
 
         # uid=None 또는 uid="*": 모든 유저 스캔
-        for k, v in data.items():
-            if not k.startswith("users/"): continue
+        for k, v in self.scan_prefix("users/"):
             if "/feedback/" not in k: continue
             parts = k.split("/")
             if len(parts) >= 4:
@@ -278,7 +1450,303 @@ class Store:
                 out.append(one)
         return out
 
-store = Store()
+    def iter_feedback(self):
+        """모든 사용자의 피드백을 한 번의 스트리밍 스캔으로 순회(_uid/_id 포함)."""
+        if self.mode == "firestore":
+            for d in self.db.collection_group("feedback").stream():
+                parts = d.reference.path.split("/")
+                if len(parts) != 4 or parts[0] != "users":
+                    continue
+                row = d.to_dict() or {}
+                row["_id"] = d.id
+                row["_uid"] = parts[1]
+                yield row
+            return
+        cur = self._conn().execute(
+            "SELECT path, doc FROM docs WHERE path >= 'users/' AND path < 'users0' AND path LIKE 'users/%/feedback/%'")
+        for k, v in cur:
+            parts = k.split("/")
+            if len(parts) >= 4:
+                one = json.loads(v)
+                one["_id"] = parts[3]
+                one["_uid"] = parts[1]
+                yield one
+
+    def list_eval_runs(self, scope: str = None, since: str = None, until: str = None,
+                       limit: int = 50, cursor: str = None, desc: bool = True) -> List[dict]:
+        """평가 실행을 runId(시간) 순으로 범위/페이지 조회. scope 지정 시 (scope, runId) 인덱스 사용.
+        since ≤ runId < until, cursor 는 직전 페이지 마지막 runId(그 다음부터)."""
+        if self.mode == "firestore":
+            q = self.db.collection("eval_runs")
+            if scope: q = q.where("scope", "==", scope)
+            if since: q = q.where("runId", ">=", since)
+            if until: q = q.where("runId", "<", until)
+            q = q.order_by("runId", direction=firestore.Query.DESCENDING if desc else firestore.Query.ASCENDING)
+            if cursor: q = q.start_after({"runId": cursor})
+            return [d.to_dict() or {} for d in q.limit(int(limit)).stream()]
+
+        lo, hi = (since, until)
+        if cursor:
+            if desc: hi = min(hi, cursor) if hi else cursor
+            else: lo = max(lo, cursor + "\x00") if lo else cursor + "\x00"
+        if not scope:
+            # 경로 = eval_runs/{runId} 이므로 PRIMARY KEY 범위 스캔으로 충분
+            sql = "SELECT doc FROM docs WHERE path >= ? AND path < ?"
+            args = ["eval_runs/" + (lo or ""), "eval_runs/" + hi if hi else "eval_runs0"]
+            sql += " ORDER BY path " + ("DESC" if desc else "ASC")
+        else:
+            sql = "SELECT doc FROM docs " + self._EVAL_RANGE + " AND json_extract(doc, '$.scope') = ?"
+            args = [scope]
+            if lo: sql += " AND json_extract(doc, '$.runId') >= ?"; args.append(lo)
+            if hi: sql += " AND json_extract(doc, '$.runId') < ?"; args.append(hi)
+            sql += " ORDER BY json_extract(doc, '$.runId') " + ("DESC" if desc else "ASC")
+        sql += " LIMIT ?"; args.append(int(limit))
+        return [json.loads(d) for (d,) in self._conn().execute(sql, args)]
+
+    def transact(self, path: str, fn):
+        """원자적 읽기-수정-쓰기: fn(path 의 현재 문서) → [(path, doc, merge)] 를 한 트랜잭션으로 기록."""
+        if self.mode == "firestore":
+            ref = self.db.document(path)
+
+            @firestore.transactional
+            def _run(tx):
+                writes = fn(ref.get(transaction=tx).to_dict() or {})
+                for p, doc, merge in writes:
+                    if merge: tx.set(self.db.document(p), doc, merge=True)
+                    else: tx.set(self.db.document(p), doc)
+                return writes
+            return _run(self.db.transaction())
+        with self._tx() as c:
+            row = c.execute("SELECT doc FROM docs WHERE path=?", (path,)).fetchone()
+            writes = fn(json.loads(row[0]) if row else {})
+            for p, doc, merge in writes:
+                self._merge_put(c, p, doc, merge)
+        return writes
+
+    def set_docs(self, items, chunk: int = 400):
+        """여러 문서 쓰기. items: [(path, doc, merge)] — local 은 한 트랜잭션, firestore 는 batch(≤500) 커밋."""
+        items = list(items)
+        if not items:
+            return
+        if self.mode == "firestore":
+            for i in range(0, len(items), chunk):
+                batch = self.db.batch()
+                for path, doc, merge in items[i:i + chunk]:
+                    ref = self.db.document(path)
+                    if merge: batch.set(ref, doc, merge=True)
+                    else: batch.set(ref, doc)
+                batch.commit()
+            return
+        with self._tx() as c:
+            for path, doc, merge in items:
+                self._merge_put(c, path, doc, merge)
+
+def migrate_json_store(st: Store, json_path: str, force: bool = False) -> int:
+    """구 JSON 로컬 스토어를 SQLite 로 1회 이관(한 트랜잭션). 이관한 문서 수 반환."""
+    with st._tx() as c:
+        done = c.execute("SELECT v FROM meta WHERE k='migrated_from'").fetchone()
+        if done and not force:
+            return 0
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f) or {}
+        for path, doc in data.items():
+            if isinstance(doc, dict):
+                c.execute("INSERT OR REPLACE INTO docs(path, doc, updated_at) VALUES(?,?,?)",
+                          (path, json.dumps(doc, ensure_ascii=False), time.time()))
+        c.execute("INSERT OR REPLACE INTO meta(k, v) VALUES('migrated_from', ?)",
+                  (json.dumps({"path": os.path.abspath(json_path), "docs": len(data), "at": time.time()}),))
+    print(f"[HF][Store] {json_path} → {st.db_path} 이관 완료({len(data)}건)")
+    return len(data)
+
+class _LazyStore:
+    """첫 사용 시 Store 생성(임포트만으로 Firestore 연결·SQLite 파일 열기를 하지 않음)."""
+    def __init__(self):
+        self._st = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Store:
+        st = self._st
+        if st is None:
+            with self._lock:
+                if self._st is None:
+                    self._st = Store()
+                st = self._st
+        return st
+
+    def reset(self):
+        # fork 후 재연결용: 다음 사용 시 새로 만든다
+        self._st = None
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+store = _LazyStore()
+
+class WriteBehind:
+    """경로별로 합쳐지는(coalescing) 배경 쓰기 큐. put 은 메모리에만 넣고 즉시 반환한다.
+    - 같은 경로의 대기 쓰기는 하나로 합친다(전체 쓰기는 덮어쓰기, merge 쓰기는 필드 병합)
+    - 배경 스레드가 WB_FLUSH_MS 안에 모아 store.set_docs 로 일괄 기록(local 한 트랜잭션, firestore batch)
+    - 대기 경로가 WB_MAX_PENDING 이면 put 한 스레드가 직접 플러시(메모리 상한·역압)
+    - 읽기는 get_doc/sync 로 대기·기록 중인 값을 먼저 본다(read-your-writes). 종료 시 close() 가 모두 기록
+    실패한 배치는 (그사이 들어온 새 쓰기를 덮지 않게) 다시 대기열에 넣고 지수 백오프로 재시도한다."""
+    def __init__(self):
+        self._pid = None
+        self._init()
+
+    def _init(self):
+        self._lock = threading.Condition()
+        self._io = threading.Lock()      # 배치 꺼내기+기록을 직렬화 → 같은 경로의 쓰기 순서 보장
+        self._pending = OrderedDict()    # path → [doc, merge]
+        self._inflight = {}              # 기록 중인 path → [doc, merge]
+        self._thread = None
+        self._closed = False
+        self._backoff = 0.0
+        self.stats = {"queued": 0, "coalesced": 0, "written": 0, "batches": 0, "errors": 0,
+                      "sync_flushes": 0, "last_error": None, "last_flush_ms": None}
+
+    def reset(self):
+        # fork 후: 부모의 잠금/스레드 상태를 버리고 새로 시작
+        self._init()
+        self._pid = None
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="hf-write-behind", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _combine(old, doc: dict, merge: bool):
+        # old=[doc, merge] 위에 새 쓰기를 얹은 결과
+        if old is None or not merge:
+            return [dict(doc), merge]
+        return [{**old[0], **doc}, old[1]]
+
+    def put(self, path: str, doc: dict, merge: bool = False):
+        if not WB_ENABLE:
+            store.set_doc(path, doc, merge=merge)
+            return
+        with self._lock:
+            self.stats["queued"] += 1
+            if path in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[path] = self._combine(self._pending.get(path), doc, merge)
+            full = len(self._pending) >= WB_MAX_PENDING
+            self._ensure_thread()
+            self._lock.notify()
+        if full:
+            self.stats["sync_flushes"] += 1
+            self.flush()
+
+    def put_many(self, items):
+        for path, doc, merge in items:
+            self.put(path, doc, merge)
+
+    def get_doc(self, path: str) -> dict:
+        """대기/기록 중인 값을 반영한 문서(없으면 저장소)."""
+        with self._lock:
+            cur = self._pending.get(path) or self._inflight.get(path)
+            cur = [dict(cur[0]), cur[1]] if cur else None
+        if cur is None:
+            return store.get_doc(path)
+        return cur[0] if not cur[1] else {**store.get_doc(path), **cur[0]}
+
+    def sync(self, prefix: str = ""):
+        """prefix 아래 대기 쓰기가 있으면 기록을 마칠 때까지 플러시(범위 질의·트랜잭션 전 read-your-writes)."""
+        with self._lock:
+            dirty = any(p.startswith(prefix) for p in self._pending) or any(p.startswith(prefix) for p in self._inflight)
+        if dirty:
+            self.flush()
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._inflight)
+
+    def _take(self):
+        with self._lock:
+            batch = []
+            while self._pending and len(batch) < max(1, WB_BATCH):
+                path, (doc, merge) = self._pending.popitem(last=False)
+                self._inflight[path] = [doc, merge]
+                batch.append((path, doc, merge))
+            return batch
+
+    def _write(self, batch) -> bool:
+        t0 = time.perf_counter()
+        try:
+            store.set_docs(batch)
+        except Exception as e:
+            with self._lock:
+                for path, doc, merge in reversed(batch):
+                    self._inflight.pop(path, None)
+                    newer = self._pending.pop(path, None)
+                    cur = [doc, merge]
+                    if newer is not None:
+                        cur = self._combine(cur, newer[0], newer[1])
+                    self._pending[path] = cur
+                    self._pending.move_to_end(path, last=False)
+                self.stats["errors"] += 1
+                self.stats["last_error"] = str(e)
+                self._backoff = min(30.0, (self._backoff or 0.5) * 2)
+            print(f"[HF][write-behind] {len(batch)}건 기록 실패(재시도 예정):", e)
+            return False
+        dt = time.perf_counter() - t0
+        M_WB_FLUSH.observe(dt); M_WB_BATCH.observe(len(batch))
+        if any(_is_profile_path(path) for path, _, _ in batch):
+            _bump_profile_gen()
+        with self._lock:
+            for path, _, _ in batch:
+                self._inflight.pop(path, None)
+            self.stats["written"] += len(batch); self.stats["batches"] += 1
+            self.stats["last_flush_ms"] = dt * 1000.0
+            self._backoff = 0.0
+            self._lock.notify_all()
+        return True
+
+    def flush(self) -> bool:
+        """지금까지 들어온 쓰기를 모두 기록(호출 스레드에서). 실패가 있으면 False."""
+        ok = True
+        with self._io:
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                if not self._write(batch):
+                    ok = False
+                    break
+        return ok
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._lock.wait()
+                if self._closed and not self._pending:
+                    return
+                delay = self._backoff or WB_FLUSH_MS / 1000.0
+            time.sleep(delay)  # 잠깐 모아서(같은 경로 합치기) 한 번에
+            self.flush()
+
+    def close(self, timeout: float = 30.0):
+        """종료 시 남은 쓰기 기록(실패하면 timeout 안에서 재시도)."""
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        deadline = time.monotonic() + timeout
+        while self.depth():
+            if self.flush() or time.monotonic() >= deadline:
+                break
+            time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+        if self.depth():
+            print(f"[HF][write-behind] 종료 시 {self.depth()}건 기록 못 함:", self.stats["last_error"])
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"enabled": WB_ENABLE, "pending": len(self._pending), "inflight": len(self._inflight),
+                    "max_pending": WB_MAX_PENDING, "flush_ms": WB_FLUSH_MS, **self.stats}
+
+write_behind = WriteBehind()
+atexit.register(write_behind.close)
 
 def now_iso():
     return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -286,52 +1754,132 @@ def now_iso():
 # ─────────────────────────────────────────────────────────────────────────────
 # 캘리브레이션 유틸
 # ─────────────────────────────────────────────────────────────────────────────
-def train_platt(ps: List[float], ys: List[int], lr=1.0, iters=200, l2=1e-4) -> Tuple[float, float]:
-    """간단 로지스틱 회귀(a,b): σ(a p + b)"""
+# NumPy 가 있으면 벡터화 경로(_np), 없으면 순수 Python 경로로 동작한다.
+def _sigmoid(z: float) -> float:
+    # 큰 |z| 에서 math.exp 오버플로 방지
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+def _platt_targets(ys) -> Tuple[float, float]:
+    """Platt(1999) 평활 목표: 양성 (N+ + 1)/(N+ + 2), 음성 1/(N- + 2). 분리 가능한 소표본에서도 해가 유한하다.
+    소프트 라벨 y 는 y·t+ + (1-y)·t- 로 섞는다(N+ = Σy)."""
+    n_pos = float(sum(float(y) for y in ys))
+    n_neg = float(len(ys)) - n_pos
+    return (n_pos + 1.0) / (n_pos + 2.0), 1.0 / (n_neg + 2.0)
+
+def train_platt(ps: List[float], ys: List[int], lr=1.0, iters=200, l2=1e-4, tol=1e-7) -> Tuple[float, float]:
+    """로지스틱 회귀(a,b): σ(a p + b) — 평활 목표(_platt_targets)에 대한 뉴턴(IRLS, 2x2 헤시안+l2).
+    NumPy 경로와 같은 스텝이라 같은 해에 도달한다. 스텝이 tol 미만이면 조기 종료."""
+    if HAS_NUMPY and len(ps) > 0:
+        return _train_platt_np(ps, ys, lr, iters, l2, tol)
+    if not ps:
+        return 1.0, 0.0
+    t_pos, t_neg = _platt_targets(ys)
+    xs = [max(0.0, min(1.0, float(p))) for p in ps]
+    ts = [float(y) * t_pos + (1.0 - float(y)) * t_neg for y in ys]
     a, b = 1.0, 0.0
     for _ in range(iters):
-        grad_a = 0.0; grad_b = 0.0
-        hess_a = l2;  hess_b = l2
-        for p, y in zip(ps, ys):
-            x = max(0.0, min(1.0, float(p)))
-            z = a * x + b
-            s = 1.0 / (1.0 + math.exp(-z))
-            g = s - y
-            grad_a += g * x
-            grad_b += g
+        ga = gb = 0.0
+        haa = hbb = l2; hab = 0.0
+        for x, t in zip(xs, ts):
+            s = _sigmoid(a * x + b)
+            g = s - t
             h = s * (1 - s)
-            hess_a += h * x * x
-            hess_b += h
-        if hess_a > 0: a -= lr * grad_a / hess_a
-        if hess_b > 0: b -= lr * grad_b / hess_b
+            ga += g * x; gb += g
+            haa += h * x * x; hab += h * x; hbb += h
+        det = haa * hbb - hab * hab
+        if det <= 1e-300:
+            break
+        da = lr * (hbb * ga - hab * gb) / det
+        db = lr * (haa * gb - hab * ga) / det
+        a -= da; b -= db
+        if max(abs(da), abs(db)) < tol:
+            break
     return float(a), float(b)
 
+def _train_platt_np(ps, ys, lr=1.0, iters=200, l2=1e-4, tol=1e-7) -> Tuple[float, float]:
+    """IRLS/Newton(벡터화) — train_platt 순수 Python 경로와 같은 목표·스텝."""
+    x = np.clip(np.asarray(ps, dtype=np.float64), 0.0, 1.0)
+    y = np.asarray(ys, dtype=np.float64)
+    t_pos, t_neg = _platt_targets(ys)
+    t = y * t_pos + (1.0 - y) * t_neg
+    X = np.stack([x, np.ones_like(x)], axis=1)          # (n, 2)
+    w = np.array([1.0, 0.0])
+    ridge = l2 * np.eye(2)
+    for _ in range(iters):
+        s = 0.5 * (1.0 + np.tanh(0.5 * (X @ w)))           # 안정적인 σ
+        g = X.T @ (s - t)
+        h = s * (1.0 - s)
+        H = (X * h[:, None]).T @ X + ridge
+        try:
+            step = lr * np.linalg.solve(H, g)
+        except np.linalg.LinAlgError:
+            break
+        w = w - step
+        if float(np.max(np.abs(step))) < tol:
+            break
+    return float(w[0]), float(w[1])
+
 def apply_platt(p: float, a: float, b: float) -> float:
     x = max(0.0, min(1.0, float(p)))
     z = a * x + b
-    return 1.0 / (1.0 + math.exp(-z))
-
-def train_isotonic(ps: List[float], ys: List[int], bins=10) -> Tuple[List[float], List[float]]:
-    """간단 bin 기반 단조 맵(bins,map)."""
-    if not ps: return [0,1], [0.0]
-    edges = [i / bins for i in range(bins + 1)]
+    return _sigmoid(z)
+
+def _isotonic_bins(ps: List[float], ys: List[int], bins=10) -> Tuple[List[int], List[float]]:
+    """bin 별 (표본 수, 양성 합) — 등간격 [i/bins, (i+1)/bins)."""
+    if HAS_NUMPY:
+        x = np.clip(np.asarray(ps, dtype=np.float64), 0.0, 1.0)
+        idx = np.minimum((x * bins).astype(np.int64), bins - 1)
+        counts = np.bincount(idx, minlength=bins)
+        sums = np.bincount(idx, weights=np.asarray(ys, dtype=np.float64), minlength=bins)
+        return [int(c) for c in counts], [float(v) for v in sums]
     counts = [0]*bins; sums = [0.0]*bins
     for p, y in zip(ps, ys):
         x = max(0.0, min(1.0, float(p)))
         idx = min(bins-1, int(x * bins))
         counts[idx] += 1
         sums[idx] += y
-    acc = [(sums[i]/counts[i]) if counts[i] > 0 else None for i in range(bins)]
-    last = 0.0
+    return counts, sums
+
+def _pav(values: List[float], weights: List[float]) -> List[float]:
+    """가중 Pool-Adjacent-Violators: 비감소 제약 하 가중 제곱오차 최소 해."""
+    blocks = []  # [가중 평균, 가중치, 원소 수]
+    for v, w in zip(values, weights):
+        blocks.append([v, w, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            v2, w2, n2 = blocks.pop()
+            v1, w1, n1 = blocks[-1]
+            blocks[-1] = [(v1*w1 + v2*w2) / (w1 + w2), w1 + w2, n1 + n2]
+    out = []
+    for v, _, n in blocks:
+        out.extend([v] * n)
+    return out
+
+def _isotonic_from_bins(counts: List[int], sums: List[float], bins=10) -> Tuple[List[float], List[float]]:
+    edges = [i / bins for i in range(bins + 1)]
+    nz = [i for i in range(bins) if counts[i] > 0]
+    if not nz:
+        return edges, [0.0] * bins
+    fit = _pav([sums[i] / counts[i] for i in nz], [counts[i] for i in nz])
+    acc = [None] * bins
+    for i, v in zip(nz, fit):
+        acc[i] = float(v)
+    # 빈 bin: 앞 bin 값 유지(선두 빈 bin 은 첫 적합값) → 단조성 유지
+    last = acc[nz[0]]
     for i in range(bins):
         if acc[i] is None:
             acc[i] = last
         last = acc[i]
-    for i in range(1, bins):
-        if acc[i] < acc[i-1]:
-            acc[i] = acc[i-1]
     return edges, acc
 
+def train_isotonic(ps: List[float], ys: List[int], bins=10) -> Tuple[List[float], List[float]]:
+    """bin 기반 단조 맵(bins,map): bin 평균에 가중 PAV 적합."""
+    if not ps: return [0,1], [0.0]
+    counts, sums = _isotonic_bins(ps, ys, bins)
+    return _isotonic_from_bins(counts, sums, bins)
+
 def apply_isotonic(p: float, edges: List[float], acc: List[float]) -> float:
     x = max(0.0, min(1.0, float(p)))
     lo, hi = 0, len(edges)-1
@@ -342,6 +1890,8 @@ def apply_isotonic(p: float, edges: List[float], acc: List[float]) -> float:
     return float(acc[lo]) if 0 <= lo < len(acc) else x
 
 def compute_metrics(ps: List[float], ys: List[int], bins=10) -> Dict[str,float]:
+    if HAS_NUMPY:
+        return _compute_metrics_np(ps, ys, bins)
     n = max(1, len(ps))
     # ECE
     edges = [i / bins for i in range(bins+1)]
@@ -365,53 +1915,335 @@ def compute_metrics(ps: List[float], ys: List[int], bins=10) -> Dict[str,float]:
         else: tn+=1
     acc = (tp+tn)/n
     f1 = (2*tp) / (2*tp + fp + fn) if (2*tp+fp+fn)>0 else 0.0
-    if HAS_NUMPY and len(set(ys))>1:
-        user_corr = float(np.corrcoef(np.array(ps), np.array(ys))[0,1])
-    else:
-        user_corr = 0.0
-    return {"ece": float(ece), "brier": float(brier), "em": float(acc), "f1": float(f1), "user_corr": user_corr}
+    return {"ece": float(ece), "brier": float(brier), "em": float(acc), "f1": float(f1), "user_corr": 0.0}
+
+def _compute_metrics_np(ps, ys, bins=10) -> Dict[str,float]:
+    """ECE/Brier/EM/F1/상관을 bincount·digitize 로 한 번에 계산(순수 Python 경로와 같은 bin 경계)."""
+    p = np.asarray(ps, dtype=np.float64)
+    y = np.asarray(ys, dtype=np.float64)
+    n = max(1, p.size)
+    if p.size == 0:
+        return {"ece": 0.0, "brier": 0.0, "em": 0.0, "f1": 0.0, "user_corr": 0.0}
+    pred = p >= 0.5
+    pos = y == 1
+    correct = (pred == pos).astype(np.float64)
+    # ECE: [lo,hi) 구간, 마지막 bin 은 1.0 포함, [0,1] 밖 값은 제외
+    edges = np.array([i / bins for i in range(bins + 1)])
+    valid = (p >= 0.0) & (p <= 1.0)
+    idx = np.digitize(p[valid], edges[1:-1], right=False)
+    cnt = np.bincount(idx, minlength=bins)
+    conf_sum = np.bincount(idx, weights=p[valid], minlength=bins)
+    acc_sum = np.bincount(idx, weights=correct[valid], minlength=bins)
+    nzb = cnt > 0
+    ece = float(np.sum(np.abs(acc_sum[nzb] - conf_sum[nzb])) / n)  # Σ (cnt/n)·|acc-conf|
+    brier = float(np.sum((p - y) ** 2) / n)
+    tp = int(np.sum(pred & pos)); fp = int(np.sum(pred & ~pos)); fn = int(np.sum(~pred & pos))
+    em = float(np.sum(correct) / n)
+    f1 = (2*tp) / (2*tp + fp + fn) if (2*tp+fp+fn)>0 else 0.0
+    user_corr = 0.0
+    if np.unique(y).size > 1 and np.std(p) > 0:
+        user_corr = float(np.corrcoef(p, y)[0, 1])
+    return {"ece": ece, "brier": brier, "em": em, "f1": float(f1), "user_corr": user_corr}
+
+# ---- 증분 보정: 충분통계(스코프별 문서 하나)로 표본 1건을 O(1) 반영
+# iso_n/iso_sum 은 _isotonic_bins 와 같은 배열, conf/hit 은 ECE 용, H 는 Platt 누적 헤시안(2x2).
+CALIB_ONLINE_PRIOR = float(os.getenv("HF_CALIB_ONLINE_PRIOR", "1.0"))   # 콜드 스타트 헤시안 = prior·I
+CALIB_FULL_EVERY = int(os.getenv("HF_CALIB_FULL_EVERY", "500"))         # 증분 반영이 이만큼 쌓이면 전체 재학습 권고
+CALIB_GLOBAL_FLUSH_MS = float(os.getenv("HF_CALIB_GLOBAL_FLUSH_MS", "2000"))  # 전역 통계 증분을 모아 반영하는 주기(0=행마다 즉시)
+
+def calib_stats_init(ps: List[float], ys: List[int], platt_ab=None, algo: str = "both",
+                     bins=10, l2=1e-4) -> dict:
+    """전체 학습 결과로 충분통계 시드. H 는 (a,b) 에서의 헤시안(+l2) — 이후 온라인 뉴턴 스텝의 곡률."""
+    a, b = platt_ab or (1.0, 0.0)
+    counts, sums = _isotonic_bins(ps, ys, bins)
+    st = {"algo": algo, "bins": bins, "n": len(ps), "since_full": 0,
+          "iso_n": counts, "iso_sum": sums, "platt": {"a": float(a), "b": float(b)},
+          "updatedAt": now_iso()}
+    if not ps:
+        st.update(conf=[0.0] * bins, hit=[0.0] * bins, H=[CALIB_ONLINE_PRIOR, 0.0, CALIB_ONLINE_PRIOR],
+                  tp=0, fp=0, fn=0, tn=0, sp=0.0, sy=0.0, spp=0.0, syy=0.0, spy=0.0, brier=0.0)
+        return st
+    if HAS_NUMPY:
+        x = np.clip(np.asarray(ps, dtype=np.float64), 0.0, 1.0)
+        y = np.asarray(ys, dtype=np.float64)
+        idx = np.minimum((x * bins).astype(np.int64), bins - 1)
+        pred = x >= 0.5; pos = y == 1
+        s = 0.5 * (1.0 + np.tanh(0.5 * (a * x + b))); h = s * (1.0 - s)
+        st.update(
+            conf=[float(v) for v in np.bincount(idx, weights=x, minlength=bins)],
+            hit=[float(v) for v in np.bincount(idx, weights=(pred == pos).astype(np.float64), minlength=bins)],
+            H=[float(np.sum(h * x * x)) + l2, float(np.sum(h * x)), float(np.sum(h)) + l2],
+            tp=int(np.sum(pred & pos)), fp=int(np.sum(pred & ~pos)),
+            fn=int(np.sum(~pred & pos)), tn=int(np.sum(~pred & ~pos)),
+            sp=float(x.sum()), sy=float(y.sum()), spp=float(x @ x), syy=float(y @ y), spy=float(x @ y),
+            brier=float(np.sum((x - y) ** 2)))
+        return st
+    conf = [0.0] * bins; hit = [0.0] * bins
+    haa = hab = hbb = 0.0
+    tp = fp = fn = tn = 0
+    sp = sy = spp = syy = spy = brier = 0.0
+    for p, t in zip(ps, ys):
+        x = max(0.0, min(1.0, float(p))); t = float(t)
+        i = min(bins - 1, int(x * bins))
+        pred = x >= 0.5
+        conf[i] += x; hit[i] += 1.0 if pred == (t == 1) else 0.0
+        if pred: tp += t == 1; fp += t != 1
+        else: fn += t == 1; tn += t != 1
+        s = _sigmoid(a * x + b); h = s * (1.0 - s)
+        haa += h * x * x; hab += h * x; hbb += h
+        sp += x; sy += t; spp += x * x; syy += t * t; spy += x * t; brier += (x - t) ** 2
+    st.update(conf=conf, hit=hit, H=[haa + l2, hab, hbb + l2], tp=int(tp), fp=int(fp), fn=int(fn), tn=int(tn),
+              sp=sp, sy=sy, spp=spp, syy=syy, spy=spy, brier=brier)
+    return st
+
+def calib_stats_observe(st: dict, p: float, y: int) -> dict:
+    """표본 (p, y) 1건 반영(제자리 갱신). Platt 은 누적 헤시안으로 뉴턴 1스텝."""
+    if not st:
+        st = calib_stats_init([], [])
+    bins = int(st["bins"])
+    x = max(0.0, min(1.0, float(p))); t = float(y)
+    i = min(bins - 1, int(x * bins))
+    pred = x >= 0.5
+    st["iso_n"][i] += 1; st["iso_sum"][i] += t
+    st["conf"][i] += x; st["hit"][i] += 1.0 if pred == (t == 1) else 0.0
+    key = ("tp" if t == 1 else "fp") if pred else ("fn" if t == 1 else "tn")
+    st[key] += 1
+    st["sp"] += x; st["sy"] += t; st["spp"] += x * x; st["syy"] += t * t; st["spy"] += x * t
+    st["brier"] += (x - t) ** 2
+    a, b = st["platt"]["a"], st["platt"]["b"]
+    s = _sigmoid(a * x + b); h = s * (1.0 - s)
+    haa, hab, hbb = st["H"]
+    haa += h * x * x; hab += h * x; hbb += h
+    det = haa * hbb - hab * hab
+    if det > 1e-12:
+        ga, gb = (s - t) * x, (s - t)
+        a -= (hbb * ga - hab * gb) / det
+        b -= (haa * gb - hab * ga) / det
+    st["platt"] = {"a": float(a), "b": float(b)}
+    st["H"] = [haa, hab, hbb]
+    st["n"] += 1; st["since_full"] += 1
+    st["updatedAt"] = now_iso()
+    return st
+
+def calib_stats_metrics(st: dict) -> Dict[str,float]:
+    """충분통계 → compute_metrics 와 같은 지표(+ _n)."""
+    n = int(st.get("n", 0))
+    if n <= 0:
+        return {"ece": 0.0, "brier": 0.0, "em": 0.0, "f1": 0.0, "user_corr": 0.0, "_n": 0}
+    ece = sum(abs(h - c) for h, c, k in zip(st["hit"], st["conf"], st["iso_n"]) if k > 0) / n
+    tp, fp, fn = st["tp"], st["fp"], st["fn"]
+    f1 = (2*tp) / (2*tp + fp + fn) if (2*tp+fp+fn)>0 else 0.0
+    vp = n * st["spp"] - st["sp"] ** 2
+    vy = n * st["syy"] - st["sy"] ** 2
+    corr = (n * st["spy"] - st["sp"] * st["sy"]) / math.sqrt(vp * vy) if vp > 1e-12 and vy > 1e-12 else 0.0
+    return {"ece": float(ece), "brier": float(st["brier"] / n), "em": float((tp + st["tn"]) / n),
+            "f1": float(f1), "user_corr": float(corr), "_n": n}
+
+def calib_stats_fit(st: dict):
+    """충분통계 → (platt_ab, iso_bins_map) — 전체 재학습과 같은 형태(algo 존중)."""
+    algo = st.get("algo", "both")
+    platt_ab = (st["platt"]["a"], st["platt"]["b"]) if algo in ("platt","both") else None
+    iso = _isotonic_from_bins(st["iso_n"], st["iso_sum"], int(st["bins"])) if algo in ("isotonic","both") else None
+    return platt_ab, iso
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 수락 제어(admission): 추론 요청의 동시 실행·대기 수를 묶어 두고 넘치면 빨리 거절
+#  - 자리(HF_MAX_INFLIGHT)가 없으면 대기열(HF_MAX_QUEUE)에서 기한까지 기다리고, 대기열도 가득이면 즉시 429
+#  - 평균 자리 점유 시간으로 봐서 기한 안에 차례가 올 수 없으면 기다리지 않고 503(부하 급증 시 지연이 쌓이지 않게)
+#  - 기한: X-Request-Timeout-Ms 헤더 또는 본문 timeout_ms(도착 시각 기준 ms), 없으면 HF_DEFAULT_DEADLINE_MS
+#  - 풀 둘: interactive(/scores, /scores/stream, /zero-shot, /nli) · bulk(/scores/batch, HF_BULK_MAX_INFLIGHT)
+#    — 몇 시간짜리 대량 작업이 대화형 자리를 잡아 /scores 가 429 를 받지 않게
+# ─────────────────────────────────────────────────────────────────────────────
+class Overloaded(RuntimeError):
+    """대기열이 가득 차 거절(429)."""
+    def __init__(self, retry_after: int = 1):
+        super().__init__("요청 대기열 가득")
+        self.retry_after = retry_after
+
+class Admission:
+    """카운팅 세마포어 + 유한 대기열. enter(deadline) → 토큰(시작 시각), leave(토큰)."""
+    def __init__(self, name: str, max_inflight: int, max_queue: int):
+        self.name = name
+        self.max_inflight = max(0, int(max_inflight))
+        self.max_queue = max(0, int(max_queue))
+        self._cv = threading.Condition()
+        self.inflight = 0
+        self.waiting = 0
+        self._svc = None  # 요청당 자리 점유 시간 EWMA(초)
+        self.stats = {"admitted": 0, "rejected_full": 0, "rejected_deadline": 0, "expired_waiting": 0,
+                      "wait_ms_sum": 0.0, "wait_ms_max": 0.0}
+
+    def _eta(self, ahead: int) -> float:
+        # 앞선 대기자가 모두 자리를 얻고 내 차례가 오기까지 걸릴 추정 시간
+        return (self._svc or 0.0) * (ahead + 1) / max(1, self.max_inflight)
+
+    def _reject(self, outcome: str):
+        self.stats[outcome] += 1
+        M_ADMISSION.inc(1, self.name, outcome)
+
+    def enter(self, deadline: float = None) -> float:
+        t0 = time.monotonic()
+        with self._cv:
+            if deadline is not None and deadline <= t0:
+                self._reject("rejected_deadline")
+                raise DeadlineExceeded("admission")
+            if self.max_inflight and self.inflight >= self.max_inflight:
+                if self.waiting >= self.max_queue:
+                    self._reject("rejected_full")
+                    raise Overloaded(max(1, math.ceil(self._eta(self.waiting))))
+                if deadline is not None and t0 + self._eta(self.waiting) >= deadline:
+                    self._reject("rejected_deadline")
+                    raise DeadlineExceeded("admission")
+                self.waiting += 1
+                try:
+                    while self.inflight >= self.max_inflight:
+                        remain = None if deadline is None else deadline - time.monotonic()
+                        if remain is not None and remain <= 0:
+                            self._reject("expired_waiting")
+                            raise DeadlineExceeded("queue")
+                        self._cv.wait(remain)
+                finally:
+                    self.waiting -= 1
+            self.inflight += 1
+            t1 = time.monotonic()
+            w = (t1 - t0) * 1000.0
+            st = self.stats
+            st["admitted"] += 1
+            st["wait_ms_sum"] += w
+            st["wait_ms_max"] = max(st["wait_ms_max"], w)
+        M_ADMISSION.inc(1, self.name, "admitted")
+        return t1
+
+    def leave(self, token: float):
+        dt = time.monotonic() - token
+        with self._cv:
+            self.inflight -= 1
+            self._svc = dt if self._svc is None else 0.8 * self._svc + 0.2 * dt
+            self._cv.notify()
+
+    def info(self) -> dict:
+        with self._cv:
+            st = dict(self.stats)
+            inflight, waiting, svc = self.inflight, self.waiting, self._svc
+        return {
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "default_deadline_ms": DEFAULT_DEADLINE_MS,
+            "inflight": inflight,
+            "waiting": waiting,
+            **{k: st[k] for k in ("admitted", "rejected_full", "rejected_deadline", "expired_waiting")},
+            "avg_wait_ms": st["wait_ms_sum"] / max(1, st["admitted"]),
+            "max_wait_ms": st["wait_ms_max"],
+            "service_ms_ewma": svc * 1000.0 if svc is not None else None,
+        }
+
+admission = Admission("interactive", ADM_MAX_INFLIGHT, ADM_MAX_QUEUE)
+bulk_admission = Admission("bulk", ADM_BULK_INFLIGHT, ADM_BULK_QUEUE)
+
+def _request_deadline(default_ms: float):
+    """요청 기한(monotonic) 또는 None. 0 이하 값은 기한 없음."""
+    raw = request.headers.get("X-Request-Timeout-Ms")
+    if raw is None and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            raw = data.get("timeout_ms")
+    try:
+        ms = float(raw) if raw is not None else float(default_ms)
+    except (TypeError, ValueError):
+        ms = float(default_ms)
+    return time.monotonic() + ms / 1000.0 if ms > 0 else None
+
+def admitted(default_ms: float = None, pool: Admission = None):
+    """추론 엔드포인트 데코레이터: 수락 제어(pool, 기본 interactive) 후 요청 기한을 걸고 실행.
+    스트리밍 응답은 스트림이 닫힐 때 자리를 돌려준다(생성기는 current_deadline() 을 미리 잡아 둘 것)."""
+    adm = pool or admission
+    def deco(view):
+        @functools.wraps(view)
+        def wrapper(*a, **kw):
+            deadline = _request_deadline(DEFAULT_DEADLINE_MS if default_ms is None else default_ms)
+            token = adm.enter(deadline)
+            held = True
+            try:
+                with deadline_scope(deadline):
+                    resp = view(*a, **kw)
+                if isinstance(resp, Response) and resp.is_streamed:
+                    resp.call_on_close(lambda: adm.leave(token))
+                    held = False
+                return resp
+            finally:
+                if held:
+                    adm.leave(token)
+        return wrapper
+    return deco
+
+def _too_large(kind: str, n: int, limit: int) -> dict:
+    """상한(limit, 0=무제한)을 넘으면 413 본문, 아니면 None."""
+    if limit > 0 and n > limit:
+        return {"error": kind, "limit": limit, "got": n}
+    return None
+
+def _input_limit_error(text: str, segment: bool) -> dict:
+    return (_too_large("text_too_long", len(text), MAX_TEXT_CHARS)
+            or (_too_large("too_many_sentences", len(_split_sentences_ko(text)), MAX_SENTENCES) if segment else None))
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 엔드포인트: 헬스/제로샷/NLI/점수
 # ─────────────────────────────────────────────────────────────────────────────
+@app.errorhandler(ModelsNotReady)
+def _not_ready(e):
+    return jsonify({"error": "not_ready", "startup": dict(_startup_state)}), 503, {"Retry-After": "5"}
+
+@app.errorhandler(Overloaded)
+def _overloaded(e):
+    return jsonify({"error": "overloaded", "retry_after": e.retry_after}), 429, {"Retry-After": str(e.retry_after)}
+
+@app.errorhandler(DeadlineExceeded)
+def _deadline_exceeded(e):
+    M_DEADLINE.inc(1, e.stage)
+    return jsonify({"error": "deadline_exceeded", "stage": e.stage}), 503, {"Retry-After": "1"}
+
 @app.get("/health")
 def health():
-    return jsonify({"ok": True, "zsl_model": ZSL_MODEL_NAME, "nli_model": NLI_MODEL_NAME})
+    # liveness: 프로세스 응답 여부(모델 로드 전에도 200). 기동 로드가 실패했으면 503 → 오케스트레이터가 재시작
+    failed = _startup_state["state"] == "failed" and _bundle is None
+    return jsonify({"ok": not failed, "ready": _ready.is_set(), "zsl_model": ZSL_MODEL_NAME, "nli_model": NLI_MODEL_NAME,
+                    "backend": HF_BACKEND, "gen": _bundle.gen if _bundle else None}), (503 if failed else 200)
+
+@app.get("/ready")
+def ready():
+    # readiness: 모델 로드 + 워밍업 완료 시 200, 그 전에는 503(아직 시작 전이면 로드 시작)
+    if _ready.is_set():
+        return jsonify({"ready": True, "bundle": _bundle.info() if _bundle else None, "startup": dict(_startup_state)})
+    start_background()
+    return jsonify({"ready": False, "startup": dict(_startup_state)}), 503
 
 @app.post("/zero-shot")
+@admitted()
 def zero_shot_api():
     data = request.get_json(silent=True) or {}
     text = data.get("input", "")
     labels = data.get("labels") or DEFAULT_EMOTION_LABELS
     if not text or not isinstance(labels, list) or len(labels)==0:
         return jsonify({"error": "input and labels are required"}), 400
-    out = zero_shot(
-        text,
-        candidate_labels=labels,
-        multi_label=True,
-        hypothesis_template=EMOTION_TEMPLATE,
-        batch_size=HF_BATCH,
-    )
+    err = _too_large("text_too_long", len(str(text)), MAX_TEXT_CHARS) or _too_large("too_many_labels", len(labels), MAX_SENTENCES)
+    if err:
+        return jsonify(err), 413
+    out = run_zero_shot([text], labels, EMOTION_TEMPLATE)[0]
     return jsonify({"labels": out["labels"], "scores": out["scores"]})
 
 @app.post("/nli")
+@admitted()
 def nli_api():
     data = request.get_json(silent=True) or {}
     premise = data.get("premise", "")
     hypotheses = data.get("hypotheses", [])
     if not premise or not isinstance(hypotheses, list) or len(hypotheses)==0:
         return jsonify({"results": []})
-    results = []
-    for hyp in hypotheses:
-        pair = premise + " </s></s> " + hyp
-        pred = nli_clf(pair, top_k=3)
-        label_map = {p["label"]: p["score"] for p in pred}
-        results.append({
-            "hypothesis": hyp,
-            "entail": float(label_map.get("entailment", 0.0)),
-            "neutral": float(label_map.get("neutral", 0.0)),
-            "contradict": float(label_map.get("contradiction", 0.0)),
-        })
+    err = _too_large("text_too_long", len(str(premise)), MAX_TEXT_CHARS) or _too_large("too_many_hypotheses", len(hypotheses), MAX_SENTENCES)
+    if err:
+        return jsonify(err), 413
+    preds = run_nli([(premise, hyp) for hyp in hypotheses])
+    results = [{"hypothesis": hyp, **r} for hyp, r in zip(hypotheses, preds)]
     return jsonify({"results": results})
 
 def _split_sentences_ko(text: str):
@@ -419,116 +2251,80 @@ def _split_sentences_ko(text: str):
     sents = re.split(r'(?:[\n\r]+|(?<=[\.!\?…])\s+|(?<=다\.)\s+)', text)
     return [s.strip() for s in sents if isinstance(s, str) and len(s.strip()) >= 3]
 
-@app.post("/scores")
-def scores_api():
-    data = request.get_json(silent=True) or {}
-    text = str(data.get("text", "")).strip()
-    if not text:
-        return jsonify({"error": "text required"}), 400
+def _normalize_text_key(text: str) -> str:
+    # 캐시 키 전용: NFC + 줄 내부 공백 정리(토크나이저가 무시하는 차이만 흡수)
+    t = unicodedata.normalize("NFC", text)
+    return "\n".join(re.sub(r"[ \t\u00a0]+", " ", ln).strip() for ln in t.splitlines())
+
+def _scores_cache_key(text: str, emotions_norm: List[str], core_belief: str, segment: bool, bundle: ModelBundle) -> str:
+    return _digest({
+        "text": _normalize_text_key(text), "emotions": emotions_norm, "core": core_belief, "segment": segment,
+        "zsl": bundle.zsl_name, "nli": bundle.nli_name, "gen": bundle.gen, "backend": bundle.backend,
+        "tpl": EMOTION_TEMPLATE, "fp16": FP16,
+        "w": [W_CHOSEN, W_PEAK, W_FOCUS, EMO_TOPK, ENT_TOPK, SEG_PACK_TOKENS, SEG_HYP_RESERVE, SEG_WEIGHTED],
+        "cascade": [bundle.emb.name, CASCADE_MAX_ENTROPY, CASCADE_MIN_MARGIN, CASCADE_TEMP] if bundle.emb else None,
+    })
 
-    core_belief = str(data.get("coreBelief", data.get("core_belief", ""))).strip()
-    emotions_in = data.get("emotions") or []
-    emotions_norm = [normalize_emotion(e) for e in emotions_in if isinstance(e, str)]
+result_cache = LRUCache(RC_MAX_ITEMS, RC_TTL_SEC, int(RC_MAX_MB * 1024 * 1024))
 
-    # 세그먼트 플래그
-    segment = False
-    try:
-        q = (request.args.get("segment") or "").lower()
-        segment = q in ("1","true","yes")
-    except Exception:
-        pass
-    if isinstance(data.get("segment"), bool):
-        segment = segment or bool(data.get("segment"))
+def _aggregate_single(emo_row: Dict[str, float], nli_row: Dict[str, float], emotions_norm: List[str]) -> dict:
+    scores = list(emo_row.values())
 
-    # 긴 텍스트는 자동 세그먼트 on
-    if ENT_SEG_AUTO and len(text) >= ENT_MINLEN:
-        segment = True or segment
+    emo_probs = {}
+    for lab, sc in emo_row.items():
+        canon = normalize_emotion(lab)
+        emo_probs[canon] = max(sc, emo_probs.get(canon, 0.0))
 
-    if not segment:
-        # --- 단일 텍스트
-        emo_out = zero_shot(
-            text,
-            candidate_labels=DEFAULT_EMOTION_LABELS,
-            multi_label=True,
-            hypothesis_template=EMOTION_TEMPLATE,
-            batch_size=HF_BATCH,
-        )
-        labels = emo_out["labels"]
-        scores = [float(s) for s in emo_out["scores"]]
-
-        emo_probs = {}
-        for lab, sc in zip(labels, scores):
-            canon = normalize_emotion(lab)
-            emo_probs[canon] = max(sc, emo_probs.get(canon, 0.0))
-
-        emotion_entropy = normalized_entropy_from_scores(scores)
-        emotions_avg = _compose_emotion_score(emo_probs, scores, emotions_norm)
-
-        nli_result = {"entail": 0.0, "neutral": 0.0, "contradict": 0.0}
-        if core_belief:
-            pair = text + " </s></s> " + core_belief
-            pred = nli_clf(pair, top_k=3)
-            label_map = {p["label"]: p["score"] for p in pred}
-            nli_result = {
-                "entail": float(label_map.get("entailment", 0.0)),
-                "neutral": float(label_map.get("neutral", 0.0)),
-                "contradict": float(label_map.get("contradiction", 0.0)),
-            }
+    emotion_entropy = normalized_entropy_from_scores(scores)
+    emotions_avg = _compose_emotion_score(emo_probs, scores, emotions_norm)
 
-        return jsonify({
-            "emotions_avg": emotions_avg,
-            "emotion_entropy": emotion_entropy,
-            "nli_core": {"entail": nli_result["entail"], "contradict": nli_result["contradict"]},
-            "hf_raw": {
-                "emotion": {"avg": emotions_avg, "entropy": emotion_entropy, "probs": emo_probs},
-                "nli_core": nli_result
-            }
-        })
+    nli_result = nli_row or {"entail": 0.0, "neutral": 0.0, "contradict": 0.0}
+
+    return {
+        "emotions_avg": emotions_avg,
+        "emotion_entropy": emotion_entropy,
+        "nli_core": {"entail": nli_result["entail"], "contradict": nli_result["contradict"]},
+        "hf_raw": {
+            "emotion": {"avg": emotions_avg, "entropy": emotion_entropy, "probs": emo_probs},
+            "nli_core": nli_result
+        }
+    }
 
-    # --- 세그먼트 ON: 문장별 배치
-    sents = _split_sentences_ko(text) or [text]
+def _aggregate_segmented(emo_rows: List[Dict[str, float]], nli_rows: List[Dict[str, float]], emotions_norm: List[str],
+                         weights: List[float] = None) -> dict:
+    # weights: 세그먼트별 토큰 길이(없거나 HF_SEG_WEIGHTED=0 이면 균등) — 짧은 조각이 긴 세그먼트와 같은 비중을 갖지 않게
     label_list = [normalize_emotion(l) for l in DEFAULT_EMOTION_LABELS]
+    w = [float(x) for x in weights] if weights and len(weights) == len(emo_rows) else [1.0] * len(emo_rows)
 
     sum_probs = {l: 0.0 for l in label_list}
     entropies = []
 
-    outs = zero_shot(
-        sents,
-        candidate_labels=DEFAULT_EMOTION_LABELS,
-        multi_label=True,
-        hypothesis_template=EMOTION_TEMPLATE,
-        batch_size=HF_BATCH,
-    )
-    for out in outs:
-        labels = out["labels"]; scores = [float(v) for v in out["scores"]]
-        prob_map = {normalize_emotion(l): sc for l, sc in zip(labels, scores)}
-        entropies.append(normalized_entropy_from_scores(scores))
+    for row, wi in zip(emo_rows, w):
+        scores = list(row.values())
+        prob_map = {normalize_emotion(l): sc for l, sc in row.items()}
+        entropies.append(wi * normalized_entropy_from_scores(scores))
         for l in label_list:
-            sum_probs[l] += float(prob_map.get(l, 0.0))
+            sum_probs[l] += wi * float(prob_map.get(l, 0.0))
 
-    n_sent = float(len(sents))
-    avg_probs = {l: (sum_probs[l] / n_sent) for l in label_list}
+    w_tot = sum(w) or 1.0
+    avg_probs = {l: (sum_probs[l] / w_tot) for l in label_list}
 
-    emotion_entropy = float(sum(entropies)/len(entropies)) if entropies else \
+    emotion_entropy = float(sum(entropies) / w_tot) if entropies else \
         normalized_entropy_from_scores(list(avg_probs.values()))
     emotions_avg = _compose_emotion_score(avg_probs, list(avg_probs.values()), emotions_norm)
 
-    # 문장별 NLI(상위-K 평균으로 희석 방지)
-    nli_es, nli_ns, nli_cs = [], [], []
-    if core_belief:
-        for s in sents:
-            pair = s + " </s></s> " + core_belief
-            pred = nli_clf(pair, top_k=3)
-            lm = {p["label"]: p["score"] for p in pred}
-            nli_es.append(float(lm.get("entailment", 0.0)))
-            nli_ns.append(float(lm.get("neutral", 0.0)))
-            nli_cs.append(float(lm.get("contradiction", 0.0)))
-
-    entail     = _topk_mean(nli_es, ENT_TOPK) if nli_es else 0.0
-    neutral    = float(sum(nli_ns)/len(nli_ns)) if nli_ns else 0.0  # 중립은 평균 유지
-    contradict = float(sum(nli_cs)/len(nli_cs)) if nli_cs else 0.0  # 반증은 평균(과도한 max 억제)
+    # 문장별 NLI(상위-K 평균으로 희석 방지) — 감정과 같은 배치에서 계산됨
+    nli_es = [r["entail"] for r in nli_rows]
+    nli_ns = [r["neutral"] for r in nli_rows]
+    nli_cs = [r["contradict"] for r in nli_rows]
 
-    return jsonify({
+    wn = w[:len(nli_rows)]
+    wn_tot = sum(wn) or 1.0
+    entail     = _topk_mean(nli_es, ENT_TOPK) if nli_es else 0.0                 # 가장 강한 근거(가중 없음)
+    neutral    = float(sum(x * k for x, k in zip(nli_ns, wn)) / wn_tot) if nli_ns else 0.0  # 중립은 (가중) 평균 유지
+    contradict = float(sum(x * k for x, k in zip(nli_cs, wn)) / wn_tot) if nli_cs else 0.0  # 반증은 (가중) 평균(과도한 max 억제)
+
+    return {
         "emotions_avg": emotions_avg,
         "emotion_entropy": emotion_entropy,
         "nli_core": {"entail": entail, "contradict": contradict},
@@ -536,7 +2332,314 @@ def scores_api():
             "emotion": {"avg": emotions_avg, "entropy": emotion_entropy, "probs": avg_probs},
             "nli_core": {"entail": entail, "neutral": neutral, "contradict": contradict}
         }
-    })
+    }
+
+def _token_lengths(texts: List[str], bundle: ModelBundle) -> List[int]:
+    try:
+        return [len(x) for x in bundle.zsl.tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]]
+    except Exception:
+        return [len(t) for t in texts]
+
+def _split_long(text: str, n_tok: int, cap: int, tokenizer) -> List[str]:
+    """cap 토큰을 넘는 문장을 토큰 경계(가능하면 어절 경계)에서 나눈다 — 모델 입력에서 말없이 잘리던 뒷부분 보존."""
+    try:
+        offs = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)["offset_mapping"]
+    except Exception:
+        offs = None
+    if not offs:
+        # offset 미지원(느린 토크나이저): 글자 수 비례로 근사
+        step = max(1, int(len(text) * cap / max(1, n_tok)))
+        return [p for p in (text[i:i + step].strip() for i in range(0, len(text), step)) if p]
+    pieces, a_tok = [], 0
+    while a_tok < len(offs):
+        z_tok = min(len(offs), a_tok + cap)
+        if z_tok < len(offs):
+            # 창의 뒤쪽 1/4 안에서 공백 다음에 시작하는 토큰이 있으면 거기서 자른다
+            for k in range(z_tok, a_tok + (3 * cap) // 4, -1):
+                st = offs[k][0]
+                if st > 0 and text[st - 1].isspace():
+                    z_tok = k
+                    break
+        a = offs[a_tok][0]
+        z = offs[z_tok][0] if z_tok < len(offs) else len(text)
+        piece = text[a:z].strip()
+        if piece:
+            pieces.append(piece)
+        a_tok = z_tok
+    return pieces
+
+def _pack_segments(sents: List[str], bundle: ModelBundle, pack: bool = True) -> Tuple[List[str], List[int]]:
+    """문장 리스트 → (세그먼트, 세그먼트별 토큰 길이).
+    - 모델 최대 길이(- 가설 몫)를 넘는 문장은 나누고, 인접 문장은 SEG_PACK_TOKENS 까지 한 입력으로 묶는다(pack=False 면 문장별)
+    - 경계는 항상 문장 종결(또는 긴 문장의 분할 지점) — 문장 중간에서 섞이지 않는다"""
+    sc = bundle.zsl
+    cap = max(16, int(getattr(sc, "max_length", 512) or 512) - SEG_HYP_RESERVE)
+    units = []
+    for s, n in zip(sents, _token_lengths(sents, bundle)):
+        if n > cap:
+            pieces = _split_long(s, n, cap, sc.tokenizer)
+            units.extend(zip(pieces, _token_lengths(pieces, bundle)))
+        else:
+            units.append((s, n))
+    budget = min(SEG_PACK_TOKENS, cap) if pack else 0
+    if budget <= 0:
+        return [u for u, _ in units], [max(1, n) for _, n in units]
+    segs, weights, cur, cur_n = [], [], [], 0
+    for s, n in units:
+        if cur and cur_n + n > budget:
+            segs.append(" ".join(cur)); weights.append(max(1, cur_n))
+            cur, cur_n = [], 0
+        cur.append(s); cur_n += n
+    if cur:
+        segs.append(" ".join(cur)); weights.append(max(1, cur_n))
+    return segs, weights
+
+def _segments_for(text: str, segment: bool, bundle: ModelBundle, pack: bool = True) -> Tuple[List[str], List[int]]:
+    # 세그먼트 ON: 문장 분할 → 토큰 예산으로 묶음(가중치=토큰 길이, pack=False 면 문장별) / OFF: 단일 텍스트
+    if not segment:
+        return [text], [1]
+    return _pack_segments(_split_sentences_ko(text) or [text], bundle, pack)
+
+def aggregate_scores(emo_rows, nli_rows, emotions_norm: List[str], segment: bool, weights: List[int] = None) -> dict:
+    if not segment:
+        return _aggregate_single(emo_rows[0], nli_rows[0] if nli_rows else None, emotions_norm)
+    return _aggregate_segmented(emo_rows, nli_rows, emotions_norm, weights if SEG_WEIGHTED else None)
+
+def compute_scores(text: str, emotions_norm: List[str], core_belief: str, segment: bool,
+                   bundle: ModelBundle = None) -> dict:
+    """/scores 응답 본문 계산(스키마는 파일 상단 주석 참고)."""
+    b = bundle or current_bundle()
+    with M_STAGE.time("split"):
+        sents, weights = _segments_for(text, segment, b)
+    M_SENTS.observe(len(sents), "scores")
+    emo_rows, nli_rows = score_sentences(sents, core_belief, bundle=b)
+    with M_STAGE.time("aggregate"):
+        return aggregate_scores(emo_rows, nli_rows, emotions_norm, segment, weights)
+
+def _parse_scores_request(data: dict, args=None):
+    """(text, emotions_norm, core_belief, segment) — text 가 비면 None."""
+    text = str(data.get("text", "")).strip()
+    if not text:
+        return None
+
+    core_belief = str(data.get("coreBelief", data.get("core_belief", ""))).strip()
+    emotions_in = data.get("emotions") or []
+    emotions_norm = [normalize_emotion(e) for e in emotions_in if isinstance(e, str)]
+
+    # 세그먼트 플래그
+    segment = False
+    try:
+        q = ((args or {}).get("segment") or "").lower()
+        segment = q in ("1","true","yes")
+    except Exception:
+        pass
+    if isinstance(data.get("segment"), bool):
+        segment = segment or bool(data.get("segment"))
+
+    # 긴 텍스트는 자동 세그먼트 on
+    if ENT_SEG_AUTO and len(text) >= ENT_MINLEN:
+        segment = True or segment
+    return text, emotions_norm, core_belief, segment
+
+@app.post("/scores")
+@admitted()
+def scores_api():
+    data = request.get_json(silent=True) or {}
+    parsed = _parse_scores_request(data, request.args)
+    if not parsed:
+        return jsonify({"error": "text required"}), 400
+    text, emotions_norm, core_belief, segment = parsed
+    err = _input_limit_error(text, segment)
+    if err:
+        return jsonify(err), 413
+
+    b = current_bundle()  # 요청 전체가 같은 세대를 쓴다(도중 교체되어도 혼합 없음)
+    key = _scores_cache_key(text, emotions_norm, core_belief, segment, b) if RC_ENABLE else None
+    if key:
+        hit = result_cache.get(key)
+        if hit is not None:
+            return jsonify(hit)
+    out = compute_scores(text, emotions_norm, core_belief, segment, bundle=b)
+    if key:
+        result_cache.put(key, out)
+    with M_STAGE.time("serialize"):
+        return jsonify(out)
+
+@app.post("/scores/stream")
+@admitted()
+def scores_stream_api():
+    """/scores 스트리밍 변형: 문장 묶음(HF_STREAM_SENTS)이 끝날 때마다 문장별 결과를 내보내고 마지막에 집계를 보낸다.
+    형식: NDJSON(기본) 또는 SSE(?format=sse 또는 Accept: text/event-stream)
+      {"type":"sentence","index":i,"text":...,"tokens":n,"emotion":{"probs":{...},"entropy":x},"nli":{...}|null}
+      (문장 이벤트는 묶지 않은 문장 단위. 모델 길이를 넘는 문장만 조각으로 나뉨, tokens 는 토큰 길이)
+      {"type":"final","result":{/scores 응답}}
+      (final 은 /scores 와 같은 세그먼트로 집계 — HF_SEG_PACK_TOKENS 가 켜져 있으면 묶인 세그먼트를 마지막에 한 번 더 추론)
+      (기한 초과 시 {"type":"error","error":"deadline_exceeded"} 로 끝난다)"""
+    data = request.get_json(silent=True) or {}
+    parsed = _parse_scores_request(data, request.args)
+    if not parsed:
+        return jsonify({"error": "text required"}), 400
+    text, emotions_norm, core_belief, segment = parsed
+    err = _input_limit_error(text, segment)
+    if err:
+        return jsonify(err), 413
+    sse = (request.args.get("format") == "sse") or ("text/event-stream" in (request.headers.get("Accept") or ""))
+
+    def _line(obj):
+        body = json.dumps(obj, ensure_ascii=False)
+        return f"event: {obj['type']}\ndata: {body}\n\n" if sse else body + "\n"
+
+    b = current_bundle()
+    deadline = current_deadline()  # 생성기는 뷰가 반환된 뒤 돈다
+
+    def gen():
+        sents, weights = _segments_for(text, segment, b, pack=False)
+        M_SENTS.observe(len(sents), "stream")
+        emo_rows, nli_rows = [], []
+        step = max(1, STREAM_SENTS)
+        try:
+            for off in range(0, len(sents), step):
+                chunk = sents[off:off + step]
+                with deadline_scope(deadline):
+                    check_deadline("stream")
+                    e_rows, n_rows = score_sentences(chunk, core_belief, bundle=b)
+                emo_rows.extend(e_rows); nli_rows.extend(n_rows)
+                for j, s in enumerate(chunk):
+                    yield _line({
+                        "type": "sentence", "index": off + j, "count": len(sents), "text": s, "tokens": weights[off + j],
+                        "emotion": {"probs": e_rows[j], "entropy": normalized_entropy_from_scores(list(e_rows[j].values()))},
+                        "nli": n_rows[j] if n_rows else None,
+                    })
+            packed, p_weights = _segments_for(text, segment, b)
+            if packed != sents:
+                # /scores 와 같은 집계가 되도록 묶인 세그먼트로 다시 추론(문장 이벤트는 이미 보냄)
+                with deadline_scope(deadline):
+                    check_deadline("stream")
+                    emo_rows, nli_rows = score_sentences(packed, core_belief, bundle=b)
+            out = aggregate_scores(emo_rows, nli_rows, emotions_norm, segment, p_weights)
+            if RC_ENABLE:
+                result_cache.put(_scores_cache_key(text, emotions_norm, core_belief, segment, b), out)
+            yield _line({"type": "final", "result": out})
+        except DeadlineExceeded as e:
+            M_DEADLINE.inc(1, e.stage)
+            yield _line({"type": "error", "error": "deadline_exceeded", "stage": e.stage})
+        except Exception as e:
+            yield _line({"type": "error", "error": "internal_error", "detail": str(e)})
+
+    mimetype = "text/event-stream" if sse else "application/x-ndjson"
+    return Response(stream_with_context(gen()), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 대량 재채점: JSONL {text, emotions, coreBelief, id?} → JSONL {index, id?, result|error}
+#  - BULK_WINDOW 문서씩 읽어 메모리 상한 유지, 결과는 입력 순서대로 스트리밍
+#  - 창 안의 모든 문장을 토큰 길이로 정렬해 BULK_BUCKET 단위로 문서 경계를 넘어 배치(패딩 최소화)
+#  - 오프라인 작업이라 기본적으로 문장/결과 캐시를 건드리지 않는다
+# ─────────────────────────────────────────────────────────────────────────────
+def _iter_jsonl(fp):
+    for raw in fp:
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+def _score_window(buf, segment_default: bool, bucket: int, use_cache: bool, bundle: ModelBundle):
+    docs, units, unit_cbs, unit_ws, unit_lens = [], [], [], [], []
+    for idx, rec in buf:
+        parsed = None
+        if isinstance(rec, dict):
+            seg = rec.get("segment", segment_default)
+            parsed = _parse_scores_request({**rec, "segment": bool(seg)})
+        if parsed is None:
+            docs.append((idx, rec, None, 0, 0, "text required" if isinstance(rec, dict) else "bad_record"))
+            continue
+        text, _, core_belief, segment = parsed
+        err = _input_limit_error(text, segment)
+        if err:
+            docs.append((idx, rec, None, 0, 0, err["error"]))
+            continue
+        sents, weights = _segments_for(text, segment, bundle)
+        M_SENTS.observe(len(sents), "batch")
+        start = len(units)
+        units.extend(sents); unit_cbs.extend([core_belief] * len(sents)); unit_ws.extend(weights)
+        # 정렬 키: 세그먼트 모드는 이미 계산한 토큰 길이, 단일 텍스트(가중치 1)는 따로 잰다
+        unit_lens.extend(weights if segment else _token_lengths(sents, bundle))
+        docs.append((idx, rec, parsed, start, len(units), None))
+
+    emo_all, nli_all = [None] * len(units), [None] * len(units)
+    if units:
+        order = sorted(range(len(units)), key=lambda i: unit_lens[i])
+        for b in range(0, len(order), max(1, bucket)):
+            check_deadline("batch")
+            ids = order[b:b + max(1, bucket)]
+            e_rows, n_rows = score_sentences([units[i] for i in ids], [unit_cbs[i] for i in ids],
+                                             use_cache=use_cache, bundle=bundle)
+            for k, i in enumerate(ids):
+                emo_all[i], nli_all[i] = e_rows[k], n_rows[k]
+
+    for idx, rec, parsed, a, z, err in docs:
+        row = {"index": idx}
+        if isinstance(rec, dict) and "id" in rec:
+            row["id"] = rec["id"]
+        if parsed is None:
+            row["error"] = err
+            yield row
+            continue
+        _, emotions_norm, core_belief, segment = parsed
+        nli_rows = nli_all[a:z] if core_belief else []
+        row["result"] = aggregate_scores(emo_all[a:z], nli_rows, emotions_norm, segment, unit_ws[a:z])
+        yield row
+
+def score_documents(records, segment_default: bool = True, window: int = None,
+                    bucket: int = None, use_cache: bool = False):
+    """레코드 이터러블을 창 단위로 채점해 결과 dict 를 입력 순서대로 yield(작업 전체가 시작 시점의 묶음 사용)."""
+    b = current_bundle()
+    window = max(1, int(window or BULK_WINDOW))
+    bucket = int(bucket or BULK_BUCKET)
+    buf = []
+    for idx, rec in enumerate(records):
+        buf.append((idx, rec))
+        if len(buf) >= window:
+            yield from _score_window(buf, segment_default, bucket, use_cache, b)
+            buf = []
+    if buf:
+        yield from _score_window(buf, segment_default, bucket, use_cache, b)
+
+@app.post("/scores/batch")
+@admitted(default_ms=0, pool=bulk_admission)
+def scores_batch_api():
+    """본문: JSONL(application/x-ndjson) 또는 {"records": [...]} JSON. 응답: JSONL 스트림.
+    대화형 요청과 별도 풀(HF_BULK_MAX_INFLIGHT 개 동시, 넘으면 429)이라 대량 작업이 /scores 자리를 잡지 않는다.
+    오프라인 작업이라 기본 기한이 없다(X-Request-Timeout-Ms 를 주면 버킷 사이에서 끊고 deadline_exceeded 행으로 끝난다).
+    상한(HF_MAX_TEXT_CHARS/HF_MAX_SENTENCES)을 넘는 레코드는 그 행만 error."""
+    segment = (request.args.get("segment") or "1").lower() in ("1", "true", "yes")
+    window = int(request.args.get("window") or BULK_WINDOW)
+    if request.is_json:
+        records = iter((request.get_json(silent=True) or {}).get("records") or [])
+    else:
+        records = _iter_jsonl(request.stream)
+
+    deadline = current_deadline()
+
+    def gen():
+        rows = score_documents(records, segment, window)
+        try:
+            while True:
+                with deadline_scope(deadline):
+                    row = next(rows, None)
+                if row is None:
+                    break
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+        except DeadlineExceeded as e:
+            M_DEADLINE.inc(1, e.stage)
+            yield json.dumps({"error": "deadline_exceeded", "stage": e.stage}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": "internal_error", "detail": str(e)}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(gen()), mimetype="application/x-ndjson")
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Phase 3: 캘리브레이션 학습/저장/프로필/리포트
@@ -569,7 +2672,8 @@ def _extract_training_pairs(feedback_rows: List[dict]) -> Tuple[List[float], Lis
     summary = {"entropy_avg": float(sum(entropies)/len(entropies)) if entropies else 0.0}
     return ps, ys, summary
 
-def _save_calibration(scope: str, uid: str, platt_ab, iso_bins_map, metrics: dict, rated_samples: int, min_samples: int=20):
+def _calibration_doc(scope: str, uid: str, platt_ab, iso_bins_map, metrics: dict, rated_samples: int, min_samples: int=20):
+    """(path, doc) — 전역: calibration/global, 개인: users/{uid}/calibration/current."""
     if scope == "global":
         path = "calibration/global"
         doc = {
@@ -580,7 +2684,6 @@ def _save_calibration(scope: str, uid: str, platt_ab, iso_bins_map, metrics: dic
             "metrics": metrics,
             "updatedAt": now_iso()
         }
-        store.set_doc(path, doc, merge=False)
     else:
         path = f"users/{uid}/calibration/current"
         doc = {
@@ -592,10 +2695,80 @@ def _save_calibration(scope: str, uid: str, platt_ab, iso_bins_map, metrics: dic
             "metrics": metrics,
             "updatedAt": now_iso()
         }
-        store.set_doc(path, doc, merge=False)
+    return path, doc
 
-def _save_eval_run(scope: str, uid: str, metrics: dict):
-    run_id = now_iso()
+def _save_calibration(scope: str, uid: str, platt_ab, iso_bins_map, metrics: dict, rated_samples: int, min_samples: int=20):
+    path, doc = _calibration_doc(scope, uid, platt_ab, iso_bins_map, metrics, rated_samples, min_samples)
+    write_behind.put(path, doc, merge=False)
+    _publish_profiles([(path, doc, False)])
+
+# ---- 프로필 캐시: 읽기 관통(read-through) + 이 프로세스 쓰기의 write-through(ver 역행 방지)
+_GLOBAL_PROFILE_PATHS = ("calibration/global", "users/_GLOBAL_/profile/calibration")
+profile_cache = LRUCache(PC_MAX_ITEMS, PC_TTL_SEC)
+
+def _is_profile_path(path: str) -> bool:
+    return path in _GLOBAL_PROFILE_PATHS or (path.startswith("users/") and path.endswith("/calibration/current"))
+
+# 프로세스 간 무효화: 학습으로 프로필을 기록하면 저장소의 공유 세대(profile_gen)를 올리고,
+# 각 워커는 PC_CHECK_SEC 마다 한 번 세대를 읽어 바뀌었으면 프로필 캐시를 비운다(나머지 조회는 메모리만)
+_PROFILE_GEN_KEY = "profile_gen"
+_profile_gen = {"seen": None, "checked": 0.0}
+_profile_gen_lock = threading.Lock()
+
+def _check_profile_gen():
+    if PC_CHECK_SEC <= 0:
+        return
+    now = time.monotonic()
+    with _profile_gen_lock:
+        if now - _profile_gen["checked"] < PC_CHECK_SEC:
+            return
+        _profile_gen["checked"] = now
+    try:
+        gen = store.get_counter(_PROFILE_GEN_KEY)
+    except Exception as e:
+        print("[HF][profile-cache] 세대 확인 실패:", e)
+        return
+    with _profile_gen_lock:
+        if _profile_gen["seen"] is not None and gen != _profile_gen["seen"]:
+            profile_cache.clear()
+        _profile_gen["seen"] = gen
+
+def _bump_profile_gen():
+    """프로필 기록 후 호출 → 다른 워커가 다음 확인 주기에 캐시를 비운다."""
+    try:
+        gen = store.bump_counter(_PROFILE_GEN_KEY)
+    except Exception as e:
+        print("[HF][profile-cache] 세대 증가 실패:", e)
+        return
+    with _profile_gen_lock:
+        if _profile_gen["seen"] == gen - 1:
+            _profile_gen["seen"] = gen  # 그사이 다른 증가가 없었으면 내 캐시(_publish_profiles 로 갱신됨)는 유지
+
+def get_profile_doc(path: str) -> dict:
+    """캐시 우선 조회. 없는 문서도 {} 로 캐시하되 PC_NEG_TTL_SEC 동안만(첫 학습이 곧 보이게)."""
+    _check_profile_gen()
+    doc = profile_cache.get(path)
+    if doc is None:
+        doc = write_behind.get_doc(path)
+        profile_cache.put(path, doc, ttl=None if doc else PC_NEG_TTL_SEC)
+    return doc
+
+def _publish_profiles(writes):
+    """기록된 [(path, doc, merge)] 중 프로필 문서를 캐시에 반영. 캐시의 ver 가 더 새로우면 유지."""
+    for path, doc, merge in writes:
+        if not _is_profile_path(path):
+            continue
+        if merge:
+            profile_cache.discard(path)  # 부분 쓰기: 다음 조회에서 다시 읽음
+            continue
+        cur = profile_cache.peek(path)
+        if cur and str(cur.get("ver", "")) > str(doc.get("ver", "")):
+            continue
+        profile_cache.put(path, doc)
+
+def _eval_run_doc(scope: str, uid: str, metrics: dict, run_id: str = None):
+    # runId = 시각(초) [+ "__user:{uid}"] — 시간 정렬 키이자 문서 ID(같은 초의 전역/개인 실행이 충돌하지 않음)
+    run_id = run_id or (now_iso() if scope == "global" else f"{now_iso()}__user:{uid}")
     doc = {
         "runId": run_id,
         "scope": scope if scope=="global" else f"user:{uid}",
@@ -603,8 +2776,30 @@ def _save_eval_run(scope: str, uid: str, metrics: dict):
         "metrics": {k: float(v) for k,v in metrics.items() if k != "_n"},
         "updatedAt": now_iso()
     }
-    store.set_doc(f"eval_runs/{run_id}", doc, merge=False)
-    return run_id
+    return f"eval_runs/{run_id}", doc
+
+def _save_eval_run(scope: str, uid: str, metrics: dict):
+    path, doc = _eval_run_doc(scope, uid, metrics)
+    write_behind.put(path, doc, merge=False)
+    return doc["runId"]
+
+def _calib_stats_path(scope: str, uid: str) -> str:
+    """증분 보정 충분통계 문서 — 전역: calibration/global_stats, 개인: users/{uid}/calibration/stats."""
+    return "calibration/global_stats" if scope == "global" else f"users/{uid}/calibration/stats"
+
+def _fit_calibration(ps: List[float], ys: List[int], algo: str = "both"):
+    """(platt_ab, iso_bins_map, metrics, stats) — metrics 에 표본 수 _n 포함, stats 는 증분 보정 시드."""
+    platt_ab = train_platt(ps, ys) if algo in ("platt","both") else None
+    iso_bins_map = train_isotonic(ps, ys) if algo in ("isotonic","both") else None
+    metrics = compute_metrics(ps, ys)
+    metrics["_n"] = len(ps)
+    stats = calib_stats_init(ps, ys, platt_ab, algo)
+    return platt_ab, iso_bins_map, metrics, stats
+
+def _fit_calibration_job(job):
+    # 프로세스 풀 작업 단위(피클 가능한 최상위 함수)
+    uid, ps, ys, algo = job
+    return (uid,) + _fit_calibration(ps, ys, algo)
 
 @app.post("/calibration/train")
 def calibration_train():
@@ -636,18 +2831,14 @@ def calibration_train():
     if n < max(5, min_samples):
         return jsonify({"error":"insufficient_samples", "found": n, "min_samples": min_samples}), 400
 
-    platt_ab = None
-    iso_bins_map = None
-    if algo in ("platt","both"):
-        platt_ab = train_platt(ps, ys)
-    if algo in ("isotonic","both"):
-        iso_bins_map = train_isotonic(ps, ys)
-
-    metrics = compute_metrics(ps, ys)
-    metrics["_n"] = n
+    platt_ab, iso_bins_map, metrics, stats = _fit_calibration(ps, ys, algo)
+    stats["min_samples"] = min_samples
 
+    if scope == "global":
+        global_observer.flush()  # 모아 둔 전역 증분이 새 통계 위에 다시 얹히지 않게
     _save_calibration(scope, uid or "", platt_ab, iso_bins_map, metrics, rated_samples=n, min_samples=min_samples)
-    run_id = _save_eval_run(scope, uid or "", metrics)
+    write_behind.put(_calib_stats_path(scope, uid or ""), stats, merge=False)
+    run_id = _save_eval_run(scope, uid or "", metrics)  # 저장은 write-behind — 응답은 기록을 기다리지 않는다
 
     return jsonify({
         "ok": True,
@@ -660,46 +2851,691 @@ def calibration_train():
         "eval_run_id": run_id
     })
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 전체 사용자 일괄 보정: 피드백 1회 스캔 → uid 별 그룹 → 프로세스 풀 병렬 적합 → 배치 쓰기
+# ─────────────────────────────────────────────────────────────────────────────
+CALIB_POOL_MIN_USERS = int(os.getenv("HF_CALIB_POOL_MIN_USERS", "8"))  # 이보다 적으면 순차 적합
+
+def train_all_users(algo: str = "both", min_samples: int = 20, workers: int = 0,
+                    include_global: bool = True, write_eval_runs: bool = True) -> dict:
+    t0 = time.monotonic()
+    by_uid: Dict[str, List[dict]] = {}
+    for row in store.iter_feedback():
+        by_uid.setdefault(row.get("_uid") or "", []).append(row)
+    by_uid.pop("", None)
+    t_scan = time.monotonic()
+
+    jobs, skipped = [], []
+    all_ps, all_ys = [], []
+    for uid, rows in by_uid.items():
+        ps, ys, _ = _extract_training_pairs(rows)
+        all_ps.extend(ps); all_ys.extend(ys)
+        if len(ps) < max(5, min_samples):
+            skipped.append({"uid": uid, "found": len(ps)})
+        else:
+            jobs.append((uid, ps, ys, algo))
+
+    workers = workers or (os.cpu_count() or 1)
+    if workers > 1 and len(jobs) >= CALIB_POOL_MIN_USERS:
+        import multiprocessing as mp
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: 서버 프로세스(배처·write-behind 스레드, torch 스레드 풀, SQLite/gRPC 핸들)를 fork 하면 자식이
+        # 복사된 잠금에서 멈출 수 있다. 새 인터프리터는 이 모듈만 임포트(모델·torch 는 지연 로드라 ~0.5s)하고
+        # _fit_calibration_job(NumPy 보정 계산)만 실행한다
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx) as ex:
+            fits = list(ex.map(_fit_calibration_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        fits = [_fit_calibration_job(j) for j in jobs]
+
+    global_res = None
+    if include_global and len(all_ps) >= max(5, min_samples):
+        global_res = _fit_calibration(all_ps, all_ys, algo)
+    t_fit = time.monotonic()
+
+    ts = now_iso()
+    writes = []
+    for uid, platt_ab, iso_bins_map, metrics, stats in fits:
+        stats["min_samples"] = min_samples
+        writes.append(_calibration_doc("user", uid, platt_ab, iso_bins_map, metrics, metrics["_n"], min_samples) + (False,))
+        writes.append((_calib_stats_path("user", uid), stats, False))
+        if write_eval_runs:
+            writes.append(_eval_run_doc("user", uid, metrics, f"{ts}__user:{uid}") + (False,))
+    if global_res:
+        platt_ab, iso_bins_map, metrics, stats = global_res
+        stats["min_samples"] = min_samples
+        writes.append(_calibration_doc("global", "", platt_ab, iso_bins_map, metrics, metrics["_n"], min_samples) + (False,))
+        writes.append((_calib_stats_path("global", ""), stats, False))
+        if write_eval_runs:
+            writes.append(_eval_run_doc("global", "", metrics, ts) + (False,))
+    if global_res:
+        global_observer.flush()  # 모아 둔 전역 증분이 재학습 결과 위에 다시 얹히지 않게(이미 피드백에 포함)
+    write_behind.flush()  # 먼저 들어온 대기 쓰기가 이 결과를 나중에 덮지 않게
+    store.set_docs(writes)
+    _publish_profiles(writes)
+    _bump_profile_gen()
+    t_write = time.monotonic()
+
+    return {
+        "ok": True,
+        "algo": algo,
+        "min_samples": min_samples,
+        "users_total": len(by_uid),
+        "users_trained": len(fits),
+        "users_skipped": len(skipped),
+        "skipped": skipped,
+        "samples_total": len(all_ps),
+        "global": {k: v for k, v in global_res[2].items() if k != "_n"} if global_res else None,
+        "docs_written": len(writes),
+        "timings_ms": {
+            "scan": (t_scan - t0) * 1000.0,
+            "fit": (t_fit - t_scan) * 1000.0,
+            "write": (t_write - t_fit) * 1000.0,
+            "total": (t_write - t0) * 1000.0,
+        },
+    }
+
+@app.post("/calibration/train_all")
+def calibration_train_all():
+    data = request.get_json(silent=True) or {}
+    algo = data.get("algo", "both")
+    if algo not in ("platt", "isotonic", "both"):
+        return jsonify({"error": "bad_algo"}), 400
+    res = train_all_users(
+        algo=algo,
+        min_samples=int(data.get("min_samples", 20)),
+        workers=int(data.get("workers", 0)),
+        include_global=bool(data.get("include_global", True)),
+        write_eval_runs=bool(data.get("eval_runs", True)),
+    )
+    return jsonify(res)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 증분 보정: 새 피드백 → 스코프별 충분통계 O(1) 갱신 → 보정 프로필 재작성(전체 스캔 없음)
+# ─────────────────────────────────────────────────────────────────────────────
+def _observe_scope(scope: str, uid: str, ps: List[float], ys: List[int]):
+    """표본을 스코프 충분통계에 순서대로 반영(+프로필 재작성) — 한 트랜잭션. → 기록한 [(path, doc, merge)]"""
+    def apply(cur):
+        st = cur if cur.get("iso_n") else calib_stats_init([], [])
+        for p, y in zip(ps, ys):
+            calib_stats_observe(st, p, y)
+        writes = [(_calib_stats_path(scope, uid), st, False)]
+        min_samples = int(st.get("min_samples", 20))
+        if st["n"] >= max(5, min_samples):
+            platt_ab, iso_bins_map = calib_stats_fit(st)
+            path, doc = _calibration_doc(scope, uid, platt_ab, iso_bins_map, calib_stats_metrics(st),
+                                         st["n"], min_samples)
+            doc["incremental"] = True
+            writes.append((path, doc, False))
+        return writes
+    # 대기 중인 전체 학습 결과(통계·프로필)를 먼저 기록 → 그 위에 반영하고, 나중에 덮이지도 않는다
+    write_behind.sync("calibration/" if scope == "global" else f"users/{uid}/calibration/")
+    writes = store.transact(_calib_stats_path(scope, uid), apply)
+    _publish_profiles(writes)
+    # 세대 문서도 한 문서라 firestore 에서 개인 증분마다 올리면 같은 쓰기 병목 → 개인 증분은 TTL 로 반영
+    if len(writes) > 1 and (scope == "global" or store.mode == "local"):
+        _bump_profile_gen()
+    return writes
+
+class GlobalObserveBuffer:
+    """전역 통계 증분 모으기. calibration/global_stats 는 모든 사용자의 피드백이 몰리는 단일 문서라
+    행마다 읽기-수정-쓰기를 하면 서로 직렬화되고(Firestore 는 문서당 초당 ~1회 쓰기) 트랜잭션 경합·중단이 잦다.
+    → 프로세스별로 (p, y) 를 도착 순서대로 모았다가 CALIB_GLOBAL_FLUSH_MS 마다 한 트랜잭션으로 반영
+      (온라인 뉴턴 스텝은 순서에 의존하므로 합산이 아니라 같은 순서로 재생). 실패하면 앞에 되돌려 다음 주기에 재시도.
+    전역 프로필은 최대 한 주기 늦게 반영된다. 전체 재학습 전에는 flush() 로 먼저 비운다."""
+    def __init__(self):
+        self._pid = None
+        self._init()
+
+    def _init(self):
+        self._lock = threading.Condition()
+        self._io = threading.Lock()
+        self._samples = []
+        self._thread = None
+        self._closed = False
+        self.stats = {"observed": 0, "flushes": 0, "errors": 0, "last_error": None, "last_flush_ms": None}
+
+    def reset(self):
+        # fork 후: 부모의 잠금/스레드 상태를 버리고 새로 시작
+        self._init()
+        self._pid = None
+
+    def add(self, ps: List[float], ys: List[int]):
+        with self._lock:
+            self._samples.extend(zip(ps, ys))
+            self.stats["observed"] += len(ps)
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name="hf-calib-global", daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def flush(self) -> bool:
+        """모인 표본을 지금 반영(호출 스레드에서). 실패하면 표본을 되돌리고 False."""
+        with self._io:
+            with self._lock:
+                batch, self._samples = self._samples, []
+            if not batch:
+                return True
+            t0 = time.perf_counter()
+            try:
+                _observe_scope("global", "", [p for p, _ in batch], [y for _, y in batch])
+            except Exception as e:
+                with self._lock:
+                    self._samples[:0] = batch
+                    self.stats["errors"] += 1
+                    self.stats["last_error"] = str(e)
+                print(f"[HF][calib-global] 표본 {len(batch)}건 반영 실패(재시도 예정):", e)
+                return False
+            with self._lock:
+                self.stats["flushes"] += 1
+                self.stats["last_flush_ms"] = (time.perf_counter() - t0) * 1000.0
+            return True
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                while not self._samples and not self._closed:
+                    self._lock.wait()
+                if self._closed and not self._samples:
+                    return
+            time.sleep(CALIB_GLOBAL_FLUSH_MS / 1000.0)
+            self.flush()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        if not self.flush():
+            print(f"[HF][calib-global] 종료 시 표본 {self.depth()}건 반영 못 함:", self.stats["last_error"])
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"flush_ms": CALIB_GLOBAL_FLUSH_MS, "pending": len(self._samples), **self.stats}
+
+global_observer = GlobalObserveBuffer()
+atexit.register(global_observer.close)
+
+def observe_feedback(uid: str, rows: List[dict], include_global: bool = True) -> dict:
+    """새 피드백 행(저장 형태 그대로)을 개인/전역 통계에 반영. 개인은 통계+프로필을 한 트랜잭션으로 즉시,
+    전역은 global_observer 가 모아서 주기적으로(CALIB_GLOBAL_FLUSH_MS=0 이면 즉시).
+    같은 피드백의 재평가(수정)는 차감할 수 없으므로 다음 전체 재학습 때 반영된다."""
+    ps, ys, _ = _extract_training_pairs(rows)
+    out = {}
+    scopes = ([("user", uid)] if uid else []) + ([("global", "")] if include_global else [])
+    for scope, u in scopes:
+        if scope == "global" and CALIB_GLOBAL_FLUSH_MS > 0:
+            global_observer.add(ps, ys)
+            out[scope] = {"deferred": True, "pending": global_observer.depth()}
+            continue
+        writes = _observe_scope(scope, u, ps, ys)
+        st = writes[0][1]
+        out[scope] = {
+            "n": st["n"],
+            "since_full": st["since_full"],
+            "profile_updated": len(writes) > 1,
+            "needs_full_retrain": st["since_full"] >= CALIB_FULL_EVERY,
+        }
+    return {"ok": True, "observed": len(ps), "scopes": out}
+
+@app.post("/calibration/observe")
+def calibration_observe():
+    data = request.get_json(silent=True) or {}
+    uid = data.get("uid", None)
+    rows = data.get("rows")
+    if rows is None:
+        rows = [data["row"]] if isinstance(data.get("row"), dict) else []
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error":"rows_required"}), 400
+    include_global = bool(data.get("global", True))
+    if not uid and not include_global:
+        return jsonify({"error":"uid_required"}), 400
+    return jsonify(observe_feedback(uid, [r for r in rows if isinstance(r, dict)], include_global))
+
 @app.get("/calibration/profile")
 def calibration_profile():
+    """?uid= 단건 또는 ?uids=a,b,c 일괄(personal 이 uid→프로필 맵). ETag(ver 조합)로 변경 여부 확인."""
     uid = request.args.get("uid", None)
+    uids = [u for v in request.args.getlist("uids") for u in v.split(",") if u]
+    if len(uids) > PC_BULK_MAX:
+        return jsonify({"error":"too_many_uids", "max": PC_BULK_MAX}), 400
     # 전역 보정 경로 폴백: calibration/global → users/_GLOBAL_/profile/calibration
-    global_prof = store.get_doc("calibration/global") or \
-                  store.get_doc("users/_GLOBAL_/profile/calibration") or {}
-    personal = store.get_doc(f"users/{uid}/calibration/current") if uid else {}
-    return jsonify({ "global": global_prof, "personal": personal })
+    global_prof = get_profile_doc(_GLOBAL_PROFILE_PATHS[0]) or get_profile_doc(_GLOBAL_PROFILE_PATHS[1]) or {}
+    if uids:
+        personal = {u: get_profile_doc(f"users/{u}/calibration/current") for u in dict.fromkeys(uids)}
+        vers = {u: d.get("ver") for u, d in personal.items()}
+    else:
+        personal = get_profile_doc(f"users/{uid}/calibration/current") if uid else {}
+        vers = personal.get("ver")
+    etag = '"' + _digest([global_prof.get("ver"), vers])[:32] + '"'
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers={"ETag": etag})
+    resp = jsonify({ "global": global_prof, "personal": personal })
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+# ---- 평가 실행 이력: runId(시간) 순 인덱스 + scope 보조 인덱스로 최신/범위/페이지/추세 조회
+EVAL_PAGE_MAX = int(os.getenv("HF_EVAL_PAGE_MAX", "500"))
+EVAL_TREND_MAX_RUNS = int(os.getenv("HF_EVAL_TREND_MAX_RUNS", "20000"))
+_TREND_BUCKETS = {"run": None, "hour": 13, "day": 10, "month": 7}   # runId(ISO) 접두 길이
+
+def _eval_scope_arg(args):
+    """scope=global | scope=user&uid=.. | scope=user:{uid} → 저장된 scope 문자열(None=전체)."""
+    scope = args.get("scope") or None
+    if scope == "user":
+        uid = args.get("uid")
+        return f"user:{uid}" if uid else False
+    return scope
 
 @app.get("/eval/latest")
 def eval_latest():
-    if store.mode == "local":
-        data = store._read_local()
-        items = [(k,v) for k,v in data.items() if k.startswith("eval_runs/")]
-        if not items: return jsonify({})
-        latest = sorted(items, key=lambda kv: kv[0], reverse=True)[0][1]
-        return jsonify(latest)
-    else:
-        return jsonify({})
+    scope = _eval_scope_arg(request.args)
+    if scope is False:
+        return jsonify({"error":"uid_required"}), 400
+    write_behind.sync("eval_runs/")
+    items = store.list_eval_runs(scope=scope, limit=1, desc=True)
+    return jsonify(items[0] if items else {})
+
+@app.get("/eval/runs")
+def eval_runs():
+    """?scope=&since=&until=&limit=&cursor=&order=desc|asc → {items, next_cursor}."""
+    a = request.args
+    scope = _eval_scope_arg(a)
+    if scope is False:
+        return jsonify({"error":"uid_required"}), 400
+    limit = max(1, min(EVAL_PAGE_MAX, int(a.get("limit", 50))))
+    write_behind.sync("eval_runs/")
+    items = store.list_eval_runs(scope=scope, since=a.get("since"), until=a.get("until"),
+                                 limit=limit, cursor=a.get("cursor"), desc=a.get("order", "desc") != "asc")
+    return jsonify({
+        "items": items,
+        "next_cursor": items[-1].get("runId") if len(items) == limit else None,
+    })
+
+def eval_trend(scope=None, since=None, until=None, metrics=None, bucket: str = "day") -> dict:
+    """기간 내 실행을 오래된 순으로 페이지 순회하며 지표별 bucket 평균/최소/최대를 누적(표본 수 가중 평균 포함)."""
+    plen = _TREND_BUCKETS[bucket]
+    agg: Dict[str, dict] = {}
+    cursor, seen = None, 0
+    write_behind.sync("eval_runs/")
+    while seen < EVAL_TREND_MAX_RUNS:
+        page = store.list_eval_runs(scope=scope, since=since, until=until,
+                                    limit=EVAL_PAGE_MAX, cursor=cursor, desc=False)
+        for run in page:
+            rid = run.get("runId", "")
+            key = rid if plen is None else rid[:plen]
+            b = agg.setdefault(key, {"runs": 0, "samples": 0, "metrics": {}})
+            b["runs"] += 1
+            n = int(run.get("sample_count", 0))
+            b["samples"] += n
+            for k, v in (run.get("metrics") or {}).items():
+                if metrics and k not in metrics:
+                    continue
+                m = b["metrics"].setdefault(k, {"sum": 0.0, "wsum": 0.0, "min": v, "max": v})
+                m["sum"] += v; m["wsum"] += v * n
+                m["min"] = min(m["min"], v); m["max"] = max(m["max"], v)
+        seen += len(page)
+        if len(page) < EVAL_PAGE_MAX:
+            break
+        cursor = page[-1].get("runId")
+    series = []
+    for key, b in agg.items():
+        series.append({
+            "bucket": key, "runs": b["runs"], "samples": b["samples"],
+            "metrics": {k: {"mean": m["sum"] / b["runs"],
+                            "weighted": (m["wsum"] / b["samples"]) if b["samples"] else m["sum"] / b["runs"],
+                            "min": m["min"], "max": m["max"]}
+                        for k, m in b["metrics"].items()},
+        })
+    delta = {}
+    if len(series) >= 2:
+        first, last = series[0]["metrics"], series[-1]["metrics"]
+        delta = {k: last[k]["mean"] - first[k]["mean"] for k in last if k in first}
+    return {"scope": scope, "bucket": bucket, "runs": seen, "truncated": seen >= EVAL_TREND_MAX_RUNS,
+            "series": series, "delta": delta}
+
+@app.get("/eval/trend")
+def eval_trend_api():
+    """?scope=&since=&until=&bucket=run|hour|day|month&metrics=ece,brier → bucket 별 지표 추세."""
+    a = request.args
+    scope = _eval_scope_arg(a)
+    if scope is False:
+        return jsonify({"error":"uid_required"}), 400
+    bucket = a.get("bucket", "day")
+    if bucket not in _TREND_BUCKETS:
+        return jsonify({"error":"bad_bucket"}), 400
+    metrics = [m for m in (a.get("metrics") or "").split(",") if m] or None
+    return jsonify(eval_trend(scope, a.get("since"), a.get("until"), metrics, bucket))
+
+# ---- /metrics: 요청 시간 훅 + 기존 통계(캐시·배처·모델)를 콜백 지표로 노출
+@app.before_request
+def _metrics_t0():
+    request.environ["hf.t0"] = time.perf_counter()
+
+@app.after_request
+def _metrics_observe(resp):
+    t0 = request.environ.get("hf.t0")
+    if t0 is not None:
+        rule = request.url_rule.rule if request.url_rule else "unmatched"
+        M_HTTP.observe(time.perf_counter() - t0, rule, request.method, str(resp.status_code))
+    return resp
+
+def _cache_rows(field):
+    return [((n,), c.stats()[field]) for n, c in (("result", result_cache), ("sentence", sentence_cache), ("profile", profile_cache))]
+
+_metric(CallbackMetric("hf_cache_hits_total", "캐시 적중", "counter", ("cache",), lambda: _cache_rows("hits")))
+_metric(CallbackMetric("hf_cache_misses_total", "캐시 미스", "counter", ("cache",), lambda: _cache_rows("misses")))
+_metric(CallbackMetric("hf_cache_entries", "캐시 항목 수", "gauge", ("cache",), lambda: _cache_rows("size")))
+_metric(CallbackMetric("hf_cache_bytes", "캐시 추정 바이트", "gauge", ("cache",), lambda: _cache_rows("bytes")))
+_metric(CallbackMetric("hf_microbatch_in_flight", "배처에 제출 후 대기 중인 요청", "gauge", (),
+                       lambda: [((), batcher.stats()["in_flight"])]))
+_metric(CallbackMetric("hf_model_info", "현재 모델 묶음(값은 항상 1)", "gauge", ("zsl_model", "nli_model", "backend", "gen"),
+                       lambda: [((_bundle.zsl_name, _bundle.nli_name, _bundle.backend, _bundle.gen), 1)] if _bundle else []))
+_metric(CallbackMetric("hf_ready", "준비 완료(1) 여부", "gauge", (), lambda: [((), 1 if _ready.is_set() else 0)]))
+_metric(CallbackMetric("hf_admission_requests", "수락 제어: 추론 중(inflight)·자리 대기 중(waiting) 요청", "gauge", ("pool", "state"),
+                       lambda: [((a.name, k), getattr(a, k)) for a in (admission, bulk_admission) for k in ("inflight", "waiting")]))
+_metric(CallbackMetric("hf_write_behind_pending", "write-behind 대기+기록 중 문서 수", "gauge", (),
+                       lambda: [((), write_behind.depth())]))
+_metric(CallbackMetric("hf_write_behind_errors_total", "write-behind 배치 기록 실패", "counter", (),
+                       lambda: [((), write_behind.stats["errors"])]))
+
+def _cascade_rows():
+    r = _bundle.emb.report() if (_bundle and _bundle.emb) else None
+    return [(("escalation_rate",), r["escalation_rate"]), (("agreement_escalated",), r["agreement_escalated"]),
+            (("agreement_shadow",), r["agreement_shadow"])] if r else []
+
+_metric(CallbackMetric("hf_cascade_ratio", "cascade 승급률·교차 인코더와의 top-1 일치율", "gauge", ("kind",), _cascade_rows))
+
+@app.get("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.get("/admin/stats")
+def admin_stats():
+    return jsonify({
+        "batcher": batcher.stats(),
+        "result_cache": result_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+        "sentence_cache": sentence_cache.stats(),
+        "scorers": {sc.name: dict(sc.stats) for sc in (_bundle.scorers() if _bundle else [])},
+        "cascade": _bundle.emb.report() if (_bundle and _bundle.emb) else None,
+        "write_behind": write_behind.info(),
+        "calib_global": global_observer.info(),
+        "admission": {a.name: a.info() for a in (admission, bulk_admission)},
+        "bundle": _bundle.info() if _bundle else None,
+        "reload": reload_status(),
+    })
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Phase 4: 모델 핫-리로드(LoRA/Adapter 아티팩트 전환)
 # ─────────────────────────────────────────────────────────────────────────────
+#  - 새 묶음을 백그라운드에서 빌드 → 워밍업 → 스모크/패리티 점검 → 참조 1회 대입으로 교체
+#  - 진행 중 요청은 쥐고 있던 이전 묶음으로 끝나고, 마지막 참조가 풀리면 이전 묶음이 해제된다
+#  - 캐시 키에 세대(gen)가 들어가므로 캐시를 비우지 않는다(교체 직후 적중률 급락 없음)
+#  - 빌드 중에는 두 묶음이 동시에 메모리에 올라간다(피크 = 모델 2벌)
+#  - serve --workers N 에서는 모든 워커가 각자 리로드한다(아래 "워커 전파" 참고)
+RELOAD_DRAIN_SEC = float(os.getenv("HF_RELOAD_DRAIN_SEC", "60"))   # 이전 묶음 해제 대기 상한
+_reload_state = {"state": "idle"}
+
+def _set_reload(**kw):
+    _reload_state.update(kw, at=now_iso())
+    print(f"[HF][reload] {kw.get('state', '')} {kw.get('error', '')}".rstrip())
+    if _worker_sync["on"] and "state" in kw:
+        _report_worker()
+
+def reload_status() -> dict:
+    st = dict(_reload_state)
+    st["draining"] = [b.gen for b in (r() for r in _retired) if b is not None]
+    return st
+
+_WARMUP_PHRASES = [
+    "오늘은 아침부터 비가 내려서 기분이 조금 가라앉았다.", "친구가 갑자기 연락을 끊어서 서운하고 화가 났다.",
+    "발표 준비를 열심히 했는데 결과가 좋지 않아 속상하다.", "가족과 저녁을 먹으며 오랜만에 편안함을 느꼈다.",
+    "내일 면접이 있어서 밤새 걱정이 멈추지 않는다.", "나는 아무리 노력해도 결국 실패할 것 같다.",
+]
+
+def _synthetic_text(tokenizer, n_tokens: int) -> str:
+    """대략 n_tokens 토큰 길이의 합성 한국어 문단."""
+    out, i = [], 0
+    while True:
+        out.append(_WARMUP_PHRASES[i % len(_WARMUP_PHRASES)]); i += 1
+        text = " ".join(out)
+        if len(tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"]) >= n_tokens or i > 4096:
+            return text
+
+def _warm_bundle(b: ModelBundle) -> dict:
+    """준비 완료/교체 전에 첫 요청 지연(CUDA·cuDNN 초기화, 토크나이저, 할당자 증가, 컴파일)을 흡수.
+    단계별 소요(ms)를 반환·로그. 길이 버킷마다 토큰 예산을 채우는 배치로 실제 형태의 텐서를 미리 할당한다."""
+    timings = {}
+    if not HF_WARMUP:
+        return timings
+    t = time.monotonic()
+    def lap(name):
+        nonlocal t
+        now = time.monotonic(); timings[name] = (now - t) * 1000.0; t = now
+
+    hyps = [EMOTION_TEMPLATE.format(l) for l in DEFAULT_EMOTION_LABELS]
+    for sc in b.scorers():
+        sc._encode([(s, h) for s in PARITY_SAMPLES for h in hyps])
+    lap("tokenizer")
+
+    sample = [(s, h) for s in PARITY_SAMPLES[:2] for h in hyps[:4]]
+    for sc in b.scorers():
+        res = sc.try_compile(HF_COMPILE, sample)
+        if res.get("mode") != "none":
+            timings[f"compile:{sc.name}"] = res
+    lap("compile")
+
+    for L in sorted({min(x, b.zsl.max_length) for x in HF_WARMUP_LENGTHS if x > 0}):
+        text = _synthetic_text(b.zsl.tokenizer, L)
+        per = len(hyps) + 1
+        n_items = max(per, min(HF_BATCH_MAX_ITEMS, HF_MAX_BATCH_TOKENS // max(1, L)) if HF_MAX_BATCH_TOKENS > 0 else HF_BATCH)
+        pairs = ([(text, h) for h in hyps] + [(text, PARITY_CORE_BELIEF)]) * max(1, n_items // per)
+        for _ in range(max(1, HF_WARMUP_ROUNDS)):
+            for sc in b.scorers():
+                sc.logits(pairs)
+        lap(f"len{L}")
+
+    if b.emb is not None:
+        for _ in range(max(1, HF_WARMUP_ROUNDS)):
+            b.emb.label_scores(PARITY_SAMPLES)
+        lap("cascade")
+
+    # /scores 경로 전체(배처 스레드·문장 융합) 1회 — 캐시는 건드리지 않음
+    score_sentences(PARITY_SAMPLES, PARITY_CORE_BELIEF, use_cache=False, bundle=b)
+    lap("pipeline")
+    print("[HF][warmup] " + " ".join(f"{k}={v:.0f}ms" for k, v in timings.items() if isinstance(v, float)))
+    return timings
+
+def _check_bundle(old: ModelBundle, new: ModelBundle, parity="auto") -> dict:
+    """스모크(로짓 유한·3클래스) + 패리티(auto: 같은 체크포인트·백엔드일 때만 현재 묶음과 비교)."""
+    res = {}
+    rows = [r for sc in new.scorers() for r in sc.logits([(PARITY_SAMPLES[0], PARITY_CORE_BELIEF)])]
+    res["smoke"] = all(len(r) == 3 and all(math.isfinite(x) for x in r) for r in rows)
+    same = old is not None and (old.zsl_name, old.nli_name, old.backend) == (new.zsl_name, new.nli_name, new.backend)
+    if old is not None and (parity is True or (parity == "auto" and same)):
+        res["parity"] = parity_check(old.zsl, new.zsl, backend=new.backend)
+    res["ok"] = res["smoke"] and res.get("parity", {}).get("ok", True)
+    return res
+
+def _drain(ref, timeout: float):
+    # 이전 묶음의 마지막 참조가 풀릴 때까지 대기 후 GPU 캐시 반환
+    import gc
+    t_end = time.monotonic() + timeout
+    while ref() is not None and time.monotonic() < t_end:
+        gc.collect()
+        time.sleep(0.2)
+    if HAS_TORCH and DEVICE >= 0:
+        torch.cuda.empty_cache()
+    return ref() is None
+
+def reload_models(zsl_name: str, nli_name: str, parity="auto", force: bool = False) -> dict:
+    """_reload_lock 을 쥔 상태에서 호출. 점검 실패 시 현재 묶음을 유지한다(force 면 점검 결과 무시)."""
+    t0 = time.monotonic()
+    try:
+        _set_reload(state="building", zsl_model=zsl_name, nli_model=nli_name, error=None, check=None, timings_ms={})
+        new = build_bundle(zsl_name, nli_name)
+        t1 = time.monotonic()
+        _set_reload(state="warming", gen=new.gen)
+        warm_stages = _warm_bundle(new)
+        t2 = time.monotonic()
+        _set_reload(state="checking")
+        chk = _check_bundle(_bundle, new, parity)
+        t3 = time.monotonic()
+        timings = {"build": (t1 - t0) * 1000.0, "warm": (t2 - t1) * 1000.0, "check": (t3 - t2) * 1000.0,
+                   "warm_stages": warm_stages}
+        if not chk["ok"] and not force:
+            _set_reload(state="failed", error="check_failed", check=chk, timings_ms=timings)
+            return reload_status()
+        old = swap_bundle(new)
+        del new
+        _startup_state.update(state="ready")  # 워밍업을 마친 묶음이므로 기동 전 리로드도 준비 완료
+        _ready.set()
+        _set_reload(state="swapped", check=chk, timings_ms=timings)
+        if old is not None:
+            ref = weakref.ref(old)
+            del old
+            freed = _drain(ref, RELOAD_DRAIN_SEC)
+            _set_reload(state="done" if freed else "swapped_old_pinned",
+                        timings_ms={**timings, "drain": (time.monotonic() - t3) * 1000.0})
+        else:
+            _set_reload(state="done")
+    except Exception as e:
+        _set_reload(state="failed", error=str(e))
+    return reload_status()
+
 @app.post("/admin/reload")
 def admin_reload():
-    global ZSL_MODEL_NAME, NLI_MODEL_NAME  # 참조 전에 global 선언 필수
+    """본문: {zsl_model?, nli_model?, parity?: "auto"|true|false, force?, wait?}
+    기본은 백그라운드 진행(202) — 상태는 GET /admin/reload. wait=true 면 끝날 때까지 대기.
+    serve --workers N 이면 요청을 게시해 모든 워커가 리로드하고, 응답은 워커별 상태(workers)."""
     data = request.get_json(silent=True) or {}
     new_zsl = data.get("zsl_model") or ZSL_MODEL_NAME
     new_nli = data.get("nli_model") or NLI_MODEL_NAME
-    with _reload_lock:
-        load_models(new_zsl, new_nli)
-    return jsonify({"ok": True, "zsl_model": ZSL_MODEL_NAME, "nli_model": NLI_MODEL_NAME})
+    parity = data.get("parity", "auto")
+    force = bool(data.get("force", False))
+    if _worker_sync["on"]:
+        return _publish_reload(new_zsl, new_nli, parity, force, bool(data.get("wait")))
+    if not _reload_lock.acquire(blocking=False):
+        return jsonify({"error": "reload_in_progress", "status": reload_status()}), 409
+
+    def _job():
+        try:
+            return reload_models(new_zsl, new_nli, parity, force)
+        finally:
+            _reload_lock.release()
+
+    if data.get("wait"):
+        st = _job()
+        return jsonify({"ok": st["state"] in ("done", "swapped_old_pinned"), "status": st}), \
+            (200 if st["state"] != "failed" else 500)
+    threading.Thread(target=_job, name="hf-reload", daemon=True).start()
+    return jsonify({"ok": True, "status": reload_status()}), 202
+
+@app.get("/admin/reload")
+def admin_reload_status():
+    out = {"bundle": _bundle.info() if _bundle else None, "status": reload_status()}
+    if _worker_sync["on"]:
+        out.update(_workers_summary())
+    return jsonify(out)
+
+# ---- 워커 전파(serve --workers N): 요청을 받은 한 워커만 교체하면 워커마다 다른 모델이 응답하므로
+#  - POST 를 받은 워커는 요청(모델·옵션)을 저장소 _admin/reload 에 리로드 세대(bundle_gen 카운터)와 함께 게시만 한다
+#  - 각 워커의 감시 스레드가 HF_RELOAD_CHECK_SEC 마다 요청을 읽고, 세대가 새로우면 스스로 reload_models 를 실행
+#  - 워커별 상태(pid·세대·모델·state)는 _admin/reload_workers 에 기록 → GET /admin/reload 의 workers 로 모아 본다
+#  - 마스터는 fork 전 세대를 기준으로 잡으므로 죽었다 다시 뜬 워커(프리로드된 옛 묶음)도 마지막 리로드를 따라잡는다
+#  - 리로드한 묶음은 워커마다 따로 올라가 CoW 공유가 풀린다(메모리 ≈ 워커 수 × 모델). 공유가 필요하면 env 를 바꿔 재시작
+RELOAD_CHECK_SEC = float(os.getenv("HF_RELOAD_CHECK_SEC", "2"))          # 워커의 리로드 요청 확인 주기
+RELOAD_WORKER_TTL_SEC = float(os.getenv("HF_RELOAD_WORKER_TTL_SEC", "60"))  # 이보다 오래 보고가 없는 워커는 목록에서 뺀다
+RELOAD_WAIT_SEC = float(os.getenv("HF_RELOAD_WAIT_SEC", "900"))          # wait=true 일 때 전 워커 완료 대기 상한
+_RELOAD_GEN_KEY = "bundle_gen"
+_RELOAD_REQ_DOC = "_admin/reload"
+_RELOAD_WORKERS_DOC = "_admin/reload_workers"
+_RELOAD_BUSY = ("building", "warming", "checking", "swapped")
+_worker_sync = {"on": False, "seen": 0}   # seen: 이 워커가 마지막으로 처리한 리로드 세대
+
+def _report_worker():
+    b = _bundle
+    st = _reload_state
+    row = {"reload_gen": _worker_sync["seen"], "state": st.get("state"), "error": st.get("error"),
+           "zsl_model": b.zsl_name if b else None, "nli_model": b.nli_name if b else None,
+           "bundle_gen": b.gen if b else None, "ts": time.time()}
+    try:
+        store.set_doc(_RELOAD_WORKERS_DOC, {str(os.getpid()): row}, merge=True)
+    except Exception as e:
+        print("[HF][reload] 워커 상태 기록 실패:", e)
+
+def _live_workers() -> dict:
+    now = time.time()
+    rows = store.get_doc(_RELOAD_WORKERS_DOC)
+    return {pid: r for pid, r in rows.items() if isinstance(r, dict) and now - r.get("ts", 0) <= RELOAD_WORKER_TTL_SEC}
+
+def _workers_summary(gen: int = None) -> dict:
+    gen = store.get_counter(_RELOAD_GEN_KEY) if gen is None else gen
+    ws = _live_workers()
+    models = {(w.get("zsl_model"), w.get("nli_model")) for w in ws.values()}
+    return {"reload_gen": gen, "workers": ws, "mixed": len(models) > 1,
+            "pending": sorted(pid for pid, w in ws.items() if w.get("reload_gen", 0) < gen or w.get("state") in _RELOAD_BUSY)}
+
+def _publish_reload(zsl_name, nli_name, parity, force, wait):
+    cur = _workers_summary()
+    if cur["pending"]:
+        return jsonify({"error": "reload_in_progress", **cur}), 409
+    gen = store.bump_counter(_RELOAD_GEN_KEY)
+    store.set_doc(_RELOAD_REQ_DOC, {"gen": gen, "zsl_model": zsl_name, "nli_model": nli_name,
+                                    "parity": parity, "force": force, "at": now_iso()}, merge=False)
+    print(f"[HF][reload] 세대 {gen} 게시: 워커 {len(cur['workers'])}개가 리로드")
+    if not wait:
+        return jsonify({"ok": True, "reload_gen": gen, "workers": cur["workers"]}), 202
+    t_end = time.monotonic() + RELOAD_WAIT_SEC
+    while True:
+        time.sleep(max(0.2, RELOAD_CHECK_SEC / 2))
+        sm = _workers_summary(gen)
+        if not sm["pending"] or time.monotonic() >= t_end:
+            break
+    failed = sorted(pid for pid, w in sm["workers"].items() if w.get("state") == "failed")
+    ok = not sm["pending"] and not failed and not sm["mixed"]
+    return jsonify({"ok": ok, "failed": failed, **sm}), (200 if ok else 504 if sm["pending"] else 500)
+
+def _reload_watch():
+    beat = 0.0
+    while True:
+        time.sleep(RELOAD_CHECK_SEC)
+        if not _ready.is_set():
+            continue  # 기동 로드가 끝난 뒤에만(GPU 모드 워커는 각자 로드 중)
+        try:
+            req = store.get_doc(_RELOAD_REQ_DOC)
+        except Exception as e:
+            print("[HF][reload] 요청 확인 실패:", e)
+            continue
+        gen = int(req.get("gen", 0))
+        if gen > _worker_sync["seen"]:
+            with _reload_lock:
+                _worker_sync["seen"] = gen
+                reload_models(req.get("zsl_model") or ZSL_MODEL_NAME, req.get("nli_model") or NLI_MODEL_NAME,
+                              req.get("parity", "auto"), bool(req.get("force")))
+            beat = time.monotonic()
+        elif time.monotonic() - beat >= RELOAD_WORKER_TTL_SEC / 3:
+            _report_worker()  # 생존 신호
+            beat = time.monotonic()
+
+def _start_reload_watch():
+    if _worker_sync["on"]:
+        threading.Thread(target=_reload_watch, name="hf-reload-watch", daemon=True).start()
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 발표/요약 카드(참고)
 # ─────────────────────────────────────────────────────────────────────────────
 def _analyze_summary_logic(text: str):
-    pol = zero_shot(text, candidate_labels=DEFAULT_POLARITY_LABELS, multi_label=False)
+    b = current_bundle()
+    pol = run_zero_shot([text], DEFAULT_POLARITY_LABELS, multi_label=False, bundle=b)[0]
     pol_label = pol["labels"][0]; pol_score = pol["scores"][0]
-    emo = zero_shot(text, candidate_labels=DEFAULT_EMOTION_LABELS, multi_label=True)
+    emo = run_zero_shot([text], DEFAULT_EMOTION_LABELS, bundle=b)[0]
     emo_pairs = sorted(zip(emo["labels"], emo["scores"]), key=lambda x: x[1], reverse=True)
     emo_top = [f"{normalize_emotion(l)}({s:.2f})" for l,s in emo_pairs[:3]]
     if pol_label == "긍정":
@@ -727,6 +3563,195 @@ def analyze_strength_alias():
 # ─────────────────────────────────────────────────────────────────────────────
 # 엔트리포인트
 # ─────────────────────────────────────────────────────────────────────────────
-if __name__ == "__main__":
+def _cli_export(args):
+    names = args.model or sorted({ZSL_MODEL_NAME, NLI_MODEL_NAME})
+    for name in names:
+        print(export_artifacts(name, args.backend, force=args.force))
+
+def _cli_parity(args):
+    name = args.model or ZSL_MODEL_NAME
+    ref = PairScorer(name, *_load_checkpoint(name, "torch"))
+    cand = PairScorer(name, *_load_checkpoint(name, args.backend))
+    res = parity_check(ref, cand, backend=args.backend, tol=args.tol)
+    print(json.dumps({"model": name, "backend": args.backend, **res}, ensure_ascii=False, indent=2))
+    return 0 if res["ok"] else 1
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 운영 서빙: gunicorn 멀티 워커(prefork) — 모델은 fork 전에 1회 로드해 CoW 로 공유
+#  - gc.freeze() 로 로드된 객체를 GC 추적에서 빼 워커의 페이지 복사(CoW 깨짐)를 줄인다
+#  - 텐서 저장소는 refcount 와 별도 메모리라 워커가 읽기만 하면 공유 상태가 유지된다
+#  - GPU 는 fork 전 CUDA 초기화가 불가하므로 워커별로 로드(주의: 워커 수만큼 VRAM 사용)
+# ─────────────────────────────────────────────────────────────────────────────
+def _after_fork(intra_op_threads: int):
+    if _init_torch() and intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    # Firestore(gRPC) 클라이언트는 fork 안전하지 않으므로 워커마다 새로 만든다
+    store.reset()
+    write_behind.reset()
+    global_observer.reset()
+
+def _cli_serve(args):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except Exception as e:
+        raise RuntimeError("멀티 워커 모드에는 gunicorn 패키지가 필요합니다. pip install gunicorn") from e
+    import gc
+
+    workers = max(1, args.workers)
+    intra = args.intra_op_threads or max(1, (os.cpu_count() or 1) // workers)
+    _init_torch()
+    preload = DEVICE < 0
+    if preload:
+        startup()  # 포크 전 로드·워밍업 → 워커는 준비 완료 상태로 시작
+        gc.collect()
+        gc.freeze()
+    else:
+        print("[HF][serve] GPU 모드: 워커별로 모델을 로드합니다")
+    try:
+        # 포크 전 리로드 세대 = 이 묶음의 기준. 워커는 이보다 새 세대만 따라 리로드한다
+        _worker_sync.update(on=workers > 1, seen=store.get_counter(_RELOAD_GEN_KEY))
+    except Exception as e:
+        print("[HF][serve] 리로드 세대 확인 실패 — 워커 전파 없이 실행:", e)
+
+    def post_fork(server, worker):
+        _after_fork(intra)
+
+    def post_worker_init(worker):
+        if not preload:
+            start_background()
+        _start_reload_watch()
+
+    def worker_exit(server, worker):
+        global_observer.close()
+        write_behind.close()  # 대기 중인 보정/평가 쓰기를 남기지 않고 종료
+
+    class _ServeApp(BaseApplication):
+        def load_config(self):
+            conf = {
+                "bind": args.bind, "workers": workers, "threads": max(1, args.threads),
+                "worker_class": "gthread", "preload_app": True, "timeout": args.timeout,
+                "post_fork": post_fork, "post_worker_init": post_worker_init, "worker_exit": worker_exit,
+            }
+            for k, v in conf.items():
+                self.cfg.set(k, v)
+
+        def load(self):
+            return app
+
+    print(f"[HF][serve] bind={args.bind} workers={workers} threads={args.threads} intra_op={intra} preload={preload}")
+    _ServeApp().run()
+
+def _cli_score_batch(args):
+    fin = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    t0 = time.monotonic()
+    n = 0
+    try:
+        if args.url:
+            import urllib.request
+            url = f"{args.url.rstrip('/')}/scores/batch?segment={'1' if args.segment else '0'}&window={args.window}"
+            if args.input == "-":
+                body, headers = fin.read(), {}
+            else:
+                body, headers = fin, {"Content-Length": str(os.path.getsize(args.input))}
+            req = urllib.request.Request(url, data=body, method="POST",
+                                         headers={"Content-Type": "application/x-ndjson", **headers})
+            with urllib.request.urlopen(req, timeout=args.timeout) as resp:
+                for line in resp:
+                    fout.write(line.decode("utf-8")); n += 1
+                    if n % 1000 == 0: print(f"[HF][score-batch] {n}", file=sys.stderr)
+        else:
+            load_models()
+            for row in score_documents(_iter_jsonl(fin), args.segment, args.window):
+                fout.write(json.dumps(row, ensure_ascii=False) + "\n"); n += 1
+                if n % 1000 == 0: print(f"[HF][score-batch] {n}", file=sys.stderr)
+    finally:
+        if fin is not sys.stdin.buffer: fin.close()
+        if fout is not sys.stdout: fout.close()
+    print(f"[HF][score-batch] {n} docs in {time.monotonic() - t0:.1f}s", file=sys.stderr)
+
+def _cli_prefetch(args):
+    # 이미지 빌드/배포 전에 가중치를 HF_MODEL_CACHE 로 받아 두면 재시작 시 허브 왕복 없이 로드된다
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    cache = args.cache_dir or HF_MODEL_CACHE
+    for name in (args.model or sorted({ZSL_MODEL_NAME, NLI_MODEL_NAME})):
+        t0 = time.monotonic()
+        AutoTokenizer.from_pretrained(name, cache_dir=cache)
+        AutoModelForSequenceClassification.from_pretrained(name, cache_dir=cache)
+        print(f"[HF][prefetch] {name} → {cache or '(HF 기본 캐시)'} {time.monotonic() - t0:.1f}s")
+
+def _cli_migrate_store(args):
+    if args.db: os.environ["LOCAL_STORE_DB"] = args.db
+    if args.json: os.environ["LOCAL_STORE"] = args.json
+    os.environ["HF_STORE_MODE"] = "local"
+    st = Store()  # 최초 생성 시 자동 이관
+    if args.force and os.path.exists(st.base):
+        migrate_json_store(st, st.base, force=True)
+    row = st._conn().execute("SELECT v FROM meta WHERE k='migrated_from'").fetchone()
+    print(json.dumps({"db": st.db_path, "migrated_from": json.loads(row[0]) if row else None}, ensure_ascii=False))
+
+def _cli_train_all(args):
+    res = train_all_users(algo=args.algo, min_samples=args.min_samples, workers=args.workers,
+                          include_global=args.include_global, write_eval_runs=args.eval_runs)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HF 지표 서버")
+    sub = ap.add_subparsers(dest="cmd")
+    ex = sub.add_parser("export", help="ONNX export/int8 양자화 산출물을 미리 만들어 캐시")
+    ex.add_argument("--backend", choices=("onnx", "onnx-int8"), default="onnx-int8")
+    ex.add_argument("--model", action="append", help="체크포인트(반복 가능, 기본: ZSL/NLI 모델)")
+    ex.add_argument("--force", action="store_true")
+    pc = sub.add_parser("parity", help="torch fp32 대비 백엔드 출력 오차 확인")
+    pc.add_argument("--backend", choices=BACKENDS, default=HF_BACKEND)
+    pc.add_argument("--model", default=None)
+    pc.add_argument("--tol", type=float, default=None)
+    sv = sub.add_parser("serve", help="gunicorn 멀티 워커로 서빙(모델 가중치 공유)")
+    sv.add_argument("--bind", default=os.getenv("HF_BIND", f"0.0.0.0:{os.getenv('PORT', '5001')}"))
+    sv.add_argument("--workers", type=int, default=int(os.getenv("HF_WORKERS", "2")))
+    sv.add_argument("--threads", type=int, default=int(os.getenv("HF_THREADS", "8")), help="워커당 요청 스레드")
+    sv.add_argument("--intra-op-threads", type=int, default=int(os.getenv("HF_INTRA_OP_THREADS", "0")),
+                    help="워커당 torch intra-op 스레드(0=코어수/워커수)")
+    sv.add_argument("--timeout", type=int, default=int(os.getenv("HF_WORKER_TIMEOUT", "120")))
+    sb = sub.add_parser("score-batch", help="JSONL {text, emotions, coreBelief} 대량 재채점 → JSONL")
+    sb.add_argument("--in", dest="input", default="-")
+    sb.add_argument("--out", dest="output", default="-")
+    sb.add_argument("--url", default=None, help="지정 시 서버의 /scores/batch 로 전송, 없으면 프로세스 내 모델 사용")
+    sb.add_argument("--no-segment", dest="segment", action="store_false")
+    sb.add_argument("--window", type=int, default=BULK_WINDOW)
+    sb.add_argument("--timeout", type=float, default=3600.0)
+    pf = sub.add_parser("prefetch", help="모델 가중치를 로컬 캐시(HF_MODEL_CACHE)에 미리 내려받기")
+    pf.add_argument("--model", action="append", help="체크포인트(반복 가능, 기본: ZSL/NLI 모델)")
+    pf.add_argument("--cache-dir", default=None, help="기본: HF_MODEL_CACHE")
+    ms = sub.add_parser("migrate-store", help="구 JSON 로컬 스토어 → SQLite 이관")
+    ms.add_argument("--json", default=None, help="기본: LOCAL_STORE")
+    ms.add_argument("--db", default=None, help="기본: LOCAL_STORE_DB 또는 JSON 경로의 .sqlite3")
+    ms.add_argument("--force", action="store_true", help="이미 이관했어도 다시 덮어쓰기")
+    ta = sub.add_parser("train-all", help="전체 사용자 개인 보정 일괄 학습(피드백 1회 스캔)")
+    ta.add_argument("--algo", choices=("platt", "isotonic", "both"), default="both")
+    ta.add_argument("--min-samples", type=int, default=20)
+    ta.add_argument("--workers", type=int, default=0, help="프로세스 수(0=코어 수)")
+    ta.add_argument("--no-global", dest="include_global", action="store_false")
+    ta.add_argument("--no-eval-runs", dest="eval_runs", action="store_false")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        return _cli_export(args)
+    if args.cmd == "parity":
+        return _cli_parity(args)
+    if args.cmd == "serve":
+        return _cli_serve(args)
+    if args.cmd == "score-batch":
+        return _cli_score_batch(args)
+    if args.cmd == "prefetch":
+        return _cli_prefetch(args)
+    if args.cmd == "migrate-store":
+        return _cli_migrate_store(args)
+    if args.cmd == "train-all":
+        return _cli_train_all(args)
+    start_background()
     port = int(os.getenv("PORT", "5001"))
     app.run(host="0.0.0.0", port=port)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -312,7 +312,11 @@ async function runHFSignals({ userText, emotions, coreBelief }) {
       emotions: Array.isArray(emotions) ? emotions : [],
       coreBelief: typeof coreBelief === 'string' ? coreBelief : ''
     };
-    const r = await axios.post(`${HF_BASE}/scores?segment=true`, payload, { timeout: 30000 });
+    // 서버 기한을 클라이언트 타임아웃보다 조금 짧게: 포기한 요청의 추론은 서버가 배치 사이에서 끊는다
+    const r = await axios.post(`${HF_BASE}/scores?segment=true`, payload, {
+      timeout: 30000,
+      headers: { 'X-Request-Timeout-Ms': '29000' }
+    });
     return r.data || null;
   } catch (_e) {
     return null;
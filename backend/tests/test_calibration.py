@@ -0,0 +1,37 @@
+# backend/tests/test_calibration.py
+# Platt 적합 회귀 테스트: 분리 가능한 소표본에서도 유한한 해, NumPy/순수 Python 경로가 같은 해
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("HF_STORE_MODE", "local")
+
+import pytest
+import huggingface_server as hs
+
+SEPARABLE = [
+    ([0.1, 0.9, 0.8, 0.2], [0, 1, 1, 0]),
+    ([0.3, 0.7], [0, 1]),
+    ([0.05, 0.1, 0.15, 0.85, 0.9, 0.95], [0, 0, 0, 1, 1, 1]),
+]
+
+def _python_path(ps, ys, monkeypatch):
+    monkeypatch.setattr(hs, "HAS_NUMPY", False)
+    return hs.train_platt(ps, ys)
+
+@pytest.mark.parametrize("ps,ys", SEPARABLE)
+def test_separable_data_has_finite_solution(ps, ys, monkeypatch):
+    t_pos, t_neg = hs._platt_targets(ys)
+    for a, b in (hs.train_platt(ps, ys), _python_path(ps, ys, monkeypatch)):
+        assert abs(a) < 10 and abs(b) < 10
+        # 평활 목표에 대한 정류점(기울기 0)에서 멈췄는지
+        r = [hs._sigmoid(a * x + b) - (t_pos if y else t_neg) for x, y in zip(ps, ys)]
+        assert abs(sum(r)) < 1e-6 and abs(sum(g * x for g, x in zip(r, ps))) < 1e-6
+
+@pytest.mark.parametrize("ps,ys", SEPARABLE)
+def test_numpy_and_python_paths_agree(ps, ys, monkeypatch):
+    if not hs.HAS_NUMPY:
+        pytest.skip("numpy 없음")
+    a_np, b_np = hs.train_platt(ps, ys)
+    a_py, b_py = _python_path(ps, ys, monkeypatch)
+    assert a_np == pytest.approx(a_py, abs=1e-6)
+    assert b_np == pytest.approx(b_py, abs=1e-6)
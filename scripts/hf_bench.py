@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# scripts/hf_bench.py
+# ─────────────────────────────────────────────────────────────────────────────
+# [목적]
+# - backend/huggingface_server.py 핫패스 성능을 커밋 간 diff 가능한 JSON 으로 기록
+#   · /scores 단일/세그먼트 × 길이 분포 × 동시성: 처리량, p50/p95/p99 지연, 단계별 평균(hf_stage_seconds)
+#   · 보정 학습: train_platt / train_isotonic / compute_metrics / 충분통계(시드·증분) — 1k·100k·1M 표본
+#   · 로컬 스토어(SQLite): DB 크기별 적재·단건 읽기/쓰기·트랜잭션·범위 조회
+#
+# [원칙]
+# - 오프라인 실행: --model stub(기본, 결정적 가짜 로짓 + 토큰 비례 지연) 또는 로컬 소형 체크포인트 경로
+# - 코퍼스/표본은 --seed 로 고정 → 같은 입력으로 커밋 간 비교
+# - 스토어는 임시 디렉터리에서만 생성(HF_STORE_MODE=local 강제, 운영 DB/Firestore 무관)
+# - 결과 캐시/문장 캐시는 기본 off(모델 경로 측정). --cache 면 시나리오마다 비운 뒤 on
+#
+# [실행 예]
+# python scripts/hf_bench.py --out bench_$(git rev-parse --short HEAD).json
+# python scripts/hf_bench.py --model ./tiny-xnli --only scores --concurrency 1,4,16
+# python scripts/hf_bench.py --only calib,store --baseline bench_prev.json
+# ─────────────────────────────────────────────────────────────────────────────
+import os, sys, json, math, time, random, shutil, hashlib, argparse, tempfile, threading, platform, subprocess
+import importlib.metadata
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 합성 한국어 일기 코퍼스
+# ─────────────────────────────────────────────────────────────────────────────
+_WHEN = ["오늘은", "아침에", "점심시간에", "퇴근길에", "밤늦게", "주말에", "회의 중에", "수업이 끝나고", "자기 전에", "출근하자마자"]
+_EVENT = [
+    "친구와 사소한 일로 크게 싸웠다", "오랜만에 가족과 저녁을 먹었다", "팀장님께 보고서를 다시 쓰라는 말을 들었다",
+    "시험 결과가 나왔다", "길에서 넘어져 무릎을 다쳤다", "좋아하는 노래를 하루 종일 들었다",
+    "약속이 갑자기 취소되었다", "새로운 프로젝트를 맡게 되었다", "동생이 내 물건을 허락 없이 썼다",
+    "발표를 망쳤다", "오래 기다리던 택배가 도착했다", "면접 연락을 받았다", "혼자 점심을 먹었다",
+    "단톡방에서 내 메시지만 읽고 아무도 답하지 않았다", "산책을 하며 하늘을 오래 봤다",
+]
+_REASON = ["내가 먼저 말을 꺼냈는데", "별일 아닌 줄 알았는데", "준비를 많이 했는데도", "기대하지 않았는데",
+           "다들 바빠 보여서", "어제 잠을 설쳐서", "이번에는 다를 거라고 믿었는데"]
+_FEEL = ["너무 기뻤다", "화가 났다", "마음이 계속 불안했다", "조금 슬펐다", "당황스러웠다", "내일이 기대된다",
+         "부끄러워서 얼굴이 빨개졌다", "아무렇지 않은 척했다", "허탈했다", "마음이 놓였다", "짜증이 밀려왔다"]
+_THOUGHT = ["나는 쓸모없는 사람인 것 같다", "다들 나를 싫어하는 게 분명하다", "그래도 괜찮을 거라고 생각했다",
+            "내일은 더 나아질 것이다", "왜 나한테만 이런 일이 생길까", "결국 나는 아무것도 제대로 못 한다",
+            "조금은 나 자신이 대견했다"]
+_END = [".", ".", ".", "!", "?", "..."]
+_CORE_BELIEFS = ["나는 쓸모없는 사람이다.", "나는 사랑받을 수 없다.", "나는 무능하다.", "세상은 위험하다.", ""]
+_EMOTIONS = ["기쁨", "슬픔", "분노", "불안", "두려움", "수치심", "당혹", "기대"]
+
+# 항목당 문장 수 범위. mixed 는 short/medium/long 를 0.5/0.35/0.15 로 섞는다
+LENGTH_DISTS = {"short": (1, 2), "medium": (3, 6), "long": (8, 16)}
+
+def _sentence(rng: random.Random, run_on: bool = False) -> str:
+    if run_on:  # 자동 세그먼트 기준(HF_ENT_MINLEN)을 넘기는 긴 한 문장
+        parts = [f"{rng.choice(_WHEN)} {rng.choice(_EVENT)}고" for _ in range(rng.randint(2, 4))]
+        return " ".join(parts) + f" {rng.choice(_REASON)} 결국 {rng.choice(_FEEL)}" + rng.choice(_END)
+    shape = rng.random()
+    if shape < 0.35:
+        s = f"{rng.choice(_WHEN)} {rng.choice(_EVENT)}"
+    elif shape < 0.6:
+        s = f"{rng.choice(_REASON)} {rng.choice(_FEEL)}"
+    elif shape < 0.8:
+        s = rng.choice(_THOUGHT)
+    else:
+        s = f"{rng.choice(_WHEN)} {rng.choice(_EVENT)}, {rng.choice(_REASON)} 그래서 {rng.choice(_FEEL)}"
+    return s + rng.choice(_END)
+
+def make_entry(rng: random.Random, dist: str) -> dict:
+    if dist == "mixed":
+        r = rng.random()
+        dist = "short" if r < 0.5 else ("medium" if r < 0.85 else "long")
+    lo, hi = LENGTH_DISTS[dist]
+    sents = [_sentence(rng, run_on=(dist == "long" and rng.random() < 0.2)) for _ in range(rng.randint(lo, hi))]
+    return {"text": " ".join(sents),
+            "emotions": rng.sample(_EMOTIONS, rng.randint(0, 2)),
+            "coreBelief": rng.choice(_CORE_BELIEFS)}
+
+def make_corpus(n: int, dist: str, seed: int) -> list:
+    """결정적 코퍼스 — (n, dist, seed) 가 같으면 항상 같은 항목."""
+    rng = random.Random(f"{seed}:{dist}")
+    return [make_entry(rng, dist) for _ in range(n)]
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 스텁 모델(가중치 없이 서빙 경로 측정)
+# ─────────────────────────────────────────────────────────────────────────────
+def _approx_tokens(s: str) -> int:
+    return max(1, (len(s or "") + 1) // 2)  # 한글 2자 ≈ 1 서브워드
+
+class _StubTokenizer:
+    """_token_lengths/워밍업이 부르는 최소 인터페이스(input_ids 길이만 의미 있음)."""
+    model_max_length = 512
+    pad_token_id = 0
+    padding_side = "right"
+
+    def __call__(self, a, b=None, add_special_tokens=True, **kw):
+        one = isinstance(a, str)
+        xs = [a] if one else list(a)
+        ys = ([b] if one else list(b)) if b is not None else [None] * len(xs)
+        extra = 3 if add_special_tokens else 0
+        ids = [[1] * (_approx_tokens(x) + (_approx_tokens(y) if y else 0) + extra) for x, y in zip(xs, ys)]
+        return {"input_ids": ids[0] if one else ids}
+
+class StubScorer:
+    """PairScorer 대역: 입력 해시로 결정적 로짓, forward 는 (배치 고정비 + 패딩 토큰당 비용)만큼 sleep.
+    sleep 은 GIL 을 놓으므로 GPU forward 대기와 비슷하게 마이크로 배치/동시성 효과가 드러난다."""
+    def __init__(self, name: str, batch_ms: float, token_us: float):
+        self.name = name
+        self.model = self.forward = self.compiled = None
+        self.tokenizer = _StubTokenizer()
+        self.max_length = 512
+        self.batch_ms, self.token_us = batch_ms, token_us
+        self._stat_lock = threading.Lock()
+        self.stats = {"forward_batches": 0, "pairs": 0, "tokens": 0, "padded_tokens": 0}
+
+    def logits(self, pairs, deadline=None):
+        if not pairs:
+            return []
+        lens = [min(self.max_length, _approx_tokens(p) + _approx_tokens(h) + 3) for p, h in pairs]
+        padded = max(lens) * len(pairs)
+        time.sleep((self.batch_ms * 1000.0 + self.token_us * padded) / 1e6)
+        out = []
+        for p, h in pairs:
+            d = hashlib.blake2b(f"{p}\x1f{h}".encode("utf-8"), digest_size=3).digest()
+            out.append([(d[0] - 128) / 32.0, (d[1] - 128) / 64.0, (d[2] - 128) / 32.0])
+        with self._stat_lock:
+            self.stats["forward_batches"] += 1
+            self.stats["pairs"] += len(pairs)
+            self.stats["tokens"] += sum(lens)
+            self.stats["padded_tokens"] += padded
+        return out
+
+def _install_stub(hs, args):
+    sc = StubScorer("stub", args.stub_batch_ms, args.stub_token_us)
+    with hs._gen_lock:
+        hs._model_gen += 1
+        gen = hs._model_gen
+    hs.swap_bundle(hs.ModelBundle(gen, "stub", "stub", "stub", None, None, sc, sc))
+    hs._startup_state.update(state="ready", warmup={})
+    hs._ready.set()
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 측정 유틸
+# ─────────────────────────────────────────────────────────────────────────────
+def _pct(sorted_xs: list, q: float):
+    # nearest-rank 백분위
+    if not sorted_xs:
+        return None
+    return sorted_xs[min(len(sorted_xs) - 1, max(0, math.ceil(q / 100.0 * len(sorted_xs)) - 1))]
+
+def _lat_summary(lat_s: list) -> dict:
+    xs = sorted(x * 1000.0 for x in lat_s)
+    if not xs:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    return {"p50_ms": _pct(xs, 50), "p95_ms": _pct(xs, 95), "p99_ms": _pct(xs, 99),
+            "mean_ms": sum(xs) / len(xs), "max_ms": xs[-1]}
+
+def _timeit(fn, repeat: int) -> dict:
+    ts = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter(); fn(); ts.append((time.perf_counter() - t0) * 1000.0)
+    ts.sort()
+    return {"min_ms": ts[0], "median_ms": ts[len(ts) // 2]}
+
+def _r(obj, nd: int = 4):
+    # JSON diff 노이즈를 줄이기 위해 실수는 유효 자릿수로 반올림
+    if isinstance(obj, float):
+        return float(f"{obj:.{nd}g}")
+    if isinstance(obj, dict):
+        return {k: _r(v, nd) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_r(v, nd) for v in obj]
+    return obj
+
+def _stage_snapshot(hs) -> dict:
+    with hs.M_STAGE._lock:
+        return {lv[0]: (row[-2], row[-1]) for lv, row in hs.M_STAGE._v.items()}
+
+def _stage_delta(before: dict, after: dict, n_req: int) -> dict:
+    out = {}
+    for stage, (s, c) in after.items():
+        s0, c0 = before.get(stage, (0.0, 0))
+        if c - c0 > 0:
+            out[stage] = {"mean_ms": (s - s0) / (c - c0) * 1000.0, "per_req": (c - c0) / max(1, n_req)}
+    return out
+
+# ─────────────────────────────────────────────────────────────────────────────
+# /scores
+# ─────────────────────────────────────────────────────────────────────────────
+def _reset_caches(hs, use_cache: bool):
+    hs.RC_ENABLE = hs.SC_ENABLE = bool(use_cache)
+    hs.result_cache.clear()
+    hs.sentence_cache.clear()
+
+def _run_load(hs, corpus: list, segment: bool, concurrency: int):
+    """corpus 를 concurrency 개 스레드가 나눠 순서대로 요청(각자 test_client) → (지연[s], 오류 수, 벽시계[s])."""
+    url = "/scores?segment=true" if segment else "/scores?segment=false"
+    nxt, lock = [0], threading.Lock()
+    lat, errors = [], [0]
+
+    def worker():
+        c = hs.app.test_client()
+        while True:
+            with lock:
+                i = nxt[0]; nxt[0] += 1
+            if i >= len(corpus):
+                return
+            t0 = time.perf_counter()
+            r = c.post(url, json=corpus[i])
+            dt = time.perf_counter() - t0
+            with lock:
+                if r.status_code == 200: lat.append(dt)
+                else: errors[0] += 1
+
+    ts = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return lat, errors[0], time.perf_counter() - t0
+
+def _scored_segments(hs, entry: dict, segment: bool) -> int:
+    """서버가 이 요청에서 실제로 채점하는 세그먼트 수(자동 세그먼트·묶음·긴 문장 분할 반영)."""
+    text, _, _, seg = hs._parse_scores_request(entry, {"segment": "true" if segment else "false"})
+    return len(hs._segments_for(text, seg, hs.current_bundle())[0])
+
+def bench_scores(hs, args) -> list:
+    # 측정 전 1회 예열(코드 경로·스레드 풀·할당자) — 시나리오 코퍼스와 다른 시드
+    _reset_caches(hs, False)
+    _run_load(hs, make_corpus(8, "mixed", args.seed + 1), True, 2)
+    seg_auto = hs.ENT_SEG_AUTO
+    rows = []
+    for mode in args.modes:
+        segment = mode == "segment"
+        # single 은 긴 텍스트 자동 세그먼트(HF_ENT_SEG_AUTO)를 끄고 잰다 — 라벨대로 텍스트 1개 = 모델 입력 1개
+        hs.ENT_SEG_AUTO = seg_auto and segment
+        for dist in args.dists:
+            corpus = make_corpus(args.requests, dist, args.seed)
+            n_segs = sum(_scored_segments(hs, e, segment) for e in corpus)
+            for conc in args.concurrency:
+                _reset_caches(hs, args.cache)
+                before = _stage_snapshot(hs)
+                lat, errors, wall = _run_load(hs, corpus, segment, conc)
+                row = {"id": f"{mode}/{dist}/c{conc}", "mode": mode, "dist": dist, "concurrency": conc,
+                       "requests": len(corpus), "errors": errors, "wall_s": wall,
+                       "rps": len(lat) / wall if wall > 0 else None,
+                       "segments_per_s": n_segs / wall if wall > 0 else None,
+                       "segments_per_req": n_segs / max(1, len(corpus))}
+                row.update(_lat_summary(lat))
+                row["stages"] = _stage_delta(before, _stage_snapshot(hs), len(corpus))
+                rows.append(row)
+                print(f"[bench][scores] {row['id']:<24} rps={row['rps']:.1f} "
+                      f"p50={row['p50_ms']:.1f}ms p99={row['p99_ms']:.1f}ms err={errors}", file=sys.stderr)
+    hs.ENT_SEG_AUTO = seg_auto
+    _reset_caches(hs, True)
+    return rows
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 보정 학습
+# ─────────────────────────────────────────────────────────────────────────────
+def synthetic_feedback(n: int, seed: int):
+    """과신(over-confident)된 p 와 그 보정 확률을 따르는 y — 실제 피드백처럼 Platt 가 의미 있는 (a,b) 를 찾는다."""
+    rng = random.Random(f"{seed}:calib:{n}")
+    ps, ys = [], []
+    for _ in range(n):
+        p = rng.betavariate(2.0, 2.0)
+        q = 1.0 / (1.0 + math.exp(-(2.0 * p - 1.0) * 1.5))
+        ps.append(p); ys.append(1 if rng.random() < q else 0)
+    return ps, ys
+
+def bench_calibration(hs, args) -> list:
+    rows = []
+    paths = ["numpy", "python"] if hs.HAS_NUMPY else ["python"]
+    for n in args.calib_sizes:
+        ps, ys = synthetic_feedback(n, args.seed)
+        rep = args.repeat if n <= 100000 else 1
+        for path in paths:
+            if path == "python" and n > args.calib_python_max:
+                continue
+            saved = hs.HAS_NUMPY
+            hs.HAS_NUMPY = path == "numpy"
+            try:
+                row = {"id": f"{path}/n{n}", "path": path, "n": n,
+                       "train_platt": _timeit(lambda: hs.train_platt(ps, ys), rep),
+                       "train_isotonic": _timeit(lambda: hs.train_isotonic(ps, ys), rep),
+                       "compute_metrics": _timeit(lambda: hs.compute_metrics(ps, ys), rep),
+                       "calib_stats_init": _timeit(lambda: hs.calib_stats_init(ps, ys, (1.0, 0.0)), rep),
+                       "fit_calibration": _timeit(lambda: hs._fit_calibration(ps, ys, "both"), rep)}
+            finally:
+                hs.HAS_NUMPY = saved
+            rows.append(row)
+            print(f"[bench][calib] {row['id']:<16} fit={row['fit_calibration']['min_ms']:.1f}ms", file=sys.stderr)
+    # 증분 반영(표본 1건) — 표본 수와 무관해야 한다(O(1))
+    st = hs.calib_stats_init(*synthetic_feedback(1000, args.seed), (1.0, 0.0))
+    obs_ps, obs_ys = synthetic_feedback(args.ops, args.seed + 7)
+    t0 = time.perf_counter()
+    for p, y in zip(obs_ps, obs_ys):
+        hs.calib_stats_observe(st, p, y)
+    per = (time.perf_counter() - t0) / max(1, len(obs_ps)) * 1e6
+    t0 = time.perf_counter()
+    for _ in range(max(1, args.ops // 10)):
+        hs.calib_stats_metrics(st); hs.calib_stats_fit(st)
+    per_fit = (time.perf_counter() - t0) / max(1, args.ops // 10) * 1e6
+    rows.append({"id": "observe", "observe_us": per, "metrics_fit_us": per_fit})
+    return rows
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 로컬 스토어(SQLite)
+# ─────────────────────────────────────────────────────────────────────────────
+def _store_docs(hs, n: int, rng: random.Random):
+    """크기 n 의 운영 유사 DB: 피드백 80%(사용자당 ~100건), 평가 실행 10%, 보정/통계 문서 나머지."""
+    n_users = max(1, n // 125)
+    n_eval = max(1, n // 10)
+    n_fb = max(1, n - n_eval - 2 * n_users)
+    items = []
+    for i in range(n_fb):
+        uid = f"u{i % n_users:05d}"
+        p = rng.random()
+        items.append((f"users/{uid}/feedback/f{i:08d}",
+                      {"rating": 5 if rng.random() < p else 2, "ts": f"2025-01-01T00:00:{i % 60:02d}Z",
+                       "model": {"p_final_raw": p, "hf_entropy": rng.random()}}, False))
+    base = 1735689600  # 2025-01-01T00:00:00Z
+    for i in range(n_eval):
+        ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(base + i * 60))
+        uid = f"u{rng.randrange(n_users):05d}"
+        scope = "global" if i % 4 == 0 else "user"
+        run_id = ts if scope == "global" else f"{ts}__user:{uid}"
+        m = {"ece": rng.random() * 0.2, "brier": rng.random() * 0.3, "em": rng.random(), "f1": rng.random(),
+             "user_corr": rng.random(), "_n": rng.randint(20, 500)}
+        items.append(hs._eval_run_doc(scope, uid, m, run_id) + (False,))
+    iso = ([0.1 * k for k in range(11)], [0.1 * k for k in range(10)])
+    for u in range(n_users):
+        uid = f"u{u:05d}"
+        items.append(hs._calibration_doc("user", uid, (1.1, -0.05), iso, {"ece": 0.05, "_n": 100}, 100) + (False,))
+        items.append((hs._calib_stats_path("user", uid), hs.calib_stats_init([0.3, 0.7], [0, 1], (1.0, 0.0)), False))
+    return items, n_users
+
+def _op_lat(fn, ops: int) -> dict:
+    lat = []
+    for i in range(ops):
+        t0 = time.perf_counter(); fn(i); lat.append(time.perf_counter() - t0)
+    out = _lat_summary(lat)
+    out["ops_per_s"] = ops / max(1e-9, sum(lat))
+    return out
+
+def bench_store(hs, args) -> list:
+    rows = []
+    for n in args.store_sizes:
+        rng = random.Random(f"{args.seed}:store:{n}")
+        with tempfile.TemporaryDirectory(prefix="hf_bench_") as d:
+            os.environ["LOCAL_STORE"] = os.path.join(d, "store.json")
+            os.environ["LOCAL_STORE_DB"] = os.path.join(d, "store.sqlite3")
+            st = hs.Store()
+            items, n_users = _store_docs(hs, n, rng)
+            t0 = time.perf_counter()
+            for i in range(0, len(items), 5000):
+                st.set_docs(items[i:i + 5000])
+            fill = time.perf_counter() - t0
+            paths = [p for p, _, _ in items]
+            fb_paths = [p for p in paths if "/feedback/" in p]
+            uids = [f"u{rng.randrange(n_users):05d}" for _ in range(args.ops)]
+            picks = [rng.choice(paths) for _ in range(args.ops)]
+            ops = max(1, args.ops)
+            small = max(1, ops // 10)  # 무거운 질의는 1/10 횟수
+
+            def _observe(i):
+                path = hs._calib_stats_path("user", uids[i])
+                def fn(cur):
+                    return [(path, hs.calib_stats_observe(cur, 0.6, 1), False)]
+                st.transact(path, fn)
+
+            row = {"id": f"n{n}", "docs": len(items), "users": n_users,
+                   "fill": {"s": fill, "docs_per_s": len(items) / max(1e-9, fill)},
+                   "get_doc": _op_lat(lambda i: st.get_doc(picks[i]), ops),
+                   "get_doc_miss": _op_lat(lambda i: st.get_doc(f"users/none/feedback/x{i}"), ops),
+                   "set_doc_merge": _op_lat(lambda i: st.set_doc(fb_paths[i % len(fb_paths)], {"seen": i}, merge=True), ops),
+                   "set_doc_new": _op_lat(lambda i: st.set_doc(f"users/{uids[i]}/feedback/new{i:06d}",
+                                                                {"rating": 4, "model": {"p_final_raw": 0.5}}, merge=False), ops),
+                   "set_docs_50": _op_lat(lambda i: st.set_docs(
+                       (f"users/{uids[i]}/feedback/b{i:05d}_{k:02d}", {"rating": 3}, False) for k in range(50)), small),
+                   "transact_observe": _op_lat(_observe, ops),
+                   "list_feedback_user": _op_lat(lambda i: st.list_feedback(uids[i]), small),
+                   "eval_runs_global_50": _op_lat(lambda i: st.list_eval_runs("global", limit=50), small),
+                   "eval_runs_all_50": _op_lat(lambda i: st.list_eval_runs(None, limit=50), small),
+                   "iter_feedback_all": _timeit(lambda: sum(1 for _ in st.iter_feedback()), 1),
+                   "db_bytes": sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d))}
+            conn = getattr(st._tls, "conn", None)
+            if conn is not None:
+                conn.close()
+            rows.append(row)
+            print(f"[bench][store] {row['id']:<10} fill={row['fill']['docs_per_s']:.0f}/s "
+                  f"get p50={row['get_doc']['p50_ms']:.3f}ms set p50={row['set_doc_merge']['p50_ms']:.3f}ms", file=sys.stderr)
+    return rows
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 메타/비교/CLI
+# ─────────────────────────────────────────────────────────────────────────────
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return ""
+
+def _meta(hs, args) -> dict:
+    b = hs._bundle
+    versions = {}
+    for mod in ("numpy", "torch", "transformers", "flask"):
+        try:
+            versions[mod] = importlib.metadata.version(mod)
+        except Exception:
+            pass
+    return {"git": _git_rev(), "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "versions": versions, "model": b.info() if b else None, "device": hs.DEVICE,
+            "config": {"HF_MAX_BATCH_TOKENS": hs.HF_MAX_BATCH_TOKENS, "HF_BATCH_MAX_ITEMS": hs.HF_BATCH_MAX_ITEMS,
+                       "HF_MB_ENABLE": hs.MB_ENABLE, "HF_MB_MAX_BATCH": hs.MB_MAX_BATCH,
+                       "HF_MB_MAX_WAIT_MS": hs.MB_MAX_WAIT_MS, "HF_COMPILE": hs.HF_COMPILE},
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}}
+
+_LOWER_IS_BETTER = ("_ms", "_us", "wall_s", "db_bytes")
+_HIGHER_IS_BETTER = ("rps", "_per_s")
+
+def _flatten(obj, prefix="", out=None) -> dict:
+    out = {} if out is None else out
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            _flatten(v, f"{prefix}/{k}" if prefix else k, out)
+    elif isinstance(obj, list):
+        for v in obj:
+            if isinstance(v, dict) and "id" in v:
+                _flatten({k: x for k, x in v.items() if k != "id"}, f"{prefix}[{v['id']}]", out)
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix] = float(obj)
+    return out
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list:
+    """같은 키의 지연/처리량 지표를 비교해 threshold(비율) 이상 변한 항목 [(키, 이전, 현재, 변화율, 판정)]."""
+    a, b = _flatten(old.get("results", {})), _flatten(new.get("results", {}))
+    rows = []
+    for k in sorted(set(a) & set(b)):
+        leaf = k.rsplit("/", 1)[-1]
+        lower = leaf.endswith(_LOWER_IS_BETTER)
+        higher = leaf.endswith(_HIGHER_IS_BETTER)
+        if not (lower or higher) or a[k] == 0:
+            continue
+        ch = (b[k] - a[k]) / abs(a[k])
+        if abs(ch) >= threshold:
+            better = ch < 0 if lower else ch > 0
+            rows.append((k, a[k], b[k], ch, "faster" if better else "SLOWER"))
+    return rows
+
+def _ints(s: str) -> list:
+    return [int(float(x)) for x in s.split(",") if x.strip()]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="huggingface_server 벤치마크(JSON 결과)")
+    ap.add_argument("--only", default="scores,calib,store", help="실행할 묶음(콤마): scores,calib,store")
+    ap.add_argument("--out", default=None, help="결과 JSON 경로(기본: stdout)")
+    ap.add_argument("--baseline", default=None, help="이전 결과 JSON — 변화가 큰 지표를 stderr 로 요약")
+    ap.add_argument("--threshold", type=float, default=0.1, help="--baseline 비교 시 보고할 최소 변화율")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=3, help="보정 학습 반복 횟수(최소/중앙값, 1M 은 1회)")
+    ap.add_argument("--ops", type=int, default=2000, help="스토어 단건 연산/증분 반영 횟수")
+    # /scores
+    ap.add_argument("--model", default="stub", help="stub 또는 로컬 체크포인트 경로/이름(ZSL·NLI 공용)")
+    ap.add_argument("--nli-model", default=None, help="NLI 체크포인트(기본: --model 과 같음)")
+    ap.add_argument("--no-warm", action="store_true", help="실모델 워밍업 생략")
+    ap.add_argument("--stub-batch-ms", type=float, default=2.0, help="스텁 forward 배치당 고정 비용(ms)")
+    ap.add_argument("--stub-token-us", type=float, default=2.0, help="스텁 forward 패딩 토큰당 비용(µs)")
+    ap.add_argument("--requests", type=int, default=200, help="시나리오당 요청 수")
+    ap.add_argument("--concurrency", type=_ints, default=[1, 4, 16])
+    ap.add_argument("--modes", type=lambda s: s.split(","), default=["single", "segment"])
+    ap.add_argument("--dists", type=lambda s: s.split(","), default=["short", "medium", "long", "mixed"])
+    ap.add_argument("--cache", action="store_true", help="결과/문장 캐시 on(시나리오마다 비움)")
+    # 보정/스토어
+    ap.add_argument("--calib-sizes", type=_ints, default=[1000, 100000, 1000000])
+    ap.add_argument("--calib-python-max", type=int, default=10000, help="순수 Python 경로를 잴 최대 표본 수")
+    ap.add_argument("--store-sizes", type=_ints, default=[1000, 10000, 100000])
+    args = ap.parse_args(argv)
+    only = {x.strip() for x in args.only.split(",") if x.strip()}
+
+    # 임포트 전에 고정해야 하는 설정(스토어는 항상 임시 로컬, 실모델 경로)
+    os.environ["HF_STORE_MODE"] = "local"
+    tmp = tempfile.mkdtemp(prefix="hf_bench_")
+    os.environ["LOCAL_STORE"] = os.path.join(tmp, "store.json")
+    if args.model != "stub":
+        os.environ["ZSL_MODEL"] = args.model
+        os.environ["NLI_MODEL"] = args.nli_model or args.model
+    sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+    import huggingface_server as hs
+
+    if "scores" in only:
+        if args.model == "stub":
+            _install_stub(hs, args)
+        else:
+            st = hs.startup(warm=not args.no_warm)
+            if st.get("state") != "ready":
+                raise SystemExit(f"모델 로드 실패: {st.get('error')}")
+
+    results = {}
+    if "scores" in only:
+        results["scores"] = bench_scores(hs, args)
+    if "calib" in only:
+        results["calibration"] = bench_calibration(hs, args)
+    if "store" in only:
+        results["store"] = bench_store(hs, args)
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {"meta": _meta(hs, args), "results": _r(results)}
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[bench] 결과 저장: {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        diff = compare(old, report, args.threshold)
+        print(f"[bench] 기준 {old.get('meta', {}).get('git') or args.baseline} 대비 ±{args.threshold:.0%} 이상 변화: {len(diff)}건",
+              file=sys.stderr)
+        for k, a, b, ch, verdict in diff:
+            print(f"  {verdict:<6} {ch:+7.1%}  {a:>12.4g} → {b:<12.4g} {k}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()